@@ -45,6 +45,7 @@ class AppUserAdmin(UserAdmin):
 @admin.register(UserAddress)
 class UserAddressAdmin(admin.ModelAdmin):
     list_display = ("user", "address", "label", "is_default")
+    list_select_related = ("user", "address")
     list_filter = ("is_default",)
     search_fields = ("user__username", "user__email", "label", "address__city", "address__street")
     raw_id_fields = ("user", "address")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_preferred_address'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('common', '0002_tariff'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'first_name', 'last_name', 'id'], name='user_role_name_idx'),
+        ),
+    ]
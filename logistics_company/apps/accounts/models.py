@@ -21,6 +21,12 @@ class User(AbstractUser):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Clients list and search: role filter plus the keyset ordering
+            models.Index(fields=["role", "first_name", "last_name", "id"], name="user_role_name_idx"),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
     
@@ -1,3 +1,23 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.accounts.models import UserRole
+from apps.common.testing import DataFactory, QueryBudgetMixin
+
+
+class UserAdminQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The user changelist runs a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.factory.clients(10)
+        cls.admin = cls.factory.users(1, UserRole.ADMIN, is_staff=True, is_superuser=True)[0]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_user_admin_changelist(self):
+        self.assertQueryBudget(
+            reverse("admin:accounts_user_changelist"), 7, grow=lambda: self.factory.clients(200)
+        )
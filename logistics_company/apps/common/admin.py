@@ -23,6 +23,7 @@ class AddressAdmin(admin.ModelAdmin):
 @admin.register(Tariff)
 class TariffAdmin(admin.ModelAdmin):
     list_display = ("company", "delivery_type", "price_per_kg_display")
+    list_select_related = ("company",)
     list_filter = ("company", "delivery_type")
     search_fields = ("company__name",)
     ordering = ("company", "delivery_type")
@@ -0,0 +1,15 @@
+"""
+Benchmark suite for the JSON endpoints, reports and admin changelists.
+
+    python manage.py benchmark --scales 100,1000,10000 --output after.json
+    python manage.py benchmark --compare before.json after.json
+
+A run seeds a synthetic dataset per scale (see seed_data --scale), records
+latency, query count and peak memory of every scenario in scenarios.py
+(runner.py) and writes them to a JSON file. Compare mode checks a run
+against a baseline and fails on regressions (compare.py).
+
+Each dataset is rolled back after it is measured, but the run still adds to
+whatever the database already holds; point SQLITE_PATH at a freshly
+migrated copy for numbers that can be compared between runs.
+"""
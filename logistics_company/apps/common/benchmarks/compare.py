@@ -0,0 +1,62 @@
+"""
+Regression check between two benchmark results files.
+
+Scenarios are matched by scale and name. A scenario regresses when:
+
+- its p50 latency grew by more than `latency_threshold` (a fraction) and
+  by more than LATENCY_FLOOR_MS, so sub-millisecond noise is ignored
+- it runs more queries than before
+- its peak memory grew by more than `memory_threshold` and MEMORY_FLOOR_KIB
+- its response status changed
+
+Latency is only comparable between runs on the same machine and database
+profile; query counts are comparable anywhere.
+"""
+
+LATENCY_FLOOR_MS = 1.0
+MEMORY_FLOOR_KIB = 64
+
+
+def _grew(before, after, threshold, floor):
+    return after - before > floor and after > before * (1 + threshold)
+
+
+def compare_results(baseline, current, latency_threshold=0.25, memory_threshold=0.25):
+    """
+    Return (rows, unmatched). rows has one dict per scenario present in
+    both runs, with the before/after figures and the list of regressions;
+    unmatched lists the "scale/name" keys found in only one run.
+    """
+    rows = []
+    before_keys, after_keys = set(), set()
+    for scale, before_scale in baseline["scales"].items():
+        before_keys.update(f"{scale}/{name}" for name in before_scale.get("endpoints", {}))
+    for scale, after_scale in current["scales"].items():
+        after_keys.update(f"{scale}/{name}" for name in after_scale.get("endpoints", {}))
+
+    for key in sorted(before_keys & after_keys, key=lambda k: (int(k.split("/", 1)[0]), k)):
+        scale, name = key.split("/", 1)
+        before = baseline["scales"][scale]["endpoints"][name]
+        after = current["scales"][scale]["endpoints"][name]
+
+        regressions = []
+        p50 = (before["latency_ms"]["p50"], after["latency_ms"]["p50"])
+        if _grew(*p50, latency_threshold, LATENCY_FLOOR_MS):
+            regressions.append(f"p50 {p50[0]:.2f} -> {p50[1]:.2f} ms")
+        if after["queries"] > before["queries"]:
+            regressions.append(f"queries {before['queries']} -> {after['queries']}")
+        if _grew(before["peak_kib"], after["peak_kib"], memory_threshold, MEMORY_FLOOR_KIB):
+            regressions.append(f"peak {before['peak_kib']:.0f} -> {after['peak_kib']:.0f} KiB")
+        if after["status"] != before["status"]:
+            regressions.append(f"status {before['status']} -> {after['status']}")
+
+        rows.append({
+            "scale": int(scale),
+            "endpoint": name,
+            "p50_ms": p50,
+            "queries": (before["queries"], after["queries"]),
+            "peak_kib": (before["peak_kib"], after["peak_kib"]),
+            "regressions": regressions,
+        })
+
+    return rows, sorted(before_keys ^ after_keys)
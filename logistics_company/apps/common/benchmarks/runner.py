@@ -0,0 +1,177 @@
+"""
+Seeding and measuring for the benchmark suite.
+
+For every scale, `seed_data --scale N` generates the dataset inside a
+transaction, each scenario is requested through the Django test client and
+the transaction is rolled back, so the run leaves the database as it found
+it. The first request of a scenario warms the process caches and is not
+counted; the next `repeat` are timed. Per scenario the results hold:
+
+- latency_ms: min, p50, p95, mean and max wall time of the timed requests,
+  including reading a streamed body
+- queries: the most SQL queries one request ran
+- peak_kib: peak Python memory allocated during one more request, measured
+  separately with tracemalloc because tracing slows everything down
+- status and bytes of the last response
+"""
+import json
+import logging
+import platform
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from apps.common.lookups import lookups
+from apps.common.middleware import QueryRecorder
+from apps.common.tariffs import tariffs
+from apps.parcels.models import Parcel
+from apps.parcels.registry import statuses
+from apps.parcels.tracking import tracking_cache_key
+
+from .scenarios import BenchmarkContext
+
+
+# Bump when the layout of the results file changes
+FORMAT_VERSION = 1
+
+
+class Rollback(Exception):
+    """Raised at the end of a scale to roll back its dataset."""
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return round(sorted_values[index], 3)
+
+
+def _send(client, method, url, body):
+    data = json.dumps(body) if body is not None else ""
+    response = client.generic(method, url, data, content_type="application/json")
+    content = b"".join(response.streaming_content) if response.streaming else response.content
+    return response.status_code, len(content)
+
+
+def measure(clients, scenario, ctx, repeat):
+    """Request `scenario` 1 + repeat times, then once more under tracemalloc."""
+    client = clients[scenario.user]
+    timings = []
+    queries = 0
+    for i in range(repeat + 1):
+        url, body = scenario.build(ctx, i)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            status, size = _send(client, scenario.method, url, body)
+            elapsed = (time.perf_counter() - started) * 1000
+        if i:
+            timings.append(elapsed)
+            queries = max(queries, recorder.count)
+
+    url, body = scenario.build(ctx, repeat + 1)
+    tracemalloc.start()
+    try:
+        _send(client, scenario.method, url, body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "method": scenario.method,
+        "status": status,
+        "latency_ms": {
+            "min": round(timings[0], 3),
+            "p50": _percentile(timings, 50),
+            "p95": _percentile(timings, 95),
+            "mean": round(statistics.fmean(timings), 3),
+            "max": round(timings[-1], 3),
+        },
+        "queries": queries,
+        "peak_kib": round(peak / 1024, 1),
+        "bytes": size,
+    }
+
+
+def _clients(ctx):
+    clients = {"anonymous": Client(SERVER_NAME="localhost")}
+    for name, user in (("employee", ctx.employee_user), ("admin", ctx.admin_user)):
+        clients[name] = Client(SERVER_NAME="localhost")
+        clients[name].force_login(user)
+    return clients
+
+
+def _clear_caches(ctx):
+    """Forget the cached rows of a rolled-back dataset."""
+    statuses.clear()
+    tariffs.clear()
+    lookups.clear()
+    if ctx is not None:
+        cache.delete_many([tracking_cache_key(number) for _, number in ctx.parcels])
+
+
+def run_scale(scale, scenarios, repeat, seed, log):
+    """Seed `scale` clients, measure every scenario and roll the data back."""
+    result = {}
+    ctx = None
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            call_command("seed_data", scale=scale, seed=seed, stdout=StringIO())
+            result["clients"] = scale
+            result["parcels"] = Parcel.objects.count()
+            result["seed_seconds"] = round(time.perf_counter() - started, 2)
+            log(f"scale {scale}: {result['parcels']} parcels seeded in {result['seed_seconds']}s")
+
+            ctx = BenchmarkContext(seed)
+            clients = _clients(ctx)
+            result["endpoints"] = {}
+            for scenario in scenarios:
+                entry = measure(clients, scenario, ctx, repeat)
+                result["endpoints"][scenario.name] = entry
+                log(
+                    f"  {scenario.name:<52} {entry['status']:>3} "
+                    f"p50 {entry['latency_ms']['p50']:>9.2f} ms  {entry['queries']:>4} queries  "
+                    f"{entry['peak_kib']:>9.1f} KiB"
+                )
+            raise Rollback()
+    except Rollback:
+        pass
+    finally:
+        _clear_caches(ctx)
+    return result
+
+
+def run_benchmarks(scales, scenarios, repeat=5, seed=42, log=print):
+    """Return the results of every scenario at every scale, as written to the results file."""
+    results = {
+        "format": FORMAT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "vendor": connection.vendor,
+            "db_profile": getattr(settings, "DB_PROFILE", None),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "scales": {},
+    }
+    # Failing requests are reported in the results; keep them out of the log.
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        for scale in scales:
+            results["scales"][str(scale)] = run_scale(scale, scenarios, repeat, seed, log)
+    finally:
+        request_logger.setLevel(level)
+    return results
@@ -0,0 +1,292 @@
+"""
+The requests the benchmark suite measures.
+
+A Scenario names one endpoint, the user it is requested as ("employee",
+"admin" or "anonymous") and a function building the request from the
+BenchmarkContext and the iteration number. Requests that consume their
+target (deleting a parcel, moving one out of CREATED) get a fresh one from
+the context on every iteration; creating it is not part of the timing.
+"""
+import itertools
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.contrib import admin
+from django.urls import reverse
+
+from apps.accounts.models import User, UserRole
+from apps.common.models import DeliveryType
+from apps.organizations.models import Office
+from apps.parcels.counters import adjust_counts, count_parcels
+from apps.parcels.models import Parcel
+from apps.parcels.registry import statuses
+from apps.workforce.models import Employee
+
+
+# Parcels sampled for the lookups that should not all hit one row
+SAMPLE_SIZE = 200
+
+
+class BenchmarkContext:
+    """The seeded rows the scenarios point to, and factories for fresh targets."""
+
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+        self._numbers = itertools.count(1)
+
+        self.employee_user = User.objects.get(username="manager1")
+        self.employee = self.employee_user.employee_profile
+        self.admin_user = User.objects.create_superuser(
+            username="benchmark_admin", email="benchmark_admin@example.com", password=None, role=UserRole.ADMIN,
+        )
+        self.office = Office.objects.filter(code__startswith="LOAD-").order_by("pk").first() or self.employee.office
+        self.company = self.office.company
+        self.clients = list(
+            User.objects.filter(role=UserRole.CLIENT).order_by("pk").values_list("pk", flat=True)[:SAMPLE_SIZE]
+        )
+        self.parcels = self._sample_parcels()
+
+    def _sample_parcels(self):
+        """[(id, tracking number)] of parcels spread over the whole table."""
+        bounds = Parcel.objects.order_by("pk").values_list("pk", flat=True)
+        first, last = bounds.first(), bounds.last()
+        candidates = {self.rng.randint(first, last) for _ in range(SAMPLE_SIZE)}
+        return sorted(Parcel.objects.filter(pk__in=candidates).values_list("pk", "tracking_number"))
+
+    def parcel(self, i):
+        return self.parcels[i % len(self.parcels)]
+
+    def client(self, i):
+        return self.clients[i % len(self.clients)]
+
+    def number(self):
+        return next(self._numbers)
+
+    def parcel_payload(self):
+        sender, receiver = self.clients[0], self.clients[1]
+        return {
+            "sender_id": sender,
+            "receiver_id": receiver,
+            "sender_office_id": self.office.pk,
+            "receiver_office_id": self.office.pk,
+            "weight_kg": "1.250",
+            "delivery_type": DeliveryType.STANDARD,
+        }
+
+    def new_parcel(self):
+        """A parcel in CREATED status, with the status counters kept in step."""
+        parcel = Parcel.objects.create(
+            tracking_number=f"BENCHMARK{self.number():09d}",
+            company=self.company,
+            sender_id=self.clients[0],
+            receiver_id=self.clients[1],
+            sender_office=self.office,
+            receiver_office=self.office,
+            delivery_type=DeliveryType.STANDARD,
+            weight_kg=Decimal("1.250"),
+            current_status=statuses.get("CREATED"),
+            registered_by=self.employee,
+        )
+        adjust_counts(count_parcels([parcel]))
+        return parcel
+
+    def new_client(self):
+        n = self.number()
+        return User.objects.create(
+            username=f"benchmark_client_{n}", email=f"benchmark.client{n}@example.com",
+            first_name="Benchmark", last_name=f"Client {n}", role=UserRole.CLIENT,
+        )
+
+    def new_employee(self):
+        n = self.number()
+        user = User.objects.create(
+            username=f"benchmark_employee_{n}", email=f"benchmark.employee{n}@example.com",
+            first_name="Benchmark", last_name=f"Employee {n}", role=UserRole.EMPLOYEE,
+        )
+        return Employee.objects.create(
+            user=user, employee_code=f"BENCHMARK-E{n}", employee_type=Employee.EmployeeType.OFFICE,
+            office=self.office, hire_date=date(2024, 1, 1), salary=Decimal("2000.00"),
+        )
+
+    def new_office(self):
+        n = self.number()
+        return Office.objects.create(
+            company=self.company, name=f"Benchmark Office {n}", code=f"BENCHMARK-O{n}", address=self.office.address,
+        )
+
+
+class Scenario:
+    def __init__(self, name, build, method="GET", user="employee"):
+        self.name = name
+        self.build = build  # (context, i) -> (url, JSON body or None)
+        self.method = method
+        self.user = user
+
+
+def _get(name, *args, query=""):
+    """Build function for a GET of a fixed URL."""
+    return lambda ctx, i: (reverse(name, args=args) + query, None)
+
+
+def _track(ctx, i):
+    return reverse("track_parcel_api") + f"?tracking_number={ctx.parcel(i)[1]}", None
+
+
+def _parcel_search(query=""):
+    # The first characters of a tracking number match a large share of the parcels
+    return lambda ctx, i: (reverse("parcels_api_search") + f"?q={ctx.parcel(i)[1][:5]}{query}", None)
+
+
+def _parcel_get(ctx, i):
+    return reverse("parcels_api_get", args=[ctx.parcel(i)[0]]), None
+
+
+def _parcel_create(ctx, i):
+    return reverse("parcels_api_create"), ctx.parcel_payload()
+
+
+def _parcel_bulk_create(ctx, i):
+    return reverse("parcels_api_bulk_create"), {"parcels": [ctx.parcel_payload() for _ in range(20)]}
+
+
+def _parcel_quote(ctx, i):
+    return reverse("parcels_api_quote"), {"parcels": [ctx.parcel_payload() for _ in range(20)]}
+
+
+def _parcel_update(ctx, i):
+    return reverse("parcels_api_update", args=[ctx.new_parcel().pk]), {"weight_kg": "2.500"}
+
+
+def _parcel_update_status(ctx, i):
+    return reverse("parcels_api_update_status", args=[ctx.new_parcel().pk]), {"status_code": "IN_TRANSIT"}
+
+
+def _parcel_bulk_update_status(ctx, i):
+    ids = [ctx.new_parcel().pk for _ in range(20)]
+    return reverse("parcels_api_bulk_update_status"), {"parcel_ids": ids, "status_code": "IN_TRANSIT"}
+
+
+def _parcel_delete(ctx, i):
+    return reverse("parcels_api_delete", args=[ctx.new_parcel().pk]), None
+
+
+def _client_parcels(role):
+    return lambda ctx, i: (reverse("reports_client_parcels", args=[ctx.client(i), role]), None)
+
+
+def _client_get(ctx, i):
+    return reverse("clients_api_get", args=[ctx.client(i)]), None
+
+
+def _client_create(ctx, i):
+    n = ctx.number()
+    return reverse("clients_api_create"), {
+        "first_name": "Benchmark", "last_name": f"Created {n}", "email": f"benchmark.created{n}@example.com",
+        "address": {"city": "Sofia", "street": "Vitosha Blvd 1", "postal_code": "1000"},
+    }
+
+
+def _client_update(ctx, i):
+    return reverse("clients_api_update", args=[ctx.client(i)]), {"phone": f"+359 88 {i:07d}"}
+
+
+def _client_delete(ctx, i):
+    return reverse("clients_api_delete", args=[ctx.new_client().pk]), None
+
+
+def _employee_create(ctx, i):
+    n = ctx.number()
+    return reverse("employees_api_create"), {
+        "username": f"benchmark_created_{n}", "email": f"benchmark.created{n}@example.com",
+        "first_name": "Benchmark", "last_name": f"Created {n}", "employee_code": f"BENCHMARK-C{n}",
+        "employee_type": "OFFICE", "hire_date": "2024-01-01", "salary": "2000.00", "office_id": ctx.office.pk,
+    }
+
+
+def _employee_update(ctx, i):
+    return reverse("employees_api_update", args=[ctx.employee.pk]), {"phone": f"+359 88 {i:07d}"}
+
+
+def _employee_delete(ctx, i):
+    return reverse("employees_api_delete", args=[ctx.new_employee().pk]), None
+
+
+def _office_create(ctx, i):
+    n = ctx.number()
+    return reverse("offices_api_create"), {
+        "name": f"Benchmark Created {n}", "code": f"BENCHMARK-C{n}", "company_id": ctx.company.pk,
+        "address": {"city": "Sofia", "street": f"Benchmark St {n}", "postal_code": "1000"},
+    }
+
+
+def _office_update(ctx, i):
+    return reverse("offices_api_update", args=[ctx.office.pk]), {"working_hours": f"09:00-{17 + i % 3}:00"}
+
+
+def _office_delete(ctx, i):
+    return reverse("offices_api_delete", args=[ctx.new_office().pk]), None
+
+
+SCENARIOS = [
+    Scenario("track_parcel_api", _track, user="anonymous"),
+    Scenario("metadata_api", _get("metadata_api")),
+
+    Scenario("parcels_api_list", _get("parcels_api_list")),
+    Scenario("parcels_api_list?status", _get("parcels_api_list", query="?status=IN_TRANSIT")),
+    Scenario("parcels_api_search", _parcel_search()),
+    Scenario("parcels_api_search?status", _parcel_search("&status=IN_TRANSIT")),
+    Scenario("parcels_api_get", _parcel_get),
+    Scenario("parcels_api_quote", _parcel_quote, "POST"),
+    Scenario("parcels_api_create", _parcel_create, "POST"),
+    Scenario("parcels_api_bulk_create", _parcel_bulk_create, "POST"),
+    Scenario("parcels_api_update", _parcel_update, "PATCH"),
+    Scenario("parcels_api_update_status", _parcel_update_status, "POST"),
+    Scenario("parcels_api_bulk_update_status", _parcel_bulk_update_status, "POST"),
+    Scenario("parcels_api_delete", _parcel_delete, "DELETE"),
+
+    Scenario("reports_client", _get("reports_client")),
+    Scenario("reports_client_parcels_all", _get("reports_client_parcels_all", "all")),
+    Scenario("reports_client_parcels?sent", _client_parcels("sent")),
+    Scenario("reports_client_parcels?received", _client_parcels("received")),
+    Scenario("reports_employees", _get("reports_employees")),
+    Scenario("reports_parcels_by_employee_all", _get("reports_parcels_by_employee_all")),
+    Scenario("reports_parcels_by_employee", lambda ctx, i: (
+        reverse("reports_parcels_by_employee", args=[ctx.employee.pk]), None
+    )),
+    Scenario("reports_pending_deliveries", _get("reports_pending_deliveries")),
+    Scenario("reports_pending_deliveries_summary", _get("reports_pending_deliveries_summary")),
+    Scenario("reports_income", _get("reports_income")),
+    Scenario("reports_income?parcels", _get("reports_income", query="?parcels=1")),
+
+    Scenario("clients_api_list", _get("clients_api_list")),
+    Scenario("clients_api_list?q", _get("clients_api_list", query="?q=ivan")),
+    Scenario("clients_api_search", _get("clients_api_search", query="?q=petr")),
+    Scenario("clients_api_get", _client_get),
+    Scenario("clients_api_create", _client_create, "POST"),
+    Scenario("clients_api_update", _client_update, "PUT"),
+    Scenario("clients_api_delete", _client_delete, "DELETE"),
+
+    Scenario("employees_api_list", _get("employees_api_list")),
+    Scenario("employees_api_create", _employee_create, "POST"),
+    Scenario("employees_api_update", _employee_update, "PATCH"),
+    Scenario("employees_api_delete", _employee_delete, "DELETE"),
+
+    Scenario("offices_api_list", _get("offices_api_list")),
+    Scenario("offices_api_create", _office_create, "POST"),
+    Scenario("offices_api_update", _office_update, "PATCH"),
+    Scenario("offices_api_delete", _office_delete, "DELETE"),
+]
+
+
+def admin_scenarios():
+    """A changelist scenario for every model registered with the admin site."""
+    scenarios = []
+    for model in admin.site._registry:
+        name = f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist"
+        scenarios.append(Scenario(name, _get(name), user="admin"))
+    return sorted(scenarios, key=lambda s: s.name)
+
+
+def all_scenarios():
+    return SCENARIOS + admin_scenarios()
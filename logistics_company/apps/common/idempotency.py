@@ -0,0 +1,163 @@
+"""
+Idempotency keys for the mutating JSON APIs.
+
+A client that may retry a request (a handheld scanner on a flaky network)
+sends an Idempotency-Key header with a value it generates once per
+operation, e.g. a UUID, and repeats it on every retry. A view declares that
+it honors the header:
+
+    @idempotent
+    def parcels_api_create(request): ...
+
+The first request with a key runs the view and stores its response; a
+retry gets the stored response, with an Idempotent-Replayed header, without
+the view running again. Keys are per user. A key reused for a different
+request (method, path or body) gets 422. Requests without the header are
+not affected.
+
+The keys live in the IdempotencyKey table, so they are shared by all worker
+processes. The key row is inserted, the view runs and its response is
+stored in one transaction, so a response is kept exactly when the view's
+writes commit: a crash in between leaves neither. A concurrent retry's
+insert of the same key waits on the unique index until the first request
+commits, then gets its response. A request that fails with an exception
+rolls back with its key; one that ends in a 5xx response keeps its writes
+but drops its key, so its retry runs the view again.
+
+Responses are kept for KEY_TTL. Expired rows are deleted by the process
+that next stores a response, at most once per PURGE_INTERVAL, after its
+transaction has committed. The view runs inside the request's
+transaction, so the numbers it allocates are reserved one request at a
+time (see apps/parcels/numbers.py).
+"""
+import hashlib
+import re
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+KEY_TTL = 24 * 60 * 60
+PURGE_INTERVAL = 60
+
+_VALID_KEY = re.compile(r"[\x21-\x7e]{1,255}")
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyKeyStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def claim(self, digest, fingerprint, endpoint=""):
+        """
+        Claim `digest` for a request, inside the transaction the view runs
+        in. Returns None when claimed (the caller runs the view), else the
+        IdempotencyKey of the earlier request.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=KEY_TTL)
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    digest=digest, fingerprint=fingerprint, endpoint=endpoint, expires_at=expires_at
+                )
+            return None
+        except IntegrityError:
+            pass
+
+        existing = IdempotencyKey.objects.filter(digest=digest).first()
+        if existing is not None and existing.expires_at > now:
+            return existing
+        # Expired (or purged since the insert above): take it over unless
+        # a concurrent request just did
+        taken = IdempotencyKey.objects.filter(digest=digest, expires_at__lte=now).update(
+            fingerprint=fingerprint, endpoint=endpoint, status_code=None, body=b"", expires_at=expires_at,
+        )
+        if taken:
+            return None
+        return IdempotencyKey.objects.filter(digest=digest).first() or self.claim(digest, fingerprint, endpoint)
+
+    def store(self, digest, response):
+        """Keep `response` for retries, or release the key if it is not worth replaying."""
+        if response.status_code >= 500 or response.streaming:
+            self.release(digest)
+            return
+        IdempotencyKey.objects.filter(digest=digest).update(
+            status_code=response.status_code,
+            body=response.content,
+            expires_at=timezone.now() + timedelta(seconds=KEY_TTL),
+        )
+
+    def release(self, digest):
+        IdempotencyKey.objects.filter(digest=digest).delete()
+
+    def purge(self):
+        """Delete the expired keys, at most once per PURGE_INTERVAL."""
+        with self._lock:
+            if time.monotonic() - self._purged_at < PURGE_INTERVAL:
+                return
+            self._purged_at = time.monotonic()
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+keys = IdempotencyKeyStore()
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return JsonResponse({
+            "success": False,
+            "error": f"{HEADER} was already used for a different request."
+        }, status=422)
+    response = HttpResponse(bytes(record.body), status=record.status_code, content_type="application/json")
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(view):
+    """Honor the Idempotency-Key header on a view that returns JSON responses."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(request, *args, **kwargs)
+        if not _VALID_KEY.fullmatch(key):
+            return JsonResponse({
+                "success": False,
+                "error": f"{HEADER} must be 1 to 255 printable ASCII characters."
+            }, status=400)
+
+        digest = _sha256(request.user.pk, key)
+        fingerprint = _sha256(request.method, request.get_full_path(), request.body)
+        endpoint = request.resolver_match.view_name if request.resolver_match else request.path
+        # The claim, the view's writes and the stored response commit or
+        # roll back together
+        with transaction.atomic():
+            earlier = keys.claim(digest, fingerprint, endpoint[:100])
+            if earlier is not None:
+                return _replay(earlier, fingerprint)
+            response = view(request, *args, **kwargs)
+            keys.store(digest, response)
+        keys.purge()
+        return response
+
+    return wrapper
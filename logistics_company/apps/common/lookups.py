@@ -0,0 +1,89 @@
+"""
+Process-local cache of the lookup sets behind the form dropdowns.
+
+The parcels, employees and offices pages all need the same small sets:
+offices, companies, parcel statuses (with the statuses each may change to),
+delivery types and employee types.
+They are served once by the metadata endpoint (/api/metadata/) instead of
+with every list response. The JSON body is built once per process and kept
+together with an ETag, a hash of that body, so a browser that already has
+the current sets gets a 304 Not Modified:
+
+    from apps.common.lookups import lookups
+
+    body, etag = lookups.get()
+
+Clients are not part of these sets; forms look them up with the typeahead
+search endpoint (people/api/clients/search/).
+
+post_save/post_delete signals on Company, Office, ParcelStatus and
+ParcelStatusTransition clear the cache in the process that made the change
+(see signals.py); other worker processes rebuild it after MAX_AGE seconds
+at the latest. Changes made with
+QuerySet.update() bypass the signals and are only picked up by that rebuild.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.organizations.models import Company, Office
+from apps.parcels.registry import statuses
+from apps.workforce.models import Employee
+
+from .models import DeliveryType
+
+
+def build_lookups():
+    """The lookup sets, as the metadata endpoint returns them."""
+    return {
+        "success": True,
+        "offices": [
+            {"id": o["id"], "name": o["name"], "code": o["code"], "company_id": o["company_id"], "company": o["company__name"]}
+            for o in Office.objects.order_by("name", "id").values("id", "name", "code", "company_id", "company__name")
+        ],
+        "companies": list(Company.objects.order_by("name", "id").values("id", "name")),
+        "statuses": [
+            {
+                "code": s.code,
+                "name": s.name,
+                "is_terminal": s.is_terminal,
+                "deletable": s.pk in statuses.deletable_ids(),
+                "next": [n.code for n in statuses.next_statuses(s.pk)],
+            }
+            for s in statuses.all()
+        ],
+        "delivery_types": [{"value": dt.value, "label": dt.label} for dt in DeliveryType],
+        "employee_types": [{"value": et.value, "label": et.label} for et in Employee.EmployeeType],
+    }
+
+
+class LookupCache:
+    MAX_AGE = 5 * 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = None
+        self._loaded_at = 0.0
+
+    def get(self):
+        """Return (JSON body as bytes, quoted ETag) of the current lookup sets."""
+        entry = self._entry
+        if entry is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+            with self._lock:
+                if self._entry is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+                    body = json.dumps(build_lookups(), cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+                    etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+                    self._entry = (body, etag)
+                    self._loaded_at = time.monotonic()
+                entry = self._entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entry = None
+
+
+lookups = LookupCache()
@@ -0,0 +1,313 @@
+"""
+Load-testing volumes for `seed_data --scale N`.
+
+Generates N clients, offices in proportion (tens to a few hundred, grouped
+into companies with one tariff per delivery type), three employees per
+office and, by default, ten parcels per client with status histories and
+notes. Everything is inserted in batches:
+
+- users, offices and the other reference rows with bulk_create(); their
+  passwords are hashed once and the hash is shared by every generated user
+- parcels, status history and notes, the bulk of the volume, as plain
+  tuples with executemany() (see insert_rows())
+- parcel ids are assigned up front, so history and note rows can be
+  generated together with their parcels without reading anything back
+- parcel rows are generated in chunks by _synthetic_rows, optionally in a
+  pool of worker processes, while the command inserts the previous chunk
+- the same --seed gives the same rows, relative to the day the command runs
+
+The generated users, offices and companies use a "load" prefix so they
+never collide with the static sample data.
+"""
+import multiprocessing
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from apps.accounts.models import User, UserRole
+from apps.common.models import Address, DeliveryType, Tariff
+from apps.organizations.models import Company, Office
+from apps.parcels.models import Parcel, ParcelNote, ParcelStatus, ParcelStatusHistory
+from apps.workforce.models import Employee
+
+from . import _synthetic_rows as rows
+
+
+USERNAME_PREFIX = "load_"
+
+CITIES = (
+    ("Sofia", "1000"), ("Plovdiv", "4000"), ("Varna", "9000"), ("Burgas", "8000"), ("Ruse", "7000"),
+    ("Stara Zagora", "6000"), ("Pleven", "5800"), ("Sliven", "8800"), ("Dobrich", "9300"),
+    ("Shumen", "9700"), ("Pernik", "2300"), ("Haskovo", "6300"), ("Yambol", "8600"),
+    ("Pazardzhik", "4400"), ("Blagoevgrad", "2700"), ("Veliko Tarnovo", "5000"), ("Vratsa", "3000"),
+    ("Gabrovo", "5300"), ("Vidin", "3700"), ("Montana", "3400"),
+)
+STREETS = (
+    "Vitosha Blvd", "Tsar Simeon", "Graf Ignatiev", "Rakovski", "Alexander Stamboliyski",
+    "Vasil Levski", "Hristo Botev", "Knyaz Boris I", "Slivnitsa", "Maria Luiza",
+)
+FIRST_NAMES = (
+    "Ivan", "Georgi", "Dimitar", "Nikolay", "Petar", "Stefan", "Viktor", "Martin", "Aleksandar", "Hristo",
+    "Maria", "Elena", "Anna", "Ivana", "Gergana", "Desislava", "Teodora", "Nikol", "Radostina", "Vesela",
+)
+LAST_NAMES = (
+    "Ivanov", "Georgiev", "Dimitrov", "Petrov", "Nikolov", "Hristov", "Stoyanov", "Todorov", "Kolev",
+    "Marinov", "Ivanova", "Georgieva", "Dimitrova", "Petrova", "Nikolova", "Todorova", "Koleva", "Marinova",
+)
+
+CLIENT_PASSWORD = "client123"
+EMPLOYEE_PASSWORD = "employee123"
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """
+    INSERT plain value tuples into `model`'s table with executemany().
+
+    bulk_create() prepares every value of every object through the field
+    API, which caps it at a couple of thousand parcels per second. The
+    generated rows only need datetimes and decimals adapted for the backend.
+    Values go in as given: auto_now_add and defaults do not apply.
+    """
+    ops = connection.ops
+    model_fields = [model._meta.get_field(name) for name in fields]
+    adapters = []
+    for i, field in enumerate(model_fields):
+        if isinstance(field, models.DateTimeField):
+            adapters.append((i, ops.adapt_datetimefield_value))
+        elif isinstance(field, models.DecimalField):
+            adapters.append((i, partial(
+                ops.adapt_decimalfield_value, max_digits=field.max_digits, decimal_places=field.decimal_places
+            )))
+
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        ops.quote_name(model._meta.db_table),
+        ", ".join(ops.quote_name(field.column) for field in model_fields),
+        ", ".join(["%s"] * len(model_fields)),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = []
+            for row in rows[start:start + batch_size]:
+                row = list(row)
+                for i, adapt in adapters:
+                    if row[i] is not None:
+                        row[i] = adapt(row[i])
+                batch.append(row)
+            cursor.executemany(sql, batch)
+
+
+def default_office_count(clients):
+    return max(10, min(500, clients // 200))
+
+
+class SyntheticData:
+    def __init__(self, clients, parcels=None, offices=None, seed=42, workers=0,
+                 batch_size=5000, chunk_size=50000, days=365, stdout=None):
+        self.clients = clients
+        self.parcels = clients * 10 if parcels is None else parcels
+        self.offices = offices or default_office_count(clients)
+        self.seed = seed
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.days = days
+        self.stdout = stdout
+        self.rng = random.Random(seed)
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def generate(self):
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise ValueError("Synthetic data is already present; run seed_data with --clear first.")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            statuses = {s.code: s.pk for s in ParcelStatus.objects.all()}
+            companies, tariffs, offices = self._create_organizations()
+            staff, couriers = self._create_employees(offices)
+            clients = self._create_clients()
+        self.log(f"  reference data: {time.perf_counter() - started:.1f}s")
+
+        if self.parcels and clients:
+            self._create_parcels({
+                "seed": self.seed,
+                "parcels": self.parcels,
+                "chunk_size": self.chunk_size,
+                "first_id": (Parcel.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1,
+                "clients": clients,
+                "offices": offices,
+                "staff": staff,
+                "couriers": couriers,
+                "statuses": statuses,
+                "tariffs": tariffs,
+                "since": self._until() - timedelta(days=self.days),
+                "until": self._until(),
+            })
+        self.log(f"  total: {time.perf_counter() - started:.1f}s")
+
+    def _until(self):
+        # Relative to the start of today, so a rerun on the same day is identical
+        return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _addresses(self, count):
+        rng = self.rng
+        addresses = []
+        for _ in range(count):
+            city, postal_code = rng.choice(CITIES)
+            addresses.append(Address(
+                country="Bulgaria",
+                city=city,
+                postal_code=postal_code,
+                street=f"{rng.choice(STREETS)} {rng.randint(1, 250)}",
+            ))
+        return Address.objects.bulk_create(addresses, batch_size=self.batch_size)
+
+    def _create_organizations(self):
+        """Return [(company id)], {(company id, delivery type): tariff id} and [(office id, company id)]."""
+        company_count = max(1, self.offices // 50)
+        company_addresses = self._addresses(company_count)
+        companies = Company.objects.bulk_create([
+            Company(
+                name=f"Load Logistics {i + 1}",
+                bulstat=f"LOAD{i + 1:09d}",
+                phone=f"+359 2 {i + 1:07d}",
+                address=address,
+            )
+            for i, address in enumerate(company_addresses)
+        ])
+
+        tariffs = Tariff.objects.bulk_create([
+            Tariff(
+                company=company,
+                delivery_type=delivery_type,
+                price_per_kg=Decimal(price) + Decimal(self.rng.randint(0, 150)).scaleb(-2),
+            )
+            for company in companies
+            for delivery_type, price in ((DeliveryType.STANDARD, "4.50"), (DeliveryType.EXPRESS, "8.00"))
+        ])
+
+        office_addresses = self._addresses(self.offices)
+        offices = Office.objects.bulk_create([
+            Office(
+                company=companies[i % company_count],
+                name=f"{address.city} {i + 1}",
+                code=f"LOAD-{i + 1:04d}",
+                phone=f"+359 2 {9000000 + i:07d}",
+                address=address,
+                working_hours="08:30-18:30",
+            )
+            for i, address in enumerate(office_addresses)
+        ], batch_size=self.batch_size)
+
+        self.log(f"  {len(companies)} companies, {len(offices)} offices")
+        return (
+            [c.pk for c in companies],
+            {(t.company_id, t.delivery_type): t.pk for t in tariffs},
+            [(o.pk, o.company_id) for o in offices],
+        )
+
+    def _names(self, i):
+        return FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[(i // len(FIRST_NAMES) + i) % len(LAST_NAMES)]
+
+    def _create_employees(self, offices):
+        """Create a manager, an office clerk and a courier per office."""
+        password = make_password(EMPLOYEE_PASSWORD)
+        types = (Employee.EmployeeType.MANAGER, Employee.EmployeeType.OFFICE, Employee.EmployeeType.COURIER)
+        users = []
+        for i in range(len(offices) * len(types)):
+            first_name, last_name = self._names(i)
+            users.append(User(
+                username=f"{USERNAME_PREFIX}employee_{i + 1}",
+                email=f"load.employee{i + 1}@example.com",
+                first_name=first_name,
+                last_name=last_name,
+                phone=f"+359 87 {i + 1:07d}",
+                role=UserRole.EMPLOYEE,
+                password=password,
+            ))
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+
+        employees = []
+        for i, user in enumerate(users):
+            office_id, _ = offices[i // len(types)]
+            employees.append(Employee(
+                user=user,
+                employee_code=f"LOAD-E{i + 1:06d}",
+                employee_type=types[i % len(types)],
+                office_id=office_id,
+                hire_date=date(2020, 1, 1) + timedelta(days=self.rng.randrange(1800)),
+                salary=Decimal(self.rng.randrange(1500, 4000)),
+            ))
+        Employee.objects.bulk_create(employees, batch_size=self.batch_size)
+
+        staff, couriers = {}, {}
+        for employee in employees:
+            if employee.employee_type == Employee.EmployeeType.COURIER:
+                couriers.setdefault(employee.office_id, []).append(employee.pk)
+            else:
+                staff.setdefault(employee.office_id, []).append(employee.pk)
+        self.log(f"  {len(employees)} employees")
+        return staff, couriers
+
+    def _create_clients(self):
+        """Return [(user id, default address id)] of the new clients."""
+        password = make_password(CLIENT_PASSWORD)
+        clients = []
+        for start in range(0, self.clients, self.batch_size):
+            count = min(self.batch_size, self.clients - start)
+            addresses = self._addresses(count)
+            users = []
+            for offset, address in enumerate(addresses):
+                i = start + offset
+                first_name, last_name = self._names(i)
+                users.append(User(
+                    username=f"{USERNAME_PREFIX}client_{i + 1}",
+                    email=f"load.client{i + 1}@example.com",
+                    first_name=first_name,
+                    last_name=last_name,
+                    phone=f"+359 88 {i + 1:07d}",
+                    role=UserRole.CLIENT,
+                    default_address=address,
+                    preferred_address=address,
+                    password=password,
+                ))
+            clients += [(u.pk, u.default_address_id) for u in User.objects.bulk_create(users)]
+        self.log(f"  {len(clients)} clients")
+        return clients
+
+    def _chunks(self, context):
+        """Yield the generated chunks in order, from a worker pool if requested."""
+        indexes = range((self.parcels + self.chunk_size - 1) // self.chunk_size)
+        if self.workers > 1:
+            with multiprocessing.Pool(self.workers, initializer=rows.init_worker, initargs=(context,)) as pool:
+                yield from pool.imap(rows.generate_chunk, indexes)
+        else:
+            for index in indexes:
+                yield rows.generate_chunk(index, context)
+
+    def _create_parcels(self, context):
+        started = time.perf_counter()
+        done = 0
+        for parcels, history, notes in self._chunks(context):
+            # One transaction per chunk: an interrupted run keeps whole parcels only
+            with transaction.atomic():
+                insert_rows(Parcel, rows.PARCEL_FIELDS, parcels, self.batch_size)
+                insert_rows(ParcelStatusHistory, rows.HISTORY_FIELDS, history, self.batch_size)
+                insert_rows(ParcelNote, rows.NOTE_FIELDS, notes, self.batch_size)
+            done += len(parcels)
+            elapsed = time.perf_counter() - started
+            self.log(f"  {done}/{self.parcels} parcels ({done / elapsed:,.0f}/s)")
+
+        # The ids were set explicitly; move the sequence past them (PostgreSQL)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Parcel]):
+                cursor.execute(sql)
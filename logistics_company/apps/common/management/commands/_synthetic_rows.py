@@ -0,0 +1,165 @@
+"""
+Row generation for `seed_data --scale`.
+
+Plain Python with no Django imports, so chunks can be generated in worker
+processes (including spawned ones) and pickled back to the command. Each
+chunk is generated from its own random.Random seeded with (seed, chunk
+index), so the rows are the same whatever the number of workers.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+
+# status code -> statuses a parcel passed through to reach it
+STATUS_PATHS = {
+    "CREATED": ("CREATED",),
+    "IN_TRANSIT": ("CREATED", "IN_TRANSIT"),
+    "OUT_FOR_DELIVERY": ("CREATED", "IN_TRANSIT", "OUT_FOR_DELIVERY"),
+    "DELIVERED": ("CREATED", "IN_TRANSIT", "OUT_FOR_DELIVERY", "DELIVERED"),
+    "RETURNED": ("CREATED", "IN_TRANSIT", "OUT_FOR_DELIVERY", "RETURNED"),
+    "CANCELLED": ("CREATED", "CANCELLED"),
+}
+
+HISTORY_NOTES = {
+    "CREATED": "Parcel registered",
+    "IN_TRANSIT": "Picked up from sender office",
+    "OUT_FOR_DELIVERY": "Out for delivery",
+    "DELIVERED": "Delivered to recipient",
+    "RETURNED": "Recipient not available, returned to sender",
+    "CANCELLED": "Cancelled by sender request",
+}
+
+# (note type, content) of the notes attached to a few parcels
+NOTES = (
+    ("DELIVERY", "Please call before delivery."),
+    ("DELIVERY", "Customer prefers afternoon delivery."),
+    ("DELIVERY", "Leave with the neighbour if nobody is home."),
+    ("ISSUE", "Packaging damaged on arrival at the office."),
+    ("ISSUE", "Delivery attempt failed, recipient not home."),
+    ("GENERAL", "Fragile contents."),
+    ("GENERAL", "Sender asked for a confirmation call."),
+)
+NOTE_RATE = 0.05
+
+# Share of the current statuses by parcel age: parcels older than a week
+# are almost all settled, recent ones are still moving.
+SETTLED_AFTER = timedelta(days=7)
+SETTLED_STATUSES = (("DELIVERED", 0.90), ("RETURNED", 0.06), ("CANCELLED", 0.04))
+RECENT_STATUSES = (
+    ("CREATED", 0.20), ("IN_TRANSIT", 0.30), ("OUT_FOR_DELIVERY", 0.15),
+    ("DELIVERED", 0.28), ("RETURNED", 0.02), ("CANCELLED", 0.05),
+)
+
+EXPRESS_SHARE = 0.3
+OFFICE_PICKUP_SHARE = 0.85
+
+PARCEL_FIELDS = (
+    "id", "tracking_number", "company_id", "sender_id", "receiver_id", "sender_office_id",
+    "receiver_office_id", "pickup_address_id", "delivery_address_id", "delivery_type", "weight_kg",
+    "tariff_id", "current_status_id", "registered_by_id", "created_at", "delivered_at", "version",
+)
+HISTORY_FIELDS = ("parcel_id", "status_id", "office_id", "changed_by_id", "note", "created_at")
+NOTE_FIELDS = ("parcel_id", "note_type", "content", "created_by_id", "created_at")
+
+_context = None
+
+
+def init_worker(context):
+    """Pool initializer: keep the shared context in the worker process."""
+    global _context
+    _context = context
+
+
+def _pick(rng, weighted):
+    roll = rng.random()
+    for value, share in weighted:
+        roll -= share
+        if roll < 0:
+            return value
+    return weighted[-1][0]
+
+
+def _weight(rng):
+    # Mostly small parcels with a long tail, in grams, at least 50 g
+    grams = max(50, int(rng.lognormvariate(7.3, 0.9)))
+    return Decimal(grams).scaleb(-3)
+
+
+def generate_chunk(index, context=None):
+    """
+    Return (parcel rows, history rows, note rows) for chunk `index`, as tuples
+    in PARCEL_FIELDS, HISTORY_FIELDS and NOTE_FIELDS order.
+    """
+    context = context or _context
+    rng = random.Random(context["seed"] * 1_000_003 + index)
+
+    start = index * context["chunk_size"]
+    stop = min(start + context["chunk_size"], context["parcels"])
+    clients = context["clients"]  # [(user id, default address id)]
+    offices = context["offices"]  # [(office id, company id)]
+    staff = context["staff"]  # office id -> employee ids registering parcels
+    couriers = context["couriers"]  # office id -> courier employee ids
+    status_ids = context["statuses"]  # code -> id
+    tariffs = context["tariffs"]  # (company id, delivery type) -> tariff id
+    until = context["until"]
+    span = (until - context["since"]).total_seconds()
+
+    parcels, history, notes = [], [], []
+    for number in range(start, stop):
+        parcel_id = context["first_id"] + number
+        # Spread creation times evenly over the period, in id order
+        created_at = context["since"] + timedelta(seconds=span * (number + rng.random()) / context["parcels"])
+
+        sender, receiver = rng.sample(clients, 2) if len(clients) > 1 else (clients[0], clients[0])
+        sender_office, sender_company = rng.choice(offices) if rng.random() < OFFICE_PICKUP_SHARE else (None, None)
+        receiver_office, receiver_company = rng.choice(offices) if rng.random() < OFFICE_PICKUP_SHARE else (None, None)
+        company = sender_company or receiver_company or offices[0][1]
+        delivery_type = "EXPRESS" if rng.random() < EXPRESS_SHARE else "STANDARD"
+        registering_office = sender_office or offices[rng.randrange(len(offices))][0]
+        registered_by = rng.choice(staff[registering_office])
+
+        weighted = SETTLED_STATUSES if until - created_at > SETTLED_AFTER else RECENT_STATUSES
+        status = _pick(rng, weighted)
+
+        # One history entry per status passed, a few hours apart
+        at = created_at
+        delivered_at = None
+        for step, code in enumerate(STATUS_PATHS[status]):
+            if step:
+                at = min(at + timedelta(hours=rng.uniform(2, 30)), until)
+            if code in ("OUT_FOR_DELIVERY", "DELIVERED"):
+                office = receiver_office or sender_office
+                changed_by = rng.choice(couriers[office]) if office in couriers else registered_by
+            else:
+                office = sender_office
+                changed_by = registered_by
+            history.append((parcel_id, status_ids[code], office, changed_by, HISTORY_NOTES[code], at))
+            if code == "DELIVERED":
+                delivered_at = at
+
+        parcels.append((
+            parcel_id,
+            f"SYN{parcel_id:012d}",
+            company,
+            sender[0],
+            receiver[0],
+            sender_office,
+            receiver_office,
+            None if sender_office else sender[1],
+            None if receiver_office else receiver[1],
+            delivery_type,
+            _weight(rng),
+            tariffs.get((company, delivery_type)),
+            status_ids[status],
+            registered_by,
+            created_at,
+            delivered_at,
+            1,
+        ))
+
+        if rng.random() < NOTE_RATE:
+            note_type, content = rng.choice(NOTES)
+            notes.append((parcel_id, note_type, content, registered_by, created_at + timedelta(minutes=rng.randint(1, 600))))
+
+    return parcels, history, notes
@@ -0,0 +1,99 @@
+import fnmatch
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.benchmarks.compare import compare_results
+from apps.common.benchmarks.runner import run_benchmarks
+from apps.common.benchmarks.scenarios import all_scenarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, query count and peak memory of every JSON endpoint, report and admin "
+        "changelist at several dataset scales, or compare two results files (--compare) and fail "
+        "on regressions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", default="100,1000",
+            help="Comma-separated numbers of synthetic clients (10 parcels each), e.g. 100,1000,10000",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed requests per scenario")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--only", action="append", default=[],
+            help="Run the scenarios matching this pattern, e.g. 'parcels_api_*' (repeatable)",
+        )
+        parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument(
+            "--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+            help="Compare two results files instead of running the benchmarks",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=0.25,
+            help="Relative p50 latency and peak memory increase counted as a regression",
+        )
+
+    def handle(self, *args, **options):
+        if options["compare"]:
+            return self.compare(*options["compare"], options["threshold"], options["verbosity"])
+
+        scenarios = all_scenarios()
+        if options["only"]:
+            scenarios = [s for s in scenarios if any(fnmatch.fnmatch(s.name, p) for p in options["only"])]
+            if not scenarios:
+                raise CommandError("No scenario matches --only.")
+        if options["list"]:
+            for scenario in scenarios:
+                self.stdout.write(f"{scenario.method:<7} {scenario.name}")
+            return
+
+        try:
+            scales = [int(scale) for scale in options["scales"].split(",")]
+        except ValueError:
+            raise CommandError("--scales must be a comma-separated list of integers.")
+        if min(scales) < 2 or options["repeat"] < 1:
+            raise CommandError("Scales must be at least 2 and --repeat positive.")
+
+        results = run_benchmarks(scales, scenarios, repeat=options["repeat"], seed=options["seed"], log=self.stdout.write)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def compare(self, baseline_path, current_path, threshold, verbosity):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            with open(current_path) as f:
+                current = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read results: {e}")
+
+        rows, unmatched = compare_results(baseline, current, latency_threshold=threshold, memory_threshold=threshold)
+        self.stdout.write(
+            f"{'scale':>7} {'scenario':<52} {'p50 ms':>19} {'queries':>11} {'peak KiB':>19}"
+        )
+        for row in rows:
+            line = (
+                f"{row['scale']:>7} {row['endpoint']:<52} "
+                f"{row['p50_ms'][0]:>8.2f} -> {row['p50_ms'][1]:<8.2f}"
+                f"{row['queries'][0]:>4} -> {row['queries'][1]:<4}"
+                f"{row['peak_kib'][0]:>8.0f} -> {row['peak_kib'][1]:<8.0f}"
+            )
+            if row["regressions"]:
+                line = self.style.ERROR(f"{line} REGRESSION: {', '.join(row['regressions'])}")
+            self.stdout.write(line)
+        if unmatched:
+            self.stdout.write(f"{len(unmatched)} scenarios are in only one of the runs and were skipped.")
+            if verbosity > 1:
+                for key in unmatched:
+                    self.stdout.write(f"  {key}")
+
+        regressions = sum(1 for row in rows if row["regressions"])
+        if regressions:
+            raise CommandError(f"{regressions} of {len(rows)} scenarios regressed.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions in {len(rows)} scenarios."))
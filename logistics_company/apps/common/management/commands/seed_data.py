@@ -1,34 +1,82 @@
 from datetime import date
 from decimal import Decimal
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 
 from apps.accounts.models import User, UserRole
-from apps.common.models import Address, Tariff, DeliveryType
+from apps.common.models import Address, IdempotencyKey, Tariff, DeliveryType
 from apps.organizations.models import Company, Office
-from apps.parcels.models import Parcel, ParcelStatus, ParcelStatusHistory, ParcelNote
+from apps.parcels.counters import rebuild_parcel_counters
+from apps.parcels.models import (
+    DailyIncomeRollup, Parcel, ParcelSearch, ParcelStatus, ParcelStatusCount, ParcelStatusHistory, ParcelNote
+)
+from apps.parcels.registry import create_standard_transitions
+from apps.parcels.rollups import rebuild_income_rollups
+from apps.parcels.search import rebuild_parcel_search
 from apps.workforce.models import Employee
+from apps.common.versions import touch
+
+from ._synthetic import SyntheticData
 
 
 class Command(BaseCommand):
-    help = "Seed database with static sample data for POC"
+    help = (
+        "Seed database with static sample data for POC. With --scale N, also generate "
+        "N clients and load-testing volumes of offices, employees and parcels."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--clear", action="store_true", help="Clear existing data")
+        parser.add_argument("--scale", type=int, default=0, help="Number of synthetic clients to generate")
+        parser.add_argument("--parcels", type=int, help="Synthetic parcels (default: 10 per client)")
+        parser.add_argument("--offices", type=int, help="Synthetic offices (default: clients / 200, 10 to 500)")
+        parser.add_argument("--days", type=int, default=365, help="Spread parcels over this many past days")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic data")
+        parser.add_argument("--workers", type=int, default=0, help="Processes generating parcel rows")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT")
 
     def handle(self, *args, **options):
+        if options["scale"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--scale must not be negative and --batch-size must be positive.")
         if options["clear"]:
             self.clear_data()
         with transaction.atomic():
             self.seed_data()
+
+        if options["scale"]:
+            self.stdout.write(f"Generating synthetic data for {options['scale']} clients...")
+            try:
+                SyntheticData(
+                    clients=options["scale"],
+                    parcels=options["parcels"],
+                    offices=options["offices"],
+                    seed=options["seed"],
+                    workers=options["workers"],
+                    batch_size=options["batch_size"],
+                    days=options["days"],
+                    stdout=self.stdout,
+                ).generate()
+            except ValueError as e:
+                raise CommandError(str(e))
+            # bulk_create() sends no signals
+            touch("parcels", "users", "employees", "offices", "companies", "addresses", "tariffs")
+
+        rebuild_income_rollups()
+        rebuild_parcel_counters()
+        rebuild_parcel_search()
         self.stdout.write(self.style.SUCCESS("Seed complete."))
 
     def clear_data(self):
-        ParcelNote.objects.all().delete()
-        ParcelStatusHistory.objects.all().delete()
-        Parcel.objects.all().delete()
+        # The parcel tables can hold millions of rows. Delete them with plain
+        # DELETE statements instead of collecting every row for the cascades.
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in (
+                DailyIncomeRollup, ParcelStatusCount, ParcelSearch, ParcelNote, ParcelStatusHistory, Parcel
+            ):
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+        touch("parcels")
         ParcelStatus.objects.all().delete()
         Employee.objects.all().delete()
         Tariff.objects.all().delete()
@@ -36,6 +84,8 @@ class Command(BaseCommand):
         Company.objects.all().delete()
         User.objects.filter(is_superuser=False).delete()
         Address.objects.all().delete()
+        # Stored responses refer to the deleted rows
+        IdempotencyKey.objects.all().delete()
 
     def seed_data(self):
         self._create_admin()
@@ -112,13 +162,15 @@ class Command(BaseCommand):
             ("RETURNED",         "Returned",         "Returned to sender",  True),
             ("CANCELLED",        "Cancelled",        "Parcel cancelled",    True),
         ]
-        return {
+        by_code = {
             code: ParcelStatus.objects.get_or_create(
                 code=code,
                 defaults={"name": name, "description": desc, "is_terminal": is_terminal},
             )[0]
             for code, name, desc, is_terminal in data
         }
+        create_standard_transitions(by_code)
+        return by_code
 
     def _create_employees(self, offices):
         data = [
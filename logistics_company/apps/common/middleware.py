@@ -0,0 +1,184 @@
+"""
+Per-request query and latency instrumentation.
+
+PerfMiddleware samples a fraction of requests (settings.PERF_SAMPLE_RATE,
+0 turns it off) and records for each: the view name, the number of SQL
+queries, the total SQL time, repeated query fingerprints (the signature of
+an N+1) and the wall time. Sampled responses carry the figures in a
+Server-Timing header, which browser dev tools display, and every sample is
+added to a rolling per-view window that staff can read at /_perf/.
+
+Queries are timed with connection.execute_wrapper(), so DEBUG is not
+needed and unsampled requests pay nothing but a random() call.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+# Latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Query shape without parameter values: IN lists of any length collapse to one."""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", sql.strip()))
+
+
+class QueryRecorder:
+    """execute_wrapper() callback that counts and times the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """{fingerprint: count} of the queries that ran more than once."""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+class PerfStats:
+    """Rolling window of the last `window` samples per view, shared by all threads."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def add(self, view, wall_ms, sql_ms, queries, duplicates):
+        with self._lock:
+            self._samples[view].append((wall_ms, sql_ms, queries, duplicates))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        """Summary per view: latency percentiles and histogram, query counts and top duplicates."""
+        with self._lock:
+            samples = {view: list(window) for view, window in self._samples.items()}
+
+        views = {}
+        for view, rows in samples.items():
+            wall = sorted(row[0] for row in rows)
+            histogram = Counter()
+            for ms in wall:
+                bucket = next((f"<={b}ms" for b in LATENCY_BUCKETS_MS if ms <= b), f">{LATENCY_BUCKETS_MS[-1]}ms")
+                histogram[bucket] += 1
+            duplicates = Counter()
+            for row in rows:
+                for sql, count in row[3].items():
+                    duplicates[sql] += count
+            views[view] = {
+                "samples": len(rows),
+                "wall_ms": {
+                    "p50": _percentile(wall, 50),
+                    "p95": _percentile(wall, 95),
+                    "p99": _percentile(wall, 99),
+                    "max": round(wall[-1], 2),
+                },
+                "histogram": dict(histogram),
+                "queries": {
+                    "mean": round(sum(row[2] for row in rows) / len(rows), 2),
+                    "max": max(row[2] for row in rows),
+                },
+                "sql_ms_mean": round(sum(row[1] for row in rows) / len(rows), 2),
+                "duplicate_queries": [
+                    {"sql": sql, "count": count} for sql, count in duplicates.most_common(5)
+                ],
+            }
+        return views
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return round(sorted_values[index], 2)
+
+
+perf_stats = PerfStats(getattr(settings, "PERF_WINDOW", 500))
+
+
+class PerfMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PERF_SAMPLE_RATE", 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+
+        view = request.resolver_match.view_name if request.resolver_match else "<unresolved>"
+
+        if response.streaming:
+            # Most of the work of a streaming response happens while it is
+            # iterated; record the sample once the body has been sent.
+            response.streaming_content = self._finish_stream(
+                response.streaming_content, stack, recorder, view, started
+            )
+            response["Server-Timing"] = self._server_timing(recorder, started)
+            return response
+
+        stack.close()
+        response["Server-Timing"] = self._server_timing(recorder, started)
+        self._record(recorder, view, started)
+        return response
+
+    def _finish_stream(self, content, stack, recorder, view, started):
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self._record(recorder, view, started)
+
+    @staticmethod
+    def _server_timing(recorder, started):
+        wall_ms = (time.perf_counter() - started) * 1000
+        duplicates = sum(count - 1 for count in recorder.duplicates().values())
+        return (
+            f'total;dur={wall_ms:.1f}, '
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'dup;desc="{duplicates} repeated queries"'
+        )
+
+    @staticmethod
+    def _record(recorder, view, started):
+        perf_stats.add(
+            view,
+            wall_ms=(time.perf_counter() - started) * 1000,
+            sql_ms=recorder.duration * 1000,
+            queries=recorder.count,
+            duplicates=recorder.duplicates(),
+        )
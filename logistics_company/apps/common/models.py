@@ -37,4 +37,32 @@ class Tariff(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.company.name} - {self.get_delivery_type_display()} ({self.price_per_kg}/kg)"
\ No newline at end of file
+        return f"{self.company.name} - {self.get_delivery_type_display()} ({self.price_per_kg}/kg)"
+
+
+class IdempotencyKey(models.Model):
+    """A request made with an Idempotency-Key header and its response (see idempotency.py)."""
+
+    # sha256 of the user and the client's key
+    digest = models.CharField(max_length=64, primary_key=True)
+    # sha256 of the method, path and body of the request
+    fingerprint = models.CharField(max_length=64)
+    # Null while the request is being processed
+    status_code = models.PositiveSmallIntegerField(null=True)
+    body = models.BinaryField(default=b"")
+    expires_at = models.DateTimeField(db_index=True)
+    # View name of the request, for inspecting the table
+    endpoint = models.CharField(max_length=100, blank=True)
+
+    def __str__(self):
+        return f"{self.digest} ({self.endpoint})"
+
+
+class VersionStamp(models.Model):
+    """Version stamp of a table the list APIs read (see versions.py)."""
+
+    table = models.CharField(max_length=40, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.table} @ {self.version}"
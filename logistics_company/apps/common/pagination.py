@@ -0,0 +1,111 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds; a cursor needs the
+    # exact value or rows sharing that millisecond would be skipped.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Encode the ordering values of the last row into an opaque token."""
+    raw = json.dumps(values, cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a token produced by encode_cursor back into a list of values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor.")
+    if not isinstance(values, list):
+        raise InvalidCursor("Invalid cursor.")
+    return values
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse the ?limit= query parameter, clamping it to [1, maximum]."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer.")
+    return max(1, min(limit, maximum))
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of `queryset` using keyset (seek) pagination.
+
+    `ordering` is a tuple of local field names with an optional "-" prefix,
+    e.g. ("-created_at", "-id"). The last field must be unique so that the
+    ordering is total. Instead of OFFSET, each page continues with a
+    "row comparison" against the last row of the previous page, so the cost
+    of a page does not depend on how deep the client has paged.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    fields = [name.lstrip("-") for name in ordering]
+    descending = [name.startswith("-") for name in ordering]
+
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise InvalidCursor("Invalid cursor.")
+
+        model_fields = [queryset.model._meta.get_field(name) for name in fields]
+        try:
+            # clean() also applies the range validators, so an out of range
+            # integer is rejected here rather than by the database driver
+            values = [field.clean(value, None) for field, value in zip(model_fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor.")
+        if any(value is None for value in values):
+            raise InvalidCursor("Invalid cursor.")
+
+        # (a, b, c) > (x, y, z)  <=>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        seek = Q()
+        for i, name in enumerate(fields):
+            lookup = "lt" if descending[i] else "gt"
+            branch = Q(**{f"{name}__{lookup}": values[i]})
+            for j in range(i):
+                branch &= Q(**{fields[j]: values[j]})
+            seek |= branch
+        queryset = queryset.filter(seek)
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([_row_value(rows[-1], name) for name in fields])
+
+    return rows, next_cursor
@@ -0,0 +1,55 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Rows are joined into chunks of this size before being handed to the server,
+# so large reports are not written to the socket one tiny string at a time.
+ROWS_PER_WRITE = 500
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    Stream a JSON object whose `stream_key` member is a (possibly huge) list.
+
+    `data` holds the other members of the object and is written first.
+    `rows` may be any iterable, typically a generator over
+    `queryset.iterator(chunk_size=...)`, and is encoded one row at a time, so
+    peak memory does not grow with the size of the result. When `count_key`
+    is given, the number of streamed rows is written after the list, which
+    saves a separate COUNT(*) query.
+
+    The body is equivalent to JsonResponse({**data, stream_key: list(rows)}).
+    """
+
+    def __init__(self, data, stream_key, rows, count_key=None, encoder=DjangoJSONEncoder, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(
+            self._generate(data, stream_key, rows, count_key, encoder),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _generate(data, stream_key, rows, count_key, encoder):
+        dumps = encoder(separators=(", ", ": ")).encode
+
+        head = dumps(data)[:-1]  # drop the closing brace
+        if data:
+            head += ", "
+        yield f"{head}{dumps(stream_key)}: ["
+
+        count = 0
+        buffer = []
+        for row in rows:
+            buffer.append(dumps(row))
+            count += 1
+            if len(buffer) >= ROWS_PER_WRITE:
+                yield (", " if count > len(buffer) else "") + ", ".join(buffer)
+                buffer = []
+        if buffer:
+            yield (", " if count > len(buffer) else "") + ", ".join(buffer)
+
+        tail = "]"
+        if count_key:
+            tail += f", {dumps(count_key)}: {count}"
+        yield tail + "}"
+
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import User
+from apps.organizations.models import Company, Office
+from apps.parcels.models import Parcel, ParcelStatus, ParcelStatusTransition
+from apps.workforce.models import Employee
+
+from .lookups import lookups
+from .models import Address, Tariff
+from .tariffs import tariffs
+from .versions import touch
+
+
+@receiver(post_save, sender=Tariff)
+@receiver(post_delete, sender=Tariff)
+def clear_tariff_cache(sender, **kwargs):
+    tariffs.clear()
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Office)
+@receiver(post_delete, sender=Office)
+@receiver(post_save, sender=ParcelStatus)
+@receiver(post_delete, sender=ParcelStatus)
+@receiver(post_save, sender=ParcelStatusTransition)
+@receiver(post_delete, sender=ParcelStatusTransition)
+def clear_lookup_cache(sender, **kwargs):
+    lookups.clear()
+
+
+# Model -> version stamp it bumps (see versions.py)
+VERSIONED_TABLES = {
+    Parcel: "parcels",
+    User: "users",
+    Employee: "employees",
+    Office: "offices",
+    Company: "companies",
+    Address: "addresses",
+    Tariff: "tariffs",
+    ParcelStatus: "statuses",
+    ParcelStatusTransition: "statuses",
+}
+
+
+def touch_version(sender, using, update_fields=None, **kwargs):
+    # A login only stamps last_login, which no list shows
+    if sender is User and update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    touch(VERSIONED_TABLES[sender], using=using)
+
+
+for model in VERSIONED_TABLES:
+    post_save.connect(touch_version, sender=model, dispatch_uid=f"touch_version_{model._meta.label_lower}")
+    post_delete.connect(touch_version, sender=model, dispatch_uid=f"touch_version_{model._meta.label_lower}")
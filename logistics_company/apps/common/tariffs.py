@@ -0,0 +1,85 @@
+"""
+Process-local tariff cache and batched price quoting.
+
+Every parcel is priced from the tariff of its company and delivery type.
+The tariff table is small, so it is loaded once per process and kept as a
+(company_id, delivery_type) -> Tariff map:
+
+    from apps.common.tariffs import quote_prices, tariffs
+
+    tariff = tariffs.get(company_id, DeliveryType.EXPRESS)
+    prices = quote_prices([(company_id, "STANDARD", "1.500"), ...])
+
+post_save/post_delete signals on Tariff clear the cache in the process that
+made the change (see signals.py); other worker processes reload it after
+MAX_AGE seconds at the latest. Changes made with QuerySet.update() bypass
+the signals and are only picked up by that reload.
+"""
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from .models import Tariff
+
+
+class TariffCache:
+    MAX_AGE = 5 * 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = None
+        self._by_id = None
+        self._loaded_at = 0.0
+
+    def _tables(self):
+        by_key, by_id = self._by_key, self._by_id
+        if by_key is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+            with self._lock:
+                if self._by_key is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+                    loaded = list(Tariff.objects.all())
+                    self._by_id = {t.pk: t for t in loaded}
+                    self._by_key = {(t.company_id, t.delivery_type): t for t in loaded}
+                    self._loaded_at = time.monotonic()
+                by_key, by_id = self._by_key, self._by_id
+        return by_key, by_id
+
+    def get(self, company_id, delivery_type):
+        """Return the tariff of this company for this delivery type, or None."""
+        return self._tables()[0].get((company_id, delivery_type))
+
+    def by_id(self, pk):
+        """Return the tariff with this primary key, or None."""
+        return self._tables()[1].get(pk)
+
+    def clear(self):
+        with self._lock:
+            self._by_key = None
+            self._by_id = None
+
+
+tariffs = TariffCache()
+
+
+def quote_prices(items):
+    """
+    Price (company_id, delivery_type, weight_kg) tuples without touching the
+    database.
+
+    Returns a list of Decimal prices in the order of `items`; the price is
+    None when the company has no tariff for that delivery type or the weight
+    is not a positive number.
+    """
+    rates = tariffs._tables()[0]
+    prices = []
+    for company_id, delivery_type, weight_kg in items:
+        tariff = rates.get((company_id, delivery_type))
+        if tariff is None:
+            prices.append(None)
+            continue
+        try:
+            weight = weight_kg if isinstance(weight_kg, Decimal) else Decimal(str(weight_kg))
+        except (InvalidOperation, ValueError):
+            prices.append(None)
+            continue
+        prices.append(weight * tariff.price_per_kg if weight.is_finite() and weight > 0 else None)
+    return prices
@@ -0,0 +1,237 @@
+"""
+Test helpers: a fast fixture factory and query budgets.
+
+DataFactory creates rows with bulk_create() and gives every user the same
+unusable password (tests log in with force_login()), so a test can build
+thousands of parcels in well under a second:
+
+    factory = DataFactory()
+    office = factory.office()
+    sender, receiver = factory.clients(2)
+    factory.parcels(1000, offices=[office], clients=[sender, receiver])
+
+QueryBudgetMixin.assertQueryBudget() requests a URL and fails when it runs
+more queries than its budget, or, given `grow`, more queries after `grow`
+has added rows than before. A constant-query view that turns into an N+1
+fails the second check whatever its budget. Budgets are counted with the
+process caches (statuses, tariffs, lookups) warm, as in production.
+"""
+import itertools
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.models import User, UserRole
+from apps.common.lookups import lookups
+from apps.common.models import Address, DeliveryType, Tariff
+from apps.common.tariffs import tariffs
+from apps.organizations.models import Company, Office
+from apps.parcels.counters import adjust_counts, count_parcels
+from apps.parcels.models import Parcel, ParcelNote, ParcelStatus, ParcelStatusHistory
+from apps.parcels.registry import create_standard_transitions
+from apps.parcels.rollups import record_deliveries
+from apps.parcels.search import index_parcels
+from apps.workforce.models import Employee
+
+
+STATUSES = (
+    ("CREATED", "Created", False),
+    ("IN_TRANSIT", "In Transit", False),
+    ("OUT_FOR_DELIVERY", "Out for Delivery", False),
+    ("DELIVERED", "Delivered", True),
+    ("RETURNED", "Returned", True),
+    ("CANCELLED", "Cancelled", True),
+)
+
+
+class DataFactory:
+    """Builds related rows with sensible defaults; every call makes new, unique rows."""
+
+    def __init__(self):
+        self._numbers = itertools.count(1)
+        self.password = make_password(None)
+        self._statuses = None
+        self._company = None
+
+    def number(self):
+        return next(self._numbers)
+
+    def statuses(self):
+        """{code: ParcelStatus} of the standard statuses and their transitions, created once."""
+        if self._statuses is None:
+            self._statuses = {
+                code: ParcelStatus.objects.get_or_create(
+                    code=code, defaults={"name": name, "is_terminal": is_terminal}
+                )[0]
+                for code, name, is_terminal in STATUSES
+            }
+            create_standard_transitions(self._statuses)
+        return self._statuses
+
+    def addresses(self, count):
+        return Address.objects.bulk_create([
+            Address(country="Bulgaria", city="Sofia", postal_code="1000", street=f"Test Street {self.number()}")
+            for _ in range(count)
+        ])
+
+    def company(self):
+        """A new company with a STANDARD and an EXPRESS tariff."""
+        n = self.number()
+        company = Company.objects.create(name=f"Test Company {n}", bulstat=f"TEST{n:09d}", address=self.addresses(1)[0])
+        Tariff.objects.bulk_create([
+            Tariff(company=company, delivery_type=DeliveryType.STANDARD, price_per_kg=Decimal("5.00")),
+            Tariff(company=company, delivery_type=DeliveryType.EXPRESS, price_per_kg=Decimal("8.50")),
+        ])
+        # bulk_create() sends no signals to clear the process caches
+        tariffs.clear()
+        return company
+
+    def default_company(self):
+        if self._company is None:
+            self._company = self.company()
+        return self._company
+
+    def offices(self, count, company=None):
+        company = company or self.default_company()
+        numbers = [self.number() for _ in range(count)]
+        offices = Office.objects.bulk_create([
+            Office(company=company, name=f"Test Office {n}", code=f"TST-{n}", address=address)
+            for n, address in zip(numbers, self.addresses(count))
+        ])
+        lookups.clear()
+        return offices
+
+    def office(self, company=None):
+        return self.offices(1, company)[0]
+
+    def users(self, count, role, **fields):
+        numbers = [self.number() for _ in range(count)]
+        return User.objects.bulk_create([
+            User(
+                username=f"test_{role.lower()}_{n}",
+                email=f"test.{role.lower()}{n}@example.com",
+                first_name="Test",
+                last_name=f"{role.title()} {n}",
+                role=role,
+                password=self.password,
+                **fields,
+            )
+            for n in numbers
+        ])
+
+    def clients(self, count):
+        """Clients with a default address each."""
+        addresses = self.addresses(count)
+        users = self.users(count, UserRole.CLIENT)
+        for user, address in zip(users, addresses):
+            user.default_address = address
+        User.objects.bulk_update(users, ["default_address"])
+        return users
+
+    def employees(self, count, office=None, employee_type=Employee.EmployeeType.OFFICE):
+        office = office or self.office()
+        users = self.users(count, UserRole.EMPLOYEE)
+        return Employee.objects.bulk_create([
+            Employee(
+                user=user,
+                employee_code=f"TST-E{user.pk}",
+                employee_type=employee_type,
+                office=office,
+                hire_date=date(2024, 1, 1),
+                salary=Decimal("2000.00"),
+            )
+            for user in users
+        ])
+
+    def employee(self, office=None, employee_type=Employee.EmployeeType.OFFICE):
+        return self.employees(1, office, employee_type)[0]
+
+    def parcels(self, count, offices=None, clients=None, status="CREATED", registered_by=None,
+                delivery_type=DeliveryType.STANDARD, history=True, notes=False):
+        """
+        `count` parcels between the given offices and clients (new ones by
+        default), with a status history entry and optionally a note each.
+        The status counters, income rollups and search documents are kept
+        in step.
+        """
+        offices = offices or self.offices(2)
+        clients = clients or self.clients(2)
+        current = self.statuses()[status]
+        company = offices[0].company
+        tariff = Tariff.objects.filter(company=company, delivery_type=delivery_type).first()
+        delivered_at = timezone.now() if status == "DELIVERED" else None
+        weight_kg = Decimal("1.500")
+        delivered_price = weight_kg * tariff.price_per_kg if delivered_at and tariff else None
+
+        numbers = [self.number() for _ in range(count)]
+        parcels = Parcel.objects.bulk_create([
+            Parcel(
+                tracking_number=f"TEST{n:010d}",
+                company=company,
+                sender=clients[i % len(clients)],
+                receiver=clients[(i + 1) % len(clients)],
+                sender_office=offices[i % len(offices)],
+                receiver_office=offices[(i + 1) % len(offices)],
+                delivery_type=delivery_type,
+                weight_kg=weight_kg,
+                tariff=tariff,
+                current_status=current,
+                registered_by=registered_by,
+                delivered_at=delivered_at,
+                delivered_price=delivered_price,
+            )
+            for i, n in enumerate(numbers)
+        ])
+        if history:
+            ParcelStatusHistory.objects.bulk_create([
+                ParcelStatusHistory(parcel=p, status=current, office=p.sender_office, changed_by=registered_by)
+                for p in parcels
+            ])
+        if notes:
+            ParcelNote.objects.bulk_create([
+                ParcelNote(parcel=p, content="Test note", created_by=registered_by) for p in parcels
+            ])
+        adjust_counts(count_parcels(parcels))
+        record_deliveries(parcels)
+        if parcels:
+            index_parcels(Parcel.objects.filter(pk__range=(parcels[0].pk, parcels[-1].pk)))
+        return parcels
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting how many queries a request may run."""
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, f"{url} returned {response.status_code}")
+        return queries
+
+    def assertQueryBudget(self, url, budget, grow=None, warm=True):
+        """
+        Fail when `url` runs more than `budget` queries, or, if `grow` is
+        given, when it runs more queries once grow() has added rows. With
+        warm=False the first request is counted as it is, for views whose
+        responses are cached.
+        """
+        if warm:
+            self.count_queries(url)
+        before = self.count_queries(url)
+        self.assertLessEqual(
+            len(before), budget,
+            f"{url} ran {len(before)} queries, budget {budget}:\n" + "\n".join(q["sql"] for q in before),
+        )
+        if grow is not None:
+            grow()
+            after = self.count_queries(url)
+            self.assertLessEqual(
+                len(after), len(before),
+                f"{url} ran {len(before)} queries before and {len(after)} after adding rows (N+1?):\n"
+                + "\n".join(q["sql"] for q in after),
+            )
@@ -1,3 +1,294 @@
-from django.test import TestCase
+import json
+import time
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.models import UserRole
+from apps.common.benchmarks.compare import compare_results
+from apps.common.middleware import fingerprint, perf_stats
+from apps.common.models import DeliveryType, Tariff, VersionStamp
+from apps.common.pagination import encode_cursor, paginate_keyset
+from apps.common.responses import StreamingJsonResponse
+from apps.common.tariffs import quote_prices, tariffs
+from apps.common.testing import DataFactory
+from apps.common.versions import current, touch
+from apps.organizations.models import Office
+from apps.parcels.models import Parcel, ParcelSearch, ParcelStatusCount
+
+
+def _results(p50=10.0, queries=3, peak_kib=100.0, status=200, name="parcels_api_list"):
+    return {"scales": {"100": {"endpoints": {name: {
+        "status": status, "latency_ms": {"p50": p50}, "queries": queries, "peak_kib": peak_kib,
+    }}}}}
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors page through a result exactly once, and bad cursors are a 400, not a 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcels = cls.factory.parcels(23, cls.offices, status="DELIVERED")
+        # Ties on created_at must be broken by id
+        tied = [p.pk for p in cls.parcels[5:15]]
+        Parcel.objects.filter(pk__in=tied).update(created_at=cls.parcels[5].created_at)
+
+    def test_pages_cover_every_row_once(self):
+        queryset = Parcel.objects.values("id", "created_at")
+        expected = list(queryset.order_by("-created_at", "-id").values_list("id", flat=True))
+        seen, cursor = [], None
+        while True:
+            rows, cursor = paginate_keyset(queryset, ("-created_at", "-id"), cursor=cursor, limit=4)
+            seen += [row["id"] for row in rows]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursors(self):
+        self.client.force_login(self.employee.user)
+        cursors = [
+            "!!!",
+            "bm90IGpzb24",  # "not json"
+            encode_cursor({"created_at": 1}),
+            encode_cursor([1]),
+            encode_cursor([123, 1]),
+            encode_cursor([None, 1]),
+            encode_cursor(["not a date", 1]),
+            encode_cursor([{"a": 1}, 1]),
+            encode_cursor(["2026-01-01T00:00:00+00:00", 2 ** 70]),
+            encode_cursor(["2026-01-01T00:00:00+00:00", "x"]),
+        ]
+        urls = [
+            reverse("parcels_api_list"),
+            reverse("reports_pending_deliveries"),
+            reverse("reports_income") + "?parcels=1",
+        ]
+        for url in urls:
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    separator = "&" if "?" in url else "?"
+                    response = self.client.get(f"{url}{separator}cursor={cursor}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json()["error"], "Invalid cursor.")
+
+
+class StreamingJsonResponseTests(SimpleTestCase):
+    """A streamed body is the JSON that JsonResponse would have built, whatever the row count."""
+
+    def body(self, response):
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_matches_json_response(self):
+        with mock.patch("apps.common.responses.ROWS_PER_WRITE", 2):
+            for count in (0, 1, 2, 5):
+                with self.subTest(count=count):
+                    rows = [{"id": i, "day": date(2026, 1, i + 1)} for i in range(count)]
+                    expected = json.loads(JsonResponse({"page": 1, "parcels": rows}).content)
+                    self.assertEqual(self.body(StreamingJsonResponse({"page": 1}, "parcels", iter(rows))), expected)
+
+    def test_count_follows_the_rows(self):
+        response = StreamingJsonResponse({}, "parcels", iter([{"id": 1}, {"id": 2}]), count_key="pending_count")
+        self.assertEqual(self.body(response), {"parcels": [{"id": 1}, {"id": 2}], "pending_count": 2})
+
+    def test_rows_are_read_while_streaming(self):
+        read = []
+
+        def rows():
+            for i in range(3):
+                read.append(i)
+                yield {"id": i}
+
+        response = StreamingJsonResponse({}, "parcels", rows())
+        self.assertEqual(read, [])
+        self.body(response)
+        self.assertEqual(read, [0, 1, 2])
+
+
+class TariffQuoteTests(TestCase):
+    """quote_prices prices from the cached tariffs and follows tariff edits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = DataFactory().company()
+
+    def test_prices_without_queries(self):
+        tariffs.clear()
+        tariffs.get(self.company.pk, DeliveryType.STANDARD)
+        with self.assertNumQueries(0):
+            prices = quote_prices([
+                (self.company.pk, DeliveryType.STANDARD, Decimal("2.000")),
+                (self.company.pk, DeliveryType.EXPRESS, "1.5"),
+                (self.company.pk, "OVERNIGHT", "1"),
+                (None, DeliveryType.STANDARD, "1"),
+                (self.company.pk, DeliveryType.STANDARD, "heavy"),
+                (self.company.pk, DeliveryType.STANDARD, "0"),
+                (self.company.pk, DeliveryType.STANDARD, "NaN"),
+                (self.company.pk, DeliveryType.STANDARD, None),
+            ])
+        self.assertEqual(prices, [Decimal("10.00"), Decimal("12.75"), None, None, None, None, None, None])
+
+    def test_tariff_save_refreshes_prices(self):
+        item = (self.company.pk, DeliveryType.STANDARD, "2")
+        self.assertEqual(quote_prices([item]), [Decimal("10.00")])
+        tariff = Tariff.objects.get(company=self.company, delivery_type=DeliveryType.STANDARD)
+        tariff.price_per_kg = Decimal("6.00")
+        tariff.save()
+        self.assertEqual(quote_prices([item]), [Decimal("12.00")])
+        tariff.delete()
+        self.assertEqual(quote_prices([item]), [None])
+
+
+class PerfInstrumentationTests(TestCase):
+    """PerfMiddleware samples requests and /_perf/ shows the figures to staff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.office = cls.factory.office()
+        cls.employee = cls.factory.employee(cls.office)
+        cls.staff = cls.factory.users(1, UserRole.ADMIN, is_staff=True)[0]
+
+    def setUp(self):
+        perf_stats.clear()
+        self.addCleanup(perf_stats.clear)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT *\n  FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s)'),
+        )
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_sampled_request_is_recorded(self):
+        self.client.force_login(self.employee.user)
+        response = self.client.get(reverse("offices_api_list"))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        sample = perf_stats.snapshot()["offices_api_list"]
+        self.assertEqual(sample["samples"], 1)
+        self.assertGreater(sample["queries"]["max"], 0)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_sampling_off(self):
+        self.client.force_login(self.employee.user)
+        response = self.client.get(reverse("offices_api_list"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(perf_stats.snapshot(), {})
+
+    def test_perf_view_is_staff_only(self):
+        self.client.force_login(self.employee.user)
+        self.assertEqual(self.client.get(reverse("perf")).status_code, 403)
+
+    def test_perf_view_reads_and_clears(self):
+        perf_stats.add("offices_api_list", wall_ms=12.0, sql_ms=3.0, queries=4, duplicates={})
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.post(reverse("perf")).status_code, 405)
+        self.assertEqual(self.client.get(reverse("perf")).json()["views"]["offices_api_list"]["samples"], 1)
+        self.assertEqual(self.client.delete(reverse("perf")).json()["views"], {})
+
+
+class VersionStampTests(TestCase):
+    """List APIs answer If-None-Match from the shared version stamps."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.office = cls.factory.office()
+        cls.employee = cls.factory.employee(cls.office)
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+        self.url = reverse("offices_api_list")
+
+    def stamp(self, table):
+        return VersionStamp.objects.get(table=table).version
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q["sql"] for q in queries if Office._meta.db_table in q["sql"]])
+
+    def test_write_bumps_the_stamp(self):
+        etag = self.client.get(self.url)["ETag"]
+        before = self.stamp("offices")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.office.name = "Renamed Office"
+            self.office.save()
+        self.assertEqual(self.stamp("offices"), before + 1)
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_login_leaves_users_stamp_alone(self):
+        before = current("users")["users"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.employee.user)
+        self.assertEqual(self.stamp("users"), before)
+
+    def test_touches_merge_and_follow_rollbacks(self):
+        current("parcels", "users")
+        parcels, users = self.stamp("parcels"), self.stamp("users")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                touch("parcels")
+                touch("parcels")
+                try:
+                    with transaction.atomic():
+                        touch("users")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertEqual((self.stamp("parcels"), self.stamp("users")), (parcels + 1, users))
+
+    def test_missing_stamp_starts_from_the_clock(self):
+        started = time.time_ns()
+        self.assertGreaterEqual(current("new_table")["new_table"], started)
+
+
+class CompareResultsTests(SimpleTestCase):
+    def regressions(self, baseline, current):
+        rows, _ = compare_results(baseline, current)
+        return rows[0]["regressions"]
+
+    def test_unchanged_run_passes(self):
+        self.assertEqual(self.regressions(_results(), _results()), [])
+
+    def test_more_queries_regress(self):
+        self.assertEqual(self.regressions(_results(), _results(queries=4)), ["queries 3 -> 4"])
+
+    def test_latency_needs_relative_and_absolute_growth(self):
+        # +50% but below the 1 ms floor
+        self.assertEqual(self.regressions(_results(p50=1.0), _results(p50=1.5)), [])
+        # +2 ms but only +20%
+        self.assertEqual(self.regressions(_results(p50=10.0), _results(p50=12.0)), [])
+        self.assertEqual(self.regressions(_results(p50=10.0), _results(p50=20.0)), ["p50 10.00 -> 20.00 ms"])
+
+    def test_unmatched_scenarios_are_listed(self):
+        rows, unmatched = compare_results(_results(), _results(name="offices_api_list"))
+        self.assertEqual(rows, [])
+        self.assertEqual(unmatched, ["100/offices_api_list", "100/parcels_api_list"])
+
+
+class SeedDataScaleTests(TestCase):
+    """seed_data --scale writes raw rows, so it must list every NOT NULL column itself."""
+
+    def test_scaled_seed(self):
+        call_command("seed_data", "--scale", "50", "--parcels", "500", stdout=StringIO())
+        synthetic = Parcel.objects.filter(tracking_number__startswith="SYN")
+        self.assertEqual(synthetic.count(), 500)
+        self.assertFalse(synthetic.exclude(version=1).exists())
+        self.assertEqual(ParcelStatusCount.objects.aggregate(total=Sum("parcels_count"))["total"], Parcel.objects.count())
+        self.assertEqual(ParcelSearch.objects.count(), Parcel.objects.count())
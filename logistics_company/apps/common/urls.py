@@ -11,6 +11,8 @@ urlpatterns = [
     path("dashboard/", views.dashboard, name="dashboard"),
     path("reports/", views.reports, name="reports"),
     path("track/", views.track, name="track"),
+    path("_perf/", views.perf, name="perf"),
+    path("api/metadata/", views.metadata_api, name="metadata_api"),
     path("reports/client/", client_views.clients_report, name="reports_client"),
     path(
         "reports/client-parcels/<str:role>/",
@@ -42,6 +44,11 @@ urlpatterns = [
         parcels_views.pending_deliveries_report,
         name="reports_pending_deliveries",
     ),
+    path(
+        "reports/pending-deliveries/summary/",
+        parcels_views.pending_deliveries_summary,
+        name="reports_pending_deliveries_summary",
+    ),
     path(
         "reports/income/",
         parcels_views.income_report,
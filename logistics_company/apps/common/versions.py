@@ -0,0 +1,150 @@
+"""
+Version stamps for conditional GETs on the JSON list APIs.
+
+Every table a list endpoint reads has a version stamp, a row of the
+VersionStamp table, so all worker processes see the same stamps. A stamp
+kept in a per-process cache would let one worker answer 304 for data
+another worker has changed. Writes bump the stamps of the tables they
+change once their transaction commits. Signals do it for save() and
+delete() (see signals.py). Code that writes with bulk_create() or
+QuerySet.update() calls touch() itself.
+
+A list view declares the tables its response depends on:
+
+    @versioned("parcels", "users", "offices")
+    def parcels_api_list(request): ...
+
+The ETag is a hash of those stamps, the requesting user and the query
+string, so it is computed with one query and without running the view. A
+request whose If-None-Match matches gets 304 Not Modified and the view
+does not run.
+
+A missing stamp (a new table name, a flushed database) is created from
+the current time in nanoseconds rather than from zero. That way a stamp
+never goes back to a value an old ETag was computed from.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import VersionStamp
+
+
+def _create(tables, using):
+    for table in tables:
+        try:
+            with transaction.atomic(using=using):
+                VersionStamp.objects.using(using).create(table=table, version=time.time_ns())
+        except IntegrityError:
+            # Created concurrently
+            pass
+
+
+def _bump(tables, using):
+    stamps = VersionStamp.objects.using(using).filter(table__in=tables)
+    if stamps.update(version=F("version") + 1) < len(tables):
+        _create(set(tables) - set(stamps.values_list("table", flat=True)), using)
+
+
+class _PendingBump:
+    """on_commit() callback that bumps the tables touched at one savepoint depth, once."""
+
+    def __init__(self, using):
+        self.using = using
+        self.tables = set()
+        self.done = False
+
+    def __call__(self):
+        if not self.done:
+            self.done = True
+            _bump(sorted(self.tables), self.using)
+
+
+# Per thread (and so per connection): (alias, savepoint ids) -> _PendingBump
+_local = threading.local()
+
+
+def touch(*tables, using=DEFAULT_DB_ALIAS):
+    """
+    Bump the version stamps of `tables` when the current transaction
+    commits (immediately outside a transaction).
+
+    All the touches at one savepoint depth of a transaction are merged
+    into a single bump, so saving many rows does not bump once per row.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        _bump(tables, using)
+        return
+
+    pending_bumps = getattr(_local, "pending", None)
+    if pending_bumps is None:
+        pending_bumps = _local.pending = {}
+    savepoint_ids = tuple(connection.savepoint_ids)
+    # Bumps of savepoints that are no longer open are already registered (or
+    # were rolled back) and take no more tables
+    for key in [key for key in pending_bumps if key[0] == using and key[1] != savepoint_ids[:len(key[1])]]:
+        del pending_bumps[key]
+
+    pending = pending_bumps.get((using, savepoint_ids))
+    if pending is None or pending.done:
+        pending = pending_bumps[(using, savepoint_ids)] = _PendingBump(using)
+    pending.tables.update(tables)
+    # Registered by every touch, so the bump runs unless all of them are
+    # rolled back. A bump left over from a rolled back transaction is joined
+    # by the next one and bumps a few tables too many, which is harmless.
+    transaction.on_commit(pending, using=using)
+
+
+def current(*tables, using=DEFAULT_DB_ALIAS):
+    """Return {table: stamp} for `tables`, creating missing stamps."""
+    stamps = VersionStamp.objects.using(using).filter(table__in=tables)
+    result = dict(stamps.values_list("table", "version"))
+    missing = [table for table in tables if table not in result]
+    if missing:
+        _create(missing, using)
+        result.update(stamps.filter(table__in=missing).values_list("table", "version"))
+    return result
+
+
+def list_etag(request, tables):
+    """Quoted ETag of a list response from the table stamps, the user and the query string."""
+    stamps = current(*tables)
+    parts = [request.resolver_match.view_name if request.resolver_match else request.path, str(request.user.pk)]
+    parts += [f"{table}={stamps[table]}" for table in tables]
+    parts += [f"{key}={value}" for key, value in sorted(request.GET.lists())]
+    return '"%s"' % hashlib.md5("|".join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def versioned(*tables):
+    """
+    Answer conditional GETs of a list view from the version stamps of
+    `tables`: 304 when If-None-Match matches, otherwise run the view and
+    add the ETag to its 200 response.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            # Read the stamps before the view reads the tables: a write that
+            # commits in between makes the ETag older than the body, never newer.
+            etag = list_etag(request, tables)
+            conditional = get_conditional_response(request, etag=etag)
+            if conditional is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            else:
+                response = conditional
+            response["ETag"] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return _wrapped_view
+    return decorator
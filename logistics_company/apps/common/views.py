@@ -1,12 +1,18 @@
 from functools import wraps
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_http_methods
 
 from apps.accounts.models import User, UserRole
 from apps.workforce.models import Employee
 
+from .lookups import lookups
+from .middleware import perf_stats
+
 
 def employee_or_admin_required(view_func):
     """Decorator that requires user to be an employee, admin, or superuser."""
@@ -46,3 +52,37 @@ def index(request):
 
 def track(request):
     return render(request, "parcels/track.html")
+
+
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def perf(request):
+    """Per-view query counts and latency recorded by PerfMiddleware (staff only)."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"success": False, "error": "Permission denied."}, status=403)
+
+    if request.method == "DELETE":
+        perf_stats.clear()
+
+    return JsonResponse({
+        "sample_rate": getattr(settings, "PERF_SAMPLE_RATE", 0),
+        "views": perf_stats.snapshot(),
+    })
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def metadata_api(request):
+    """
+    Offices, companies, statuses, delivery types and employee types for the
+    form dropdowns.
+
+    The response carries an ETag; a request whose If-None-Match matches it
+    gets 304 Not Modified. Cache-Control makes browsers revalidate on every
+    use, so a change shows up on the next page load.
+    """
+    body, etag = lookups.get()
+    response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
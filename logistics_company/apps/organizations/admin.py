@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 
 from .models import Company, Office
 
@@ -13,19 +14,24 @@ class OfficeInline(admin.TabularInline):
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ("name", "bulstat", "phone", "address", "office_count")
+    list_select_related = ("address",)
     search_fields = ("name", "bulstat", "phone")
     raw_id_fields = ("address",)
 
     inlines = [OfficeInline]
 
-    @admin.display(description="Offices")
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(offices_count=Count("offices"))
+
+    @admin.display(description="Offices", ordering="offices_count")
     def office_count(self, obj):
-        return obj.offices.count()
+        return obj.offices_count
 
 
 @admin.register(Office)
 class OfficeAdmin(admin.ModelAdmin):
     list_display = ("name", "code", "company", "city", "phone", "working_hours", "employee_count")
+    list_select_related = ("company", "address")
     list_filter = ("company", "address__city")
     search_fields = ("name", "code", "phone", "address__city", "address__street")
     raw_id_fields = ("address",)
@@ -39,10 +45,13 @@ class OfficeAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(employees_count=Count("employees"))
+
     @admin.display(description="City")
     def city(self, obj):
         return obj.address.city if obj.address else "-"
 
-    @admin.display(description="Employees")
+    @admin.display(description="Employees", ordering="employees_count")
     def employee_count(self, obj):
-        return obj.employees.count()
+        return obj.employees_count
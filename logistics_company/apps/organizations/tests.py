@@ -1,3 +1,36 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.accounts.models import UserRole
+from apps.common.testing import DataFactory, QueryBudgetMixin
+from apps.workforce.models import Employee
+
+
+class OfficeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The offices API and the company/office changelists run a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(5)
+        cls.manager = cls.factory.employee(cls.offices[0], Employee.EmployeeType.MANAGER)
+        cls.admin = cls.factory.users(1, UserRole.ADMIN, is_staff=True, is_superuser=True)[0]
+
+    def setUp(self):
+        self.client.force_login(self.manager.user)
+
+    def grow(self):
+        company = self.factory.company()
+        for office in self.factory.offices(50, company):
+            self.factory.employees(2, office)
+
+    def test_offices_api_list(self):
+        self.assertQueryBudget(reverse("offices_api_list"), 4, grow=self.grow)
+
+    def test_office_admin_changelist(self):
+        self.client.force_login(self.admin)
+        self.assertQueryBudget(reverse("admin:organizations_office_changelist"), 7, grow=self.grow)
+
+    def test_company_admin_changelist(self):
+        self.client.force_login(self.admin)
+        self.assertQueryBudget(reverse("admin:organizations_company_changelist"), 5, grow=self.grow)
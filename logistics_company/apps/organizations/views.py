@@ -8,6 +8,7 @@ from django.views.decorators.http import require_http_methods
 
 from .models import Office, Company
 from apps.common.models import Address
+from apps.common.versions import versioned
 
 
 def is_admin_or_manager(user):
@@ -25,6 +26,7 @@ def offices(request):
 
 @login_required
 @require_http_methods(["GET"])
+@versioned("offices", "companies", "addresses")
 def offices_api_list(request):
     offices_qs = Office.objects.select_related("company", "address").order_by("name")
 
@@ -45,13 +47,9 @@ def offices_api_list(request):
         for o in offices_qs
     ]
 
-    companies = Company.objects.all().order_by("name")
-    companies_data = [{"id": c.pk, "name": c.name} for c in companies]
-
     return JsonResponse({
         "success": True,
         "offices": data,
-        "companies": companies_data,
     })
 
 
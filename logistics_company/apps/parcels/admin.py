@@ -1,7 +1,24 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import F
 from django.utils.html import format_html
 
-from .models import Parcel, ParcelStatus, ParcelStatusHistory, ParcelNote
+from .models import (
+    DailyIncomeRollup, Parcel, ParcelStatus, ParcelStatusCount, ParcelStatusHistory, ParcelStatusTransition, ParcelNote
+)
+from .counters import adjust_counts, count_parcels
+from .forms import CONFLICT_MESSAGE, ParcelAdminForm
+from .registry import statuses
+from .rollups import delivered_parcels, price_delivery, record_deliveries
+from .search import filter_matching
+from .tracking import invalidate_tracking
+
+
+# What the status counters and the income rollup read of a parcel
+ROLLUP_FIELDS = (
+    "company", "sender_office", "current_status", "delivery_type", "weight_kg", "tariff", "delivered_at",
+    "delivered_price",
+)
 
 
 class ParcelStatusHistoryInline(admin.TabularInline):
@@ -22,6 +39,7 @@ class ParcelNoteInline(admin.TabularInline):
 
 @admin.register(Parcel)
 class ParcelAdmin(admin.ModelAdmin):
+    form = ParcelAdminForm
     list_display = (
         "tracking_number",
         "sender_name",
@@ -32,6 +50,7 @@ class ParcelAdmin(admin.ModelAdmin):
         "calculated_price",
         "created_at",
     )
+    list_select_related = ("sender", "receiver")
     list_filter = (
         "current_status",
         "delivery_type",
@@ -52,7 +71,7 @@ class ParcelAdmin(admin.ModelAdmin):
         "receiver__last_name",
     )
     date_hierarchy = "created_at"
-    readonly_fields = ("created_at", "calculated_price")
+    readonly_fields = ("created_at", "calculated_price", "delivered_price")
     raw_id_fields = ("sender", "receiver", "registered_by")
 
     fieldsets = (
@@ -66,15 +85,69 @@ class ParcelAdmin(admin.ModelAdmin):
             "fields": ("sender_office", "receiver_office", "pickup_address", "delivery_address")
         }),
         ("Delivery Details", {
-            "fields": ("delivery_type", "weight_kg", "tariff", "calculated_price")
+            "fields": ("delivery_type", "weight_kg", "tariff", "calculated_price", "delivered_price")
         }),
         ("Staff & Dates", {
-            "fields": ("registered_by", "created_at", "delivered_at")
+            "fields": ("registered_by", "created_at", "delivered_at", "version")
         }),
     )
 
     inlines = [ParcelStatusHistoryInline, ParcelNoteInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # The search_fields above only enable the search box; matching uses
+        # the full-text index over the same fields (see search.py).
+        if not search_term.strip():
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
+    def save_model(self, request, obj, form, change):
+        # The status counters and the income rollup follow the edit: the old
+        # row is taken out of them and the saved one added back.
+        with transaction.atomic():
+            if change:
+                # Same guarded UPDATE as the APIs (see views._claim_version) on
+                # the version the form was loaded with: requests holding it
+                # now get a 409. The form has checked it already and shows
+                # the conflict; this only fails for callers that skip the form.
+                if not Parcel.objects.filter(pk=obj.pk, version=obj.version).update(version=F("version") + 1):
+                    raise ValueError(CONFLICT_MESSAGE)
+                obj.version += 1
+                old = Parcel.objects.only(*ROLLUP_FIELDS).get(pk=obj.pk)
+                adjust_counts(count_parcels([old], sign=-1))
+                record_deliveries(delivered_parcels([old]), sign=-1)
+            # A parcel delivered here, or whose delivered weight or tariff is
+            # corrected, is priced at its tariff's current rate
+            if delivered_parcels([obj]) and (
+                not change
+                or not delivered_parcels([old])
+                or (old.weight_kg, old.tariff_id) != (obj.weight_kg, obj.tariff_id)
+            ):
+                price_delivery(obj)
+            super().save_model(request, obj, form, change)
+            adjust_counts(count_parcels([obj]))
+            record_deliveries(delivered_parcels([obj]))
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Status history inlines are saved here too; invalidate the old number in case it was edited
+        invalidate_tracking(form.instance.tracking_number, form.initial.get("tracking_number"))
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            adjust_counts(count_parcels([obj], sign=-1))
+            record_deliveries(delivered_parcels([obj]), sign=-1)
+        invalidate_tracking(obj.tracking_number)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            parcels = list(queryset.only("tracking_number", *ROLLUP_FIELDS))
+            super().delete_queryset(request, queryset)
+            adjust_counts(count_parcels(parcels, sign=-1))
+            record_deliveries(delivered_parcels(parcels), sign=-1)
+        invalidate_tracking(*[parcel.tracking_number for parcel in parcels])
+
     @admin.display(description="Sender")
     def sender_name(self, obj):
         if obj.sender:
@@ -89,7 +162,8 @@ class ParcelAdmin(admin.ModelAdmin):
 
     @admin.display(description="Status")
     def status_badge(self, obj):
-        if not obj.current_status:
+        status = statuses.by_id(obj.current_status_id)
+        if not status:
             return "-"
         colors = {
             "CREATED": "#6c757d",
@@ -99,11 +173,11 @@ class ParcelAdmin(admin.ModelAdmin):
             "RETURNED": "#dc3545",
             "CANCELLED": "#343a40",
         }
-        color = colors.get(obj.current_status.code, "#6c757d")
+        color = colors.get(status.code, "#6c757d")
         return format_html(
             '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px;">{}</span>',
             color,
-            obj.current_status.name
+            status.name
         )
 
     @admin.display(description="Price")
@@ -119,9 +193,18 @@ class ParcelStatusAdmin(admin.ModelAdmin):
     ordering = ("code",)
 
 
+@admin.register(ParcelStatusTransition)
+class ParcelStatusTransitionAdmin(admin.ModelAdmin):
+    list_display = ("from_status", "to_status")
+    list_select_related = ("from_status", "to_status")
+    list_filter = ("from_status", "to_status")
+    ordering = ("from_status__code", "to_status__code")
+
+
 @admin.register(ParcelStatusHistory)
 class ParcelStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ("parcel", "status", "office", "changed_by", "note", "created_at")
+    list_select_related = ("parcel", "status", "office", "changed_by__user")
     list_filter = ("status", "office", "created_at")
     search_fields = ("parcel__tracking_number", "note")
     date_hierarchy = "created_at"
@@ -133,6 +216,7 @@ class ParcelStatusHistoryAdmin(admin.ModelAdmin):
 @admin.register(ParcelNote)
 class ParcelNoteAdmin(admin.ModelAdmin):
     list_display = ("parcel", "note_type", "short_content", "created_by", "created_at")
+    list_select_related = ("parcel", "created_by__user")
     list_filter = ("note_type", "created_at")
     search_fields = ("parcel__tracking_number", "content")
     date_hierarchy = "created_at"
@@ -145,3 +229,23 @@ class ParcelNoteAdmin(admin.ModelAdmin):
         if len(obj.content) > 50:
             return f"{obj.content[:50]}..."
         return obj.content
+
+
+@admin.register(DailyIncomeRollup)
+class DailyIncomeRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "company", "office", "delivery_type", "parcels_count", "income")
+    list_select_related = ("company", "office")
+    list_filter = ("delivery_type", "company", "office")
+    date_hierarchy = "day"
+    ordering = ("-day",)
+    # Maintained by the status-change code; rebuild with rebuild_income_rollups
+    readonly_fields = ("day", "company", "office", "delivery_type", "parcels_count", "income")
+
+
+@admin.register(ParcelStatusCount)
+class ParcelStatusCountAdmin(admin.ModelAdmin):
+    list_display = ("office", "status", "parcels_count")
+    list_select_related = ("office", "status")
+    list_filter = ("status", "office")
+    # Maintained by the parcel code paths; rebuild with rebuild_parcel_counters
+    readonly_fields = ("office", "status", "parcels_count")
@@ -0,0 +1,388 @@
+"""
+Set-based parcel operations for manifests and scan batches.
+
+Registration: every user and office a manifest references is resolved with
+one query per table (tariffs come from the tariff cache), each row is
+validated in memory with the same rules as parcels_api_create, and the valid
+rows get tracking numbers from the process's reserved block (numbers.py)
+and are inserted with bulk_create together with their initial status
+history and search documents, in one transaction. quote_manifest() prices
+rows the same way without registering them.
+
+Status changes: a batch of scanned parcels is moved to a new status with
+one UPDATE per chunk of ids sharing an office and status, and the history
+rows of the parcels it moved are bulk inserted.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Parcel, ParcelStatusHistory, normalize_tracking_number
+from .numbers import tracking_numbers
+from .registry import statuses
+from .counters import adjust_counts, count_parcels
+from .rollups import DELIVERY_VALUES, delivered_price, record_deliveries
+from .search import index_parcels
+from .tracking import invalidate_tracking
+from apps.accounts.models import User
+from apps.common.models import DeliveryType
+from apps.common.tariffs import quote_prices, tariffs
+from apps.common.versions import touch
+from apps.organizations.models import Company, Office
+
+
+MAX_BULK_PARCELS = 5000
+MAX_BULK_SCANS = 10000
+BULK_BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = ["sender_id", "receiver_id", "weight_kg", "delivery_type"]
+
+
+class BulkRowError(Exception):
+    """A manifest row failed validation; the message is reported for that row."""
+
+
+def _ids(rows, *fields):
+    ids = set()
+    for row in rows:
+        for field in fields:
+            value = row.get(field)
+            if value:
+                try:
+                    ids.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+    return ids
+
+
+def _as_id(value):
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return -1  # never matches a primary key, reported as "not found"
+
+
+class ManifestContext:
+    """Everything the rows of one manifest reference, loaded up front."""
+
+    def __init__(self, rows):
+        # user id -> default_address_id
+        self.users = dict(
+            User.objects.filter(pk__in=_ids(rows, "sender_id", "receiver_id"))
+            .values_list("id", "default_address_id")
+        )
+        # office id -> company_id
+        self.offices = dict(
+            Office.objects.filter(pk__in=_ids(rows, "sender_office_id", "receiver_office_id"))
+            .values_list("id", "company_id")
+        )
+        # Same fallback as parcels_api_create for parcels with no office
+        self.default_company_id = None
+        if any(not row.get("sender_office_id") and not row.get("receiver_office_id") for row in rows):
+            self.default_company_id = Company.objects.order_by("pk").values_list("id", flat=True).first()
+
+    def company_id(self, sender_office_id, receiver_office_id):
+        """The company a parcel belongs to: its sender office's, else its receiver office's."""
+        if sender_office_id is not None:
+            return self.offices.get(sender_office_id)
+        if receiver_office_id is not None:
+            return self.offices.get(receiver_office_id)
+        return self.default_company_id
+
+
+def build_parcel(row, context, status, employee):
+    """Validate one manifest row and return an unsaved Parcel, or raise BulkRowError."""
+    if not isinstance(row, dict):
+        raise BulkRowError("Row must be an object.")
+
+    missing = [f for f in REQUIRED_FIELDS if not row.get(f)]
+    if missing:
+        raise BulkRowError(f"Missing required fields: {', '.join(missing)}")
+
+    sender_id = _as_id(row["sender_id"])
+    receiver_id = _as_id(row["receiver_id"])
+    if sender_id not in context.users:
+        raise BulkRowError("Sender not found.")
+    if receiver_id not in context.users:
+        raise BulkRowError("Receiver not found.")
+    if sender_id == receiver_id:
+        raise BulkRowError("Sender and receiver cannot be the same.")
+
+    try:
+        weight_kg = Decimal(str(row["weight_kg"]))
+        if weight_kg <= 0:
+            raise ValueError()
+        weight_kg = Parcel._meta.get_field("weight_kg").clean(weight_kg, None)
+    except (InvalidOperation, ValueError, ValidationError):
+        raise BulkRowError("Invalid weight.")
+
+    delivery_type = row["delivery_type"]
+    if delivery_type not in DeliveryType.values:
+        raise BulkRowError("Invalid delivery type.")
+
+    sender_office_id = _as_id(row.get("sender_office_id"))
+    if sender_office_id is not None and sender_office_id not in context.offices:
+        raise BulkRowError("Sender office not found.")
+    receiver_office_id = _as_id(row.get("receiver_office_id"))
+    if receiver_office_id is not None and receiver_office_id not in context.offices:
+        raise BulkRowError("Receiver office not found.")
+
+    pickup_address_id = None
+    if sender_office_id is None:
+        pickup_address_id = context.users[sender_id]
+        if pickup_address_id is None:
+            raise BulkRowError("Sender office or sender's default address required.")
+
+    delivery_address_id = None
+    if receiver_office_id is None:
+        delivery_address_id = context.users[receiver_id]
+        if delivery_address_id is None:
+            raise BulkRowError("Receiver office or receiver's default address required.")
+
+    company_id = context.company_id(sender_office_id, receiver_office_id)
+    tariff = tariffs.get(company_id, delivery_type)
+
+    return Parcel(
+        company_id=company_id,
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        sender_office_id=sender_office_id,
+        receiver_office_id=receiver_office_id,
+        pickup_address_id=pickup_address_id,
+        delivery_address_id=delivery_address_id,
+        delivery_type=delivery_type,
+        weight_kg=weight_kg,
+        tariff=tariff,
+        current_status=status,
+        registered_by=employee,
+    )
+
+
+def quote_manifest(rows):
+    """
+    Price manifest rows without registering them.
+
+    Returns one Decimal price per row, in order, or None when the row has no
+    valid weight or its company has no tariff for the delivery type.
+    """
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+    # Only the offices are needed to find each row's company
+    context = ManifestContext([
+        {"sender_office_id": row.get("sender_office_id"), "receiver_office_id": row.get("receiver_office_id")}
+        for row in rows
+    ])
+    return quote_prices(
+        (
+            context.company_id(_as_id(row.get("sender_office_id")), _as_id(row.get("receiver_office_id"))),
+            row.get("delivery_type"),
+            row.get("weight_kg"),
+        )
+        for row in rows
+    )
+
+
+def bulk_register_parcels(rows, employee):
+    """
+    Register the valid rows of a manifest.
+
+    Returns one result dict per input row, in order: either
+    {"index", "success": True, "id", "tracking_number", "price"} or
+    {"index", "success": False, "error"}.
+    """
+    status = statuses.initial()
+    if not status:
+        raise ValueError("CREATED status not found. Run seed_data.")
+
+    context = ManifestContext([row for row in rows if isinstance(row, dict)])
+
+    results = [None] * len(rows)
+    parcels = []
+    indexes = []
+    for index, row in enumerate(rows):
+        try:
+            parcel = build_parcel(row, context, status, employee)
+        except BulkRowError as e:
+            results[index] = {"index": index, "success": False, "error": str(e)}
+            continue
+        parcels.append(parcel)
+        indexes.append(index)
+
+    # Allocated before the transaction so whole blocks can be reserved (see numbers.py)
+    for parcel, number in zip(parcels, tracking_numbers.allocate(len(parcels))):
+        parcel.tracking_number = number
+
+    with transaction.atomic():
+        Parcel.objects.bulk_create(parcels, batch_size=BULK_BATCH_SIZE)
+        adjust_counts(count_parcels(parcels))
+        for chunk in _chunks([parcel.pk for parcel in parcels]):
+            index_parcels(Parcel.objects.filter(pk__in=chunk))
+        ParcelStatusHistory.objects.bulk_create(
+            [
+                ParcelStatusHistory(
+                    parcel=parcel,
+                    status=status,
+                    office_id=parcel.sender_office_id,
+                    changed_by=employee,
+                    note="Parcel registered",
+                )
+                for parcel in parcels
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        # Drop cached "not found" responses for the new tracking numbers
+        invalidate_tracking(*[parcel.tracking_number for parcel in parcels])
+        # bulk_create() sends no post_save signals
+        touch("parcels")
+
+    for index, parcel in zip(indexes, parcels):
+        results[index] = {
+            "index": index,
+            "success": True,
+            "id": parcel.pk,
+            "tracking_number": parcel.tracking_number,
+            "price": float(parcel.price),
+        }
+    return results
+
+
+def _chunks(items, size=BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _move(parcels, status_id, office_id, changes):
+    """
+    Apply `changes` to `parcels`, (id, version) pairs read with `status_id`
+    and `office_id`, that are still in that state. Returns the ids moved.
+    """
+    parcel_ids = [parcel_id for parcel_id, _ in parcels]
+    guarded = Parcel.objects.filter(
+        pk__in=parcel_ids,
+        current_status_id=status_id,
+        sender_office_id=office_id,
+        version__in={version for _, version in parcels},
+    )
+    moved = guarded.update(**changes)
+    if moved == len(parcels):
+        return parcel_ids
+    if not moved:
+        return []
+    # A moved parcel now has the new status and the version after the one it
+    # was read with
+    read_versions = dict(parcels)
+    return [
+        parcel_id
+        for parcel_id, version in Parcel.objects.filter(
+            pk__in=parcel_ids, current_status=changes["current_status"]
+        ).values_list("pk", "version")
+        if version == read_versions[parcel_id] + 1
+    ]
+
+
+def bulk_update_status(identifiers, new_status, office, employee, note="", by="id"):
+    """
+    Move the parcels identified by `identifiers` (ids, or tracking numbers when
+    by="tracking_number") to `new_status`, recording one history entry each.
+
+    Unknown parcels, parcels already in a terminal status, parcels whose
+    status may not change to `new_status` (see registry.py) and parcels
+    changed by another request while the batch ran are rejected.
+    Returns (updated, rejected): the tracking numbers that were updated and a
+    list of {"identifier", "error"} dicts.
+    """
+    rejected = []
+    keys = []
+    seen = set()
+    for identifier in identifiers:
+        if by == "tracking_number":
+            key = normalize_tracking_number(identifier) if isinstance(identifier, str) else None
+        else:
+            key = _as_id(identifier)
+        if key is None or key == -1:
+            rejected.append({"identifier": identifier, "error": "Invalid identifier."})
+            continue
+        if key not in seen:
+            seen.add(key)
+            keys.append((identifier, key))
+
+    with transaction.atomic():
+        terminal_ids = statuses.terminal_ids()
+
+        # key -> (id, tracking_number, status_id, sender_office_id, version)
+        found = {}
+        lookup = "tracking_number__in" if by == "tracking_number" else "pk__in"
+        for chunk in _chunks([key for _, key in keys]):
+            # Locked until the batch commits, where the database has row locks
+            for row in Parcel.objects.select_for_update().filter(**{lookup: chunk}).values_list(
+                "id", "tracking_number", "current_status_id", "sender_office_id", "version"
+            ):
+                found[row[1] if by == "tracking_number" else row[0]] = row
+
+        # id -> (identifier, tracking number) of the parcels to move
+        targets = {}
+        # (office id, status id) -> (id, version) of the targets read with them
+        groups = defaultdict(list)
+        for identifier, key in keys:
+            if key not in found:
+                rejected.append({"identifier": identifier, "error": "Parcel not found."})
+            elif found[key][2] in terminal_ids:
+                rejected.append({"identifier": identifier, "error": "Parcel already has terminal status."})
+            elif not statuses.can_transition(found[key][2], new_status.pk):
+                rejected.append({
+                    "identifier": identifier,
+                    "error": f"Cannot change status from {statuses.by_id(found[key][2]).code} to {new_status.code}.",
+                })
+            else:
+                parcel_id, tracking_number, status_id, office_id, version = found[key]
+                targets[parcel_id] = (identifier, tracking_number)
+                groups[(office_id, status_id)].append((parcel_id, version))
+
+        # Each UPDATE is guarded with the status, office and versions its
+        # parcels were read with, so a parcel changed since (by this request
+        # or, on a database without row locks, by another) is left alone.
+        # Counts, rollups and history follow exactly the parcels that moved.
+        changes = {"current_status": new_status, "version": F("version") + 1}
+        if new_status.code == "DELIVERED":
+            changes["delivered_at"] = timezone.now()
+            changes["delivered_price"] = delivered_price()
+        deltas = Counter()
+        moved = []
+        for (office_id, status_id), parcels in groups.items():
+            for chunk in _chunks(parcels):
+                moved_ids = _move(chunk, status_id, office_id, changes)
+                moved.extend(moved_ids)
+                deltas[(office_id, status_id)] -= len(moved_ids)
+                deltas[(office_id, new_status.pk)] += len(moved_ids)
+                if moved_ids and "delivered_at" in changes:
+                    record_deliveries(Parcel.objects.filter(pk__in=moved_ids).values(*DELIVERY_VALUES))
+        adjust_counts(deltas)
+
+        moved_set = set(moved)
+        for parcel_id, (identifier, _) in targets.items():
+            if parcel_id not in moved_set:
+                rejected.append({"identifier": identifier, "error": "Parcel changed concurrently."})
+
+        ParcelStatusHistory.objects.bulk_create(
+            [
+                ParcelStatusHistory(
+                    parcel_id=parcel_id,
+                    status=new_status,
+                    office=office,
+                    changed_by=employee,
+                    note=note,
+                )
+                for parcel_id in targets
+                if parcel_id in moved_set
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        updated = [tracking_number for parcel_id, (_, tracking_number) in targets.items() if parcel_id in moved_set]
+        invalidate_tracking(*updated)
+        if updated:
+            touch("parcels")
+
+    return updated, rejected
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def check_tracking_cache(app_configs, **kwargs):
+    """Tracking responses must be cached where every worker sees the invalidations (see tracking.py)."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if not backend.endswith(("LocMemCache", "DummyCache")):
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process.",
+            hint=(
+                "Tracking responses are invalidated in the cache of the worker that changed the "
+                "parcel only. Point CACHES at Redis or Memcached when running more than one worker."
+            ),
+            id="parcels.W001",
+        )
+    ]
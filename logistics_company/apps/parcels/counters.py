@@ -0,0 +1,75 @@
+"""
+Live parcel counts per sender office and status.
+
+ParcelStatusCount holds one row per (office, status). Every code path that
+creates, deletes or moves a parcel between statuses or offices passes its
+deltas to adjust_counts() inside the same transaction, so the pending
+deliveries summary can read the counts instead of scanning the parcels.
+
+Changes made outside those paths (e.g. QuerySet.update() in a shell) are
+not counted; `manage.py rebuild_parcel_counters` recomputes the table.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Parcel, ParcelStatusCount
+
+
+def _adjust(office_id, status_id, delta):
+    counts = ParcelStatusCount.objects.filter(office_id=office_id, status_id=status_id)
+    # Always update the first row: with a NULL office the unique constraint
+    # does not apply and a concurrent insert can add a second row for the
+    # key. Readers sum the rows, so the total stays right.
+    pk = counts.order_by("pk").values_list("pk", flat=True).first()
+    if pk is not None:
+        ParcelStatusCount.objects.filter(pk=pk).update(parcels_count=F("parcels_count") + delta)
+        return
+    try:
+        with transaction.atomic():
+            ParcelStatusCount.objects.create(office_id=office_id, status_id=status_id, parcels_count=delta)
+    except IntegrityError:
+        # Created concurrently since the lookup above
+        counts.update(parcels_count=F("parcels_count") + delta)
+
+
+def adjust_counts(deltas):
+    """
+    Apply {(office_id, status_id): delta} to the counts. Call inside the
+    transaction that makes the change.
+    """
+    for (office_id, status_id), delta in deltas.items():
+        if delta and status_id is not None:
+            _adjust(office_id, status_id, delta)
+
+
+def count_parcels(parcels, sign=1):
+    """Return the deltas that add (or, with sign=-1, remove) `parcels`."""
+    deltas = Counter()
+    for parcel in parcels:
+        deltas[(parcel.sender_office_id, parcel.current_status_id)] += sign
+    return deltas
+
+
+def rebuild_parcel_counters():
+    """Recompute all counts from the parcels. Returns the number of count rows."""
+    with transaction.atomic():
+        ParcelStatusCount.objects.all().delete()
+        rows = (
+            Parcel.objects.values("sender_office_id", "current_status_id")
+            .annotate(parcels_count=Count("id"))
+            .order_by()
+        )
+        created = ParcelStatusCount.objects.bulk_create(
+            [
+                ParcelStatusCount(
+                    office_id=row["sender_office_id"],
+                    status_id=row["current_status_id"],
+                    parcels_count=row["parcels_count"],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+    return len(created)
@@ -0,0 +1,22 @@
+from django import forms
+from .models import Parcel
+
+
+CONFLICT_MESSAGE = "Parcel was changed by another request. Reload it and try again."
+
+
+class ParcelAdminForm(forms.ModelForm):
+    class Meta:
+        model = Parcel
+        fields = "__all__"
+        widgets = {"version": forms.HiddenInput}
+
+    def clean_version(self):
+        # The admin saves in one transaction with the form's validation, so
+        # the row stays locked (on databases with row locks) until it is saved
+        version = self.cleaned_data["version"]
+        if self.instance.pk is not None:
+            current = Parcel.objects.select_for_update().filter(pk=self.instance.pk).values_list("version", flat=True)
+            if current.first() != version:
+                raise forms.ValidationError(CONFLICT_MESSAGE)
+        return version
@@ -0,0 +1,203 @@
+"""Helpers shared by the parcel benchmark commands."""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from apps.accounts.models import User, UserRole
+from apps.common.lookups import lookups
+from apps.common.models import Address, Tariff, DeliveryType
+from apps.common.tariffs import tariffs
+from apps.organizations.models import Company, Office
+from apps.parcels.models import Parcel, ParcelStatus
+from apps.parcels.registry import statuses
+from apps.workforce.models import Employee
+
+
+class Rollback(Exception):
+    """Raised at the end of a benchmark to roll back the data it generated."""
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Run the benchmark against a new, migrated database with the settings
+    of the profile in use, and drop it afterwards. The concurrent clients
+    must see committed rows, so nothing can be rolled back; this way the
+    parcels, statuses and sequence numbers a run creates never reach the
+    real database. SQLite gets a temporary file (an in-memory database
+    would not show the profile's locking); PostgreSQL a test_ database,
+    which needs the CREATEDB privilege.
+    """
+    directory = None
+    if connection.vendor == "sqlite":
+        directory = tempfile.mkdtemp(prefix="bench-")
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "bench.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Nothing loaded from the real database may be reused
+    statuses.clear()
+    tariffs.clear()
+    lookups.clear()
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def create_fixtures():
+    """Create the company, offices, tariff, status and clients generated parcels point to."""
+    address = Address.objects.create(country="Bulgaria", city="Sofia", postal_code="1000", street="Bench St 1")
+    company = Company.objects.create(name="Bench Co", bulstat="BENCH-0001", address=address)
+    tariff = Tariff.objects.create(company=company, delivery_type=DeliveryType.STANDARD, price_per_kg=Decimal("5.00"))
+    offices = [
+        Office.objects.create(company=company, name=f"Bench Office {i}", code=f"BENCH-{i}", address=address)
+        for i in range(2)
+    ]
+    status, _ = ParcelStatus.objects.get_or_create(code="CREATED", defaults={"name": "Created"})
+    sender = User.objects.create(username="bench_sender", email="bench_sender@example.com",
+                                 first_name="Bench", last_name="Sender", role=UserRole.CLIENT,
+                                 default_address=address)
+    receiver = User.objects.create(username="bench_receiver", email="bench_receiver@example.com",
+                                   first_name="Bench", last_name="Receiver", role=UserRole.CLIENT,
+                                   default_address=address)
+    return {
+        "address": address,
+        "company": company,
+        "tariff": tariff,
+        "offices": offices,
+        "status": status,
+        "sender": sender,
+        "receiver": receiver,
+    }
+
+
+def create_employee():
+    """The employee the concurrent benchmarks send their requests as."""
+    user = User.objects.create(
+        username="bench_employee", email="bench_employee@example.com",
+        first_name="Bench", last_name="Employee", role=UserRole.EMPLOYEE,
+    )
+    return Employee.objects.create(
+        user=user, employee_code="BENCH-EMP", employee_type=Employee.EmployeeType.OFFICE,
+        hire_date=date.today(), salary=Decimal("1000.00"),
+    )
+
+
+def bulk_create_parcels(fixtures, count, start=0, batch_size=5000):
+    """Insert `count` parcels numbered from `start`, BENCH0000000000 onwards."""
+    now = timezone.now()
+    for offset in range(start, start + count, batch_size):
+        Parcel.objects.bulk_create(
+            [
+                Parcel(
+                    tracking_number=f"BENCH{i:010d}",
+                    company=fixtures["company"],
+                    sender=fixtures["sender"],
+                    receiver=fixtures["receiver"],
+                    sender_office=fixtures["offices"][0],
+                    receiver_office=fixtures["offices"][1],
+                    pickup_address=fixtures["address"],
+                    delivery_address=fixtures["address"],
+                    delivery_type=DeliveryType.STANDARD,
+                    weight_kg=Decimal("1.250"),
+                    tariff=fixtures["tariff"],
+                    current_status=fixtures["status"],
+                    created_at=now,
+                )
+                for i in range(offset, min(offset + batch_size, start + count))
+            ]
+        )
+
+
+def run_clients(user, clients, requests, send):
+    """
+    Run `clients` threads, each with its own test client and database
+    connection, that call send(client, thread_index, request_index) and
+    time it `requests` times. send() returns the response.
+
+    Returns {"seconds", "latencies", "statuses", "errors"}: the wall time,
+    sorted latencies in ms, a Counter of response status codes and a
+    Counter of error messages of the requests that did not return 200.
+    """
+    start = threading.Barrier(clients + 1)
+    latencies = []
+    status_codes = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+
+    def worker(index):
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(user)
+        start.wait()
+        try:
+            for i in range(requests):
+                started = time.perf_counter()
+                try:
+                    response = send(client, index, i)
+                    status = response.status_code
+                    error = None if status == 200 else response.json().get("error", status)
+                except Exception as e:
+                    status, error = "exception", str(e)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    status_codes[status] += 1
+                    if error is not None:
+                        errors[str(error)[:80]] += 1
+        finally:
+            connections.close_all()
+
+    # Failed requests are counted; keep them out of the log.
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+    finally:
+        request_logger.setLevel(level)
+    return {
+        "seconds": time.perf_counter() - started,
+        "latencies": sorted(latencies),
+        "statuses": status_codes,
+        "errors": errors,
+    }
+
+
+def write_report(stdout, results, clients, unit):
+    """Write the results of run_clients(); throughput counts 200 responses as `unit`."""
+    latencies = results["latencies"]
+    succeeded = results["statuses"][200]
+
+    def percentile(pct):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+    options = settings.DATABASES["default"].get("OPTIONS", {})
+    stdout.write(f"profile:     {getattr(settings, 'DB_PROFILE', '-')} ({connection.vendor})")
+    if connection.vendor == "sqlite":
+        stdout.write(f"init:        {options.get('init_command', '-')}")
+    stdout.write(f"clients:     {clients}")
+    stdout.write(f"requests:    {len(latencies)} ({succeeded} ok, {len(latencies) - succeeded} failed)")
+    stdout.write(f"throughput:  {succeeded / results['seconds']:.1f} {unit}/s")
+    stdout.write(f"latency ms:  p50 {percentile(50):.1f}  p95 {percentile(95):.1f}  max {latencies[-1]:.1f}")
+    for error, count in results["errors"].most_common(5):
+        stdout.write(f"  {count:>5} x {error}")
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from apps.common.models import DeliveryType
+
+from ._bench import create_employee, create_fixtures, run_clients, throwaway_database, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure parcels_api_create write throughput with concurrent clients against the "
+        "database profile in use, on a throwaway database that is dropped afterwards. Compare "
+        "profiles by running it once per DB_PROFILE, e.g. "
+        "DB_PROFILE=sqlite-tuned manage.py benchmark_concurrent_create. The plain sqlite profile "
+        "is only the baseline: expect 'database is locked' failures from it; concurrent writers "
+        "need sqlite-tuned or postgres"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["requests"] < 1:
+            raise CommandError("--clients and --requests must be positive.")
+
+        with throwaway_database():
+            results = self._run(create_fixtures(), create_employee(), options["clients"], options["requests"])
+
+        write_report(self.stdout, results, options["clients"], "parcels")
+
+    def _run(self, fixtures, employee, clients, requests):
+        payload = json.dumps({
+            "sender_id": fixtures["sender"].pk,
+            "receiver_id": fixtures["receiver"].pk,
+            "sender_office_id": fixtures["offices"][0].pk,
+            "receiver_office_id": fixtures["offices"][1].pk,
+            "weight_kg": "1.250",
+            "delivery_type": DeliveryType.STANDARD,
+        })
+        url = reverse("parcels_api_create")
+        return run_clients(
+            employee.user, clients, requests,
+            lambda client, index, i: client.post(url, payload, content_type="application/json"),
+        )
@@ -0,0 +1,70 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from apps.parcels.counters import adjust_counts, count_parcels
+from apps.parcels.models import Parcel, ParcelStatus
+from apps.parcels.registry import create_standard_transitions
+
+from ._bench import (
+    bulk_create_parcels, create_employee, create_fixtures, run_clients, throwaway_database, write_report
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure parcels_api_update_status throughput with concurrent scanners, on a throwaway "
+        "database that is dropped afterwards. By default every scan hits a different parcel; with "
+        "--shared N all clients scan the same N parcels, so concurrent scans of one parcel conflict "
+        "and the later ones get 409. Needs DB_PROFILE=sqlite-tuned or postgres"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+        parser.add_argument("--requests", type=int, default=50, help="Scans per client")
+        parser.add_argument("--shared", type=int, default=0, help="Parcels all clients scan (0: one per scan)")
+
+    def handle(self, *args, **options):
+        clients, requests, shared = options["clients"], options["requests"], options["shared"]
+        if clients < 1 or requests < 1 or shared < 0:
+            raise CommandError("--clients and --requests must be positive and --shared not negative.")
+        if settings.DB_PROFILE == "sqlite":
+            # Its writers fail with "database is locked" instead of waiting,
+            # which would be counted as conflicts
+            raise CommandError("Concurrent scans need DB_PROFILE=sqlite-tuned or postgres.")
+
+        with throwaway_database():
+            fixtures = create_fixtures()
+            employee = create_employee()
+            parcel_ids = self._create_parcels(fixtures, shared or clients * requests)
+            results = self._run(employee, parcel_ids, clients, requests, shared)
+
+        write_report(self.stdout, results, clients, "scans")
+        conflicts = results["statuses"][409]
+        self.stdout.write(f"conflicts:   {conflicts} ({conflicts / sum(results['statuses'].values()):.1%})")
+
+    @staticmethod
+    def _create_parcels(fixtures, count):
+        in_transit, _ = ParcelStatus.objects.get_or_create(code="IN_TRANSIT", defaults={"name": "In Transit"})
+        create_standard_transitions({"CREATED": fixtures["status"], "IN_TRANSIT": in_transit})
+        bulk_create_parcels(fixtures, count)
+        parcels = Parcel.objects.filter(company=fixtures["company"])
+        adjust_counts(count_parcels(parcels.only("sender_office_id", "current_status_id")))
+        return list(parcels.order_by("pk").values_list("pk", flat=True))
+
+    @staticmethod
+    def _run(employee, parcel_ids, clients, requests, shared):
+        # IN_TRANSIT may follow itself (a scan at the next hub), so a parcel can be scanned again
+        payload = json.dumps({"status_code": "IN_TRANSIT"})
+
+        def send(client, index, i):
+            if shared:
+                parcel_id = parcel_ids[i % shared]
+            else:
+                parcel_id = parcel_ids[index * requests + i]
+            url = reverse("parcels_api_update_status", args=[parcel_id])
+            return client.post(url, payload, content_type="application/json")
+
+        return run_clients(employee.user, clients, requests, send)
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.parcels.models import Parcel
+from apps.parcels.serializers import REPORT_FIELDS, serialize_parcels
+
+from ._bench import Rollback, bulk_create_parcels, create_fixtures
+
+
+def model_rows(queryset):
+    """The per-instance serialization the report views used before serializers.py."""
+    queryset = queryset.select_related(
+        "company",
+        "sender",
+        "receiver",
+        "current_status",
+        "sender_office",
+        "receiver_office",
+        "pickup_address",
+        "delivery_address",
+        "tariff",
+    )
+    return [
+        {
+            "tracking_number": p.tracking_number,
+            "status": p.current_status.name if p.current_status else "-",
+            "delivery_type": p.get_delivery_type_display(),
+            "price": float(p.price),
+            "weight_kg": float(p.weight_kg),
+            "sender": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
+            "receiver": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
+            "sender_office": str(p.sender_office) if p.sender_office else "-",
+            "receiver_office": str(p.receiver_office) if p.receiver_office else "-",
+            "pickup_address": str(p.pickup_address) if p.pickup_address else "-",
+            "delivery_address": str(p.delivery_address) if p.delivery_address else "-",
+            "created_at": p.created_at.strftime("%Y-%m-%d %H:%M"),
+            "delivered_at": p.delivered_at.strftime("%Y-%m-%d %H:%M") if p.delivered_at else "-",
+        }
+        for p in queryset
+    ]
+
+
+def projected_rows(queryset):
+    return list(serialize_parcels(queryset, REPORT_FIELDS))
+
+
+class Command(BaseCommand):
+    help = "Compare model-instance and column-projected serialization of parcel report rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Number of parcels to generate")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the best run is reported")
+
+    def handle(self, *args, **options):
+        # Everything is generated inside a transaction that is rolled back,
+        # so the benchmark can run against any database without leaving data.
+        try:
+            with transaction.atomic():
+                bulk_create_parcels(create_fixtures(), options["rows"])
+                self._run(options["repeat"])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def _run(self, repeat):
+        queryset = Parcel.objects.order_by("-created_at")
+
+        if model_rows(queryset) != projected_rows(queryset):
+            self.stderr.write(self.style.ERROR("Serializers disagree; benchmark aborted."))
+            return
+
+        results = {}
+        for name, strategy in (("model instances", model_rows), ("column projection", projected_rows)):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                strategy(queryset)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            self.stdout.write(f"{name:>18}: {best * 1000:9.1f} ms")
+
+        speedup = results["model instances"] / results["column projection"]
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {speedup:.2f}x"))
@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.parcels.models import Parcel
+
+from ._bench import Rollback, bulk_create_parcels, create_fixtures
+
+
+class Command(BaseCommand):
+    help = (
+        "Time tracking number lookups as the parcel table grows, comparing the "
+        "exact match on the unique index with the old case-insensitive lookup"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="10000,100000,1000000",
+            help="Comma-separated table sizes to measure at, e.g. 10000,100000,1000000,10000000",
+        )
+        parser.add_argument("--lookups", type=int, default=200, help="Lookups per size and strategy")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options["sizes"].split(","))
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+
+        rng = random.Random(options["seed"])
+        self.stdout.write(f"{'rows':>10} {'exact (ms)':>12} {'iexact (ms)':>12}")
+
+        # The table is grown in place and everything is rolled back at the end.
+        try:
+            with transaction.atomic():
+                fixtures = create_fixtures()
+                created = 0
+                for size in sizes:
+                    bulk_create_parcels(fixtures, size - created, start=created)
+                    created = size
+
+                    numbers = [f"BENCH{rng.randrange(size):010d}" for _ in range(options["lookups"])]
+                    exact = self._time(numbers, lambda n: Parcel.objects.get(tracking_number=n))
+                    iexact = self._time(numbers, lambda n: Parcel.objects.get(tracking_number__iexact=n.lower()))
+                    self.stdout.write(f"{size:>10} {exact:>12.3f} {iexact:>12.3f}")
+                raise Rollback()
+        except Rollback:
+            pass
+
+    @staticmethod
+    def _time(numbers, lookup):
+        """Mean latency of one lookup, in milliseconds."""
+        started = time.perf_counter()
+        for number in numbers:
+            lookup(number)
+        return (time.perf_counter() - started) * 1000 / len(numbers)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.parcels.rollups import rebuild_income_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily income rollups used by the income report from the delivered parcels"
+
+    def handle(self, *args, **options):
+        count = rebuild_income_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily income rollup rows."))
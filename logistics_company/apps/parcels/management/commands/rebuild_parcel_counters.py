@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.parcels.counters import rebuild_parcel_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-office parcel status counts used by the pending deliveries summary"
+
+    def handle(self, *args, **options):
+        count = rebuild_parcel_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} parcel count rows."))
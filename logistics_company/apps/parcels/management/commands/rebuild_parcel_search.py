@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.parcels.search import rebuild_parcel_search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the parcel search documents and their full-text index"
+
+    def handle(self, *args, **options):
+        count = rebuild_parcel_search()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} parcels."))
@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Trim, Upper
+
+
+def normalize_tracking_numbers(apps, schema_editor):
+    """
+    Store every tracking number in its canonical (trimmed, upper-case) form.
+
+    Fails, naming the parcels, if a canonical form would be shared with
+    another parcel: the unique index allows only one of them, and which one
+    keeps the number is for a person to decide.
+    """
+    Parcel = apps.get_model("parcels", "Parcel")
+
+    stale = list(
+        Parcel.objects.annotate(canonical=Upper(Trim("tracking_number")))
+        .exclude(tracking_number=F("canonical"))
+        .values_list("id", "canonical")
+    )
+    uses = Counter(canonical for _, canonical in stale)
+    canonicals = list(uses)
+    for start in range(0, len(canonicals), 500):
+        uses.update(
+            Parcel.objects.filter(tracking_number__in=canonicals[start:start + 500])
+            .values_list("tracking_number", flat=True)
+        )
+    collisions = sorted(parcel_id for parcel_id, canonical in stale if uses[canonical] > 1)
+    if collisions:
+        raise ValueError(
+            "Cannot normalize the tracking numbers of parcels "
+            f"{', '.join(map(str, collisions))}: another parcel has the same number in "
+            "another case or with surrounding spaces. Change one of each pair and migrate again."
+        )
+
+    for parcel_id, canonical in stale:
+        Parcel.objects.filter(pk=parcel_id).update(tracking_number=canonical)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0004_alter_parcelstatus_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_tracking_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_tariff'),
+        ('organizations', '0001_initial'),
+        ('parcels', '0005_normalize_tracking_numbers'),
+        ('workforce', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parcel',
+            index=models.Index(fields=['current_status', '-created_at'], name='parcel_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parcel',
+            index=models.Index(condition=models.Q(('delivered_at__isnull', False)), fields=['current_status', '-delivered_at'], name='parcel_delivered_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parcel',
+            index=models.Index(fields=['sender', '-created_at'], name='parcel_sender_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parcel',
+            index=models.Index(fields=['receiver', '-created_at'], name='parcel_receiver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parcel',
+            index=models.Index(fields=['registered_by', '-created_at'], name='parcel_registered_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='parcel',
+            name='current_status',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='parcels', to='parcels.parcelstatus'),
+        ),
+        migrations.AlterField(
+            model_name='parcel',
+            name='receiver',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='received_parcels', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='parcel',
+            name='registered_by',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registered_parcels', to='workforce.employee'),
+        ),
+        migrations.AlterField(
+            model_name='parcel',
+            name='sender',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='sent_parcels', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    """
+    Price the parcels delivered so far at their tariff's current rate, the
+    best record there is of it, and fill the rollup from those prices.
+    """
+    Parcel = apps.get_model("parcels", "Parcel")
+    Tariff = apps.get_model("common", "Tariff")
+    DailyIncomeRollup = apps.get_model("parcels", "DailyIncomeRollup")
+
+    delivered = Parcel.objects.filter(current_status__code="DELIVERED", delivered_at__isnull=False)
+    rate = Tariff.objects.filter(pk=OuterRef("tariff_id")).values("price_per_kg")
+    Parcel.objects.filter(pk__in=delivered.filter(tariff__isnull=False).values("pk")).update(
+        delivered_price=ExpressionWrapper(
+            F("weight_kg") * Subquery(rate), output_field=DecimalField(max_digits=18, decimal_places=5)
+        )
+    )
+
+    rows = (
+        delivered.values("company_id", "sender_office_id", "delivery_type", day=TruncDate("delivered_at"))
+        .annotate(parcels_count=Count("id"), income=Sum("delivered_price"))
+        .order_by()
+    )
+    DailyIncomeRollup.objects.bulk_create(
+        [
+            DailyIncomeRollup(
+                day=row["day"],
+                company_id=row["company_id"],
+                office_id=row["sender_office_id"],
+                delivery_type=row["delivery_type"],
+                parcels_count=row["parcels_count"],
+                income=row["income"] or Decimal("0"),
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_tariff'),
+        ('organizations', '0001_initial'),
+        ('parcels', '0006_parcel_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcel',
+            name='delivered_price',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=18, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyIncomeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('delivery_type', models.CharField(choices=[('STANDARD', 'Standard'), ('EXPRESS', 'Express')], max_length=20)),
+                ('parcels_count', models.PositiveIntegerField(default=0)),
+                ('income', models.DecimalField(decimal_places=5, default=Decimal('0'), max_digits=18)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='income_rollups', to='organizations.company')),
+                ('office', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='income_rollups', to='organizations.office')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'company', 'office', 'delivery_type'), name='uniq_income_rollup_key')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_counts(apps, schema_editor):
+    """Count the existing parcels per sender office and status."""
+    Parcel = apps.get_model("parcels", "Parcel")
+    ParcelStatusCount = apps.get_model("parcels", "ParcelStatusCount")
+
+    rows = (
+        Parcel.objects.values("sender_office_id", "current_status_id")
+        .annotate(parcels_count=Count("id"))
+        .order_by()
+    )
+    ParcelStatusCount.objects.bulk_create(
+        [
+            ParcelStatusCount(
+                office_id=row["sender_office_id"],
+                status_id=row["current_status_id"],
+                parcels_count=row["parcels_count"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0001_initial'),
+        ('parcels', '0007_daily_income_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParcelStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parcels_count', models.IntegerField(default=0)),
+                ('office', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parcel_counts', to='organizations.office')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parcel_counts', to='parcels.parcelstatus')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('office', 'status'), name='uniq_parcel_count_key')],
+            },
+        ),
+        migrations.RunPython(build_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Func, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+# A copy of apps.parcels.search as of this migration, so later changes to
+# that module do not change what this migration does.
+
+FTS_TABLE = "parcels_parcelsearch_fts"
+
+DOCUMENT_FIELDS = [
+    "tracking_number",
+    "sender__username", "sender__first_name", "sender__last_name", "sender__email", "sender__phone",
+    "receiver__username", "receiver__first_name", "receiver__last_name", "receiver__email", "receiver__phone",
+    "sender_office__name",
+    "receiver_office__name",
+]
+
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        document,
+        content='parcels_parcelsearch',
+        content_rowid='parcel_id',
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.parcel_id, new.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.parcel_id, old.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.parcel_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.parcel_id, new.document);
+    END
+    """,
+]
+
+SQLITE_DROP = [f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}" for suffix in ("ai", "ad", "au")] + [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}"
+]
+
+POSTGRESQL_CREATE = [
+    "CREATE INDEX parcels_parcelsearch_document_fts ON parcels_parcelsearch USING gin "
+    "(to_tsvector('simple', regexp_replace(document, '[^[:alnum:]]+', ' ', 'g')))",
+]
+
+POSTGRESQL_DROP = ["DROP INDEX IF EXISTS parcels_parcelsearch_document_fts"]
+
+
+class Document(Func):
+    # The fields joined with spaces (Concat() nests too deep for SQLite)
+    template = "%(expressions)s"
+    arg_joiner = " || ' ' || "
+    output_field = TextField()
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index and a document for every existing parcel."""
+    vendor = schema_editor.connection.vendor
+    for sql in {"sqlite": SQLITE_CREATE, "postgresql": POSTGRESQL_CREATE}.get(vendor, []):
+        schema_editor.execute(sql)
+
+    Parcel = apps.get_model("parcels", "Parcel")
+    document = Document(*(Coalesce(F(name), Value("")) for name in DOCUMENT_FIELDS))
+    rows = (
+        Parcel.objects.using(schema_editor.connection.alias)
+        .order_by()
+        .annotate(search_document=document)
+        .values_list("pk", "search_document")
+    )
+    select, params = rows.query.sql_with_params()
+    schema_editor.execute(f"INSERT INTO parcels_parcelsearch (parcel_id, document) {select}", params)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for sql in {"sqlite": SQLITE_DROP, "postgresql": POSTGRESQL_DROP}.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0008_parcel_status_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParcelSearch',
+            fields=[
+                ('parcel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='parcels.parcel')),
+                ('document', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'Parcel search documents',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:41
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    """
+    Start the EXP sequence at 1. Allocated numbers have 13 digits after the
+    prefix, so they cannot clash with the existing EXP numbers (8 date
+    digits and 6 hex digits, or 12 digits in the sample data).
+    """
+    TrackingNumberSequence = apps.get_model("parcels", "TrackingNumberSequence")
+    TrackingNumberSequence.objects.using(schema_editor.connection.alias).get_or_create(prefix="EXP")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0009_parcel_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackingNumberSequence',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
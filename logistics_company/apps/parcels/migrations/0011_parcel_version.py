@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0010_tracking_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcel',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
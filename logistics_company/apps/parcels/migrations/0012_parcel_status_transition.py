@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The workflow the views allowed implicitly until now, minus the jumps that
+# skip steps or leave a terminal status
+TRANSITIONS = {
+    "CREATED": ("IN_TRANSIT", "CANCELLED"),
+    "IN_TRANSIT": ("IN_TRANSIT", "OUT_FOR_DELIVERY", "DELIVERED", "RETURNED"),
+    "OUT_FOR_DELIVERY": ("IN_TRANSIT", "DELIVERED", "RETURNED"),
+}
+
+
+def create_transitions(apps, schema_editor):
+    """Add the standard transitions between the statuses already seeded."""
+    ParcelStatus = apps.get_model("parcels", "ParcelStatus")
+    ParcelStatusTransition = apps.get_model("parcels", "ParcelStatusTransition")
+
+    ids = dict(ParcelStatus.objects.values_list("code", "id"))
+    ParcelStatusTransition.objects.bulk_create([
+        ParcelStatusTransition(from_status_id=ids[source], to_status_id=ids[target])
+        for source, targets in TRANSITIONS.items()
+        for target in targets
+        if source in ids and target in ids
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parcels', '0011_parcel_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParcelStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='parcels.parcelstatus')),
+                ('to_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='parcels.parcelstatus')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('from_status', 'to_status'), name='uniq_status_transition')],
+            },
+        ),
+        migrations.RunPython(create_transitions, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,28 @@ from django.db import models
 from django.core.validators import MinValueValidator
 
 from apps.common.models import DeliveryType
+from apps.common.tariffs import tariffs
+
+
+def normalize_tracking_number(tracking_number):
+    """
+    Canonical form of a tracking number: no surrounding whitespace, upper case.
+    Stored numbers are always canonical, so lookups can use an exact match on
+    the unique index instead of a case-insensitive scan.
+    """
+    return tracking_number.strip().upper()
+
+
+class TrackingNumberSequence(models.Model):
+    """
+    Next free sequence number of the tracking numbers with this prefix.
+    Processes reserve blocks from it (see apps.parcels.numbers).
+    """
+    prefix = models.CharField(max_length=10, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefix}: {self.next_value}"
 
 
 class ParcelStatus(models.Model):
@@ -24,6 +46,24 @@ class ParcelStatus(models.Model):
         return self.name
 
 
+class ParcelStatusTransition(models.Model):
+    """
+    A status change a parcel may make; changes that are not listed are
+    rejected, and terminal statuses allow none. Compiled into the status
+    registry (apps.parcels.registry) with the statuses.
+    """
+    from_status = models.ForeignKey(ParcelStatus, on_delete=models.CASCADE, related_name="transitions")
+    to_status = models.ForeignKey(ParcelStatus, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["from_status", "to_status"], name="uniq_status_transition")
+        ]
+
+    def __str__(self):
+        return f"{self.from_status.code} -> {self.to_status.code}"
+
+
 class Parcel(models.Model):
     tracking_number = models.CharField(max_length=50, unique=True, db_index=True)
 
@@ -32,11 +72,13 @@ class Parcel(models.Model):
         null=True, blank=True  # Nullable for migration; should be set when creating parcels
     )
 
+    # sender, receiver, current_status and registered_by lead composite
+    # indexes (see Meta), so they need no single-column index of their own.
     sender = models.ForeignKey(
-        "accounts.User", on_delete=models.PROTECT, related_name="sent_parcels"
+        "accounts.User", on_delete=models.PROTECT, related_name="sent_parcels", db_index=False
     )
     receiver = models.ForeignKey(
-        "accounts.User", on_delete=models.PROTECT, related_name="received_parcels"
+        "accounts.User", on_delete=models.PROTECT, related_name="received_parcels", db_index=False
     )
 
     sender_office = models.ForeignKey(
@@ -58,26 +100,62 @@ class Parcel(models.Model):
         "common.Tariff", on_delete=models.SET_NULL, null=True, blank=True, related_name="parcels"
     )
 
-    current_status = models.ForeignKey(ParcelStatus, on_delete=models.PROTECT, related_name="parcels")
+    current_status = models.ForeignKey(
+        ParcelStatus, on_delete=models.PROTECT, related_name="parcels", db_index=False
+    )
 
     registered_by = models.ForeignKey(
-        "workforce.Employee", on_delete=models.SET_NULL, null=True, blank=True, related_name="registered_parcels"
+        "workforce.Employee", on_delete=models.SET_NULL, null=True, blank=True, related_name="registered_parcels",
+        db_index=False
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
+    # Price at the tariff's rate when the parcel was delivered, booked in the
+    # income rollup (see rollups.py)
+    delivered_price = models.DecimalField(max_digits=18, decimal_places=5, null=True, blank=True)
+
+    # Bumped by every write through the APIs and the admin. Status changes
+    # update the row only while it still has the version they read, so
+    # concurrent scans of one parcel cannot both succeed.
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Pending deliveries and status filters, newest first
+            models.Index(fields=["current_status", "-created_at"], name="parcel_status_created_idx"),
+            # Income report for a period. delivered_at is only set when a parcel
+            # is delivered, so the partial index holds just the delivered parcels.
+            models.Index(
+                fields=["current_status", "-delivered_at"],
+                condition=models.Q(delivered_at__isnull=False),
+                name="parcel_delivered_at_idx",
+            ),
+            # Client reports and dashboards
+            models.Index(fields=["sender", "-created_at"], name="parcel_sender_created_idx"),
+            models.Index(fields=["receiver", "-created_at"], name="parcel_receiver_created_idx"),
+            # Parcels by employee report
+            models.Index(fields=["registered_by", "-created_at"], name="parcel_registered_created_idx"),
+        ]
 
     @property
     def price(self):
         """Calculate price based on weight and tariff."""
-        if self.tariff and self.weight_kg:
-            return self.weight_kg * self.tariff.price_per_kg
-        return Decimal("0.00")
+        if not self.tariff_id or not self.weight_kg:
+            return Decimal("0.00")
+        # Use the tariff cache unless the tariff is already loaded
+        tariff = None if Parcel.tariff.is_cached(self) else tariffs.by_id(self.tariff_id)
+        if tariff is None:
+            tariff = self.tariff
+        return self.weight_kg * tariff.price_per_kg
 
     def clean(self):
         """Validate parcel has proper origin and destination."""
         errors = {}
 
+        if self.tracking_number:
+            self.tracking_number = normalize_tracking_number(self.tracking_number)
+
         has_sender_office = self.sender_office_id is not None
         has_pickup_address = self.pickup_address_id is not None
 
@@ -142,3 +220,68 @@ class ParcelNote(models.Model):
 
     def __str__(self):
         return f"{self.parcel.tracking_number} ({self.note_type})"
+
+
+class DailyIncomeRollup(models.Model):
+    """
+    Income from delivered parcels per delivery day, company, sender office and
+    delivery type. Kept up to date by apps.parcels.rollups when parcels are
+    delivered; rebuilt from the parcels with `manage.py rebuild_income_rollups`.
+    """
+    day = models.DateField()
+    company = models.ForeignKey(
+        "organizations.Company", on_delete=models.CASCADE, null=True, blank=True, related_name="income_rollups"
+    )
+    office = models.ForeignKey(
+        "organizations.Office", on_delete=models.CASCADE, null=True, blank=True, related_name="income_rollups"
+    )
+    delivery_type = models.CharField(max_length=20, choices=DeliveryType.choices)
+    parcels_count = models.PositiveIntegerField(default=0)
+    income = models.DecimalField(max_digits=18, decimal_places=5, default=Decimal("0"))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "company", "office", "delivery_type"], name="uniq_income_rollup_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.delivery_type}: {self.parcels_count} parcels, {self.income}"
+
+
+class ParcelStatusCount(models.Model):
+    """
+    Number of parcels per sender office and current status, maintained by
+    apps.parcels.counters in the same transaction as every status change.
+    Rebuilt from the parcels with `manage.py rebuild_parcel_counters`.
+    """
+    office = models.ForeignKey(
+        "organizations.Office", on_delete=models.CASCADE, null=True, blank=True, related_name="parcel_counts"
+    )
+    status = models.ForeignKey(ParcelStatus, on_delete=models.CASCADE, related_name="parcel_counts")
+    parcels_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["office", "status"], name="uniq_parcel_count_key")
+        ]
+
+    def __str__(self):
+        return f"{self.office or '-'} / {self.status}: {self.parcels_count}"
+
+
+class ParcelSearch(models.Model):
+    """
+    Search document of a parcel, maintained by apps.parcels.search and
+    indexed for full-text search (FTS5 on SQLite, a tsvector GIN index on
+    PostgreSQL). Rebuilt with `manage.py rebuild_parcel_search`.
+    """
+    parcel = models.OneToOneField(Parcel, on_delete=models.CASCADE, primary_key=True, related_name="search")
+    document = models.TextField()
+
+    class Meta:
+        verbose_name_plural = "Parcel search documents"
+
+    def __str__(self):
+        return self.document
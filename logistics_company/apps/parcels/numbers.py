@@ -0,0 +1,119 @@
+"""
+Tracking number allocation.
+
+A tracking number is the prefix, a 12-digit sequence number and a Luhn
+check digit, e.g. EXP0000000012344. The check digit lets the tracking page
+reject most mistyped numbers, and the fixed length keeps these numbers apart
+from the older EXP formats.
+
+The sequence lives in TrackingNumberSequence. A process reserves a block
+of BLOCK_SIZE numbers with one UPDATE of that row and hands them out from
+memory, so the numbers are unique across processes and threads without an
+existence check or retry, and most parcels cost no query for their number:
+
+    from apps.parcels.numbers import tracking_numbers
+
+    number = tracking_numbers.allocate()[0]
+    numbers = tracking_numbers.allocate(500)
+
+Numbers of a block that a process never uses are skipped; the numbers are
+unique, not gapless. A block reserved in a transaction that rolls back
+would go back to the sequence while the process kept handing it out, so
+inside an atomic block only the numbers asked for are reserved, as part of
+that transaction; allocate before entering it where possible.
+"""
+import os
+import threading
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import TrackingNumberSequence
+
+
+PREFIX = "EXP"
+SEQUENCE_DIGITS = 12
+
+
+def luhn_check_digit(digits):
+    """Luhn check digit for a string of decimal digits."""
+    total = 0
+    # Double every second digit from the right, starting with the last one
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def format_tracking_number(value, prefix=PREFIX):
+    digits = f"{value:0{SEQUENCE_DIGITS}d}"
+    return f"{prefix}{digits}{luhn_check_digit(digits)}"
+
+
+def has_valid_check_digit(tracking_number, prefix=PREFIX):
+    """
+    False for a number in the allocated format whose check digit is wrong.
+    Numbers in any other format (older EXP numbers, sample data) pass.
+    """
+    digits = tracking_number[len(prefix):]
+    if not tracking_number.startswith(prefix) or len(digits) != SEQUENCE_DIGITS + 1 or not digits.isdigit():
+        return True
+    return luhn_check_digit(digits[:-1]) == digits[-1]
+
+
+def _reserve(prefix, count):
+    """Reserve `count` sequence numbers and return the first one."""
+    sequences = TrackingNumberSequence.objects.filter(prefix=prefix)
+    with transaction.atomic():
+        # UPDATE first: it takes the row's write lock before the value is read
+        if not sequences.update(next_value=F("next_value") + count):
+            # The migration creates the row; it is only missing from a flushed database
+            try:
+                with transaction.atomic():
+                    TrackingNumberSequence.objects.create(prefix=prefix, next_value=1 + count)
+                return 1
+            except IntegrityError:
+                # Created concurrently since the update above
+                sequences.update(next_value=F("next_value") + count)
+        return sequences.values_list("next_value", flat=True).get() - count
+
+
+class TrackingNumberAllocator:
+    BLOCK_SIZE = 1000
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+
+    def allocate(self, count=1):
+        """Return `count` new tracking numbers."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not share its parent's block
+                self._next = self._end = 0
+                self._pid = os.getpid()
+
+            taken = min(count, self._end - self._next)
+            values = list(range(self._next, self._next + taken))
+            self._next += taken
+
+            missing = count - taken
+            if missing:
+                if connection.in_atomic_block:
+                    start = _reserve(self.prefix, missing)
+                else:
+                    size = max(missing, self.BLOCK_SIZE)
+                    start = _reserve(self.prefix, size)
+                    self._next, self._end = start + missing, start + size
+                values.extend(range(start, start + missing))
+
+        return [format_tracking_number(value, self.prefix) for value in values]
+
+
+tracking_numbers = TrackingNumberAllocator()
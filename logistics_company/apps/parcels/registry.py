@@ -0,0 +1,139 @@
+"""
+Process-local registry of parcel statuses and their transitions.
+
+ParcelStatus is a tiny, seeded table that almost never changes, yet nearly
+every request that touches a parcel needs a status by code or id. The
+registry loads the whole table once, together with the allowed transitions
+(ParcelStatusTransition), and then answers those lookups from memory:
+
+    from apps.parcels.registry import statuses
+
+    created = statuses.initial()
+    status = statuses.by_id(parcel.current_status_id)
+    if statuses.can_transition(parcel.current_status_id, status.pk): ...
+    pending = Parcel.objects.filter(current_status_id__in=statuses.open_ids())
+
+It is the one source of the status sets the views use:
+
+- terminal: statuses flagged is_terminal; a parcel in one cannot change
+- open: all the others, i.e. parcels pending delivery
+- deletable: the initial status and the terminal statuses reachable from
+  it directly (a parcel cancelled before it left the office)
+
+post_save/post_delete signals on ParcelStatus and ParcelStatusTransition
+clear it in the process that made the change (see signals.py). Other worker
+processes reload it after MAX_AGE seconds at the latest.
+
+Delivery types are a code-level enum (apps.common.models.DeliveryType) and
+need no registry.
+"""
+import threading
+import time
+
+from .models import ParcelStatus, ParcelStatusTransition
+
+
+# The status parcels are registered with
+INITIAL_STATUS = "CREATED"
+
+# The standard workflow between the seeded statuses (see seed_data)
+STANDARD_TRANSITIONS = {
+    "CREATED": ("IN_TRANSIT", "CANCELLED"),
+    "IN_TRANSIT": ("IN_TRANSIT", "OUT_FOR_DELIVERY", "DELIVERED", "RETURNED"),
+    "OUT_FOR_DELIVERY": ("IN_TRANSIT", "DELIVERED", "RETURNED"),
+}
+
+
+def create_standard_transitions(by_code):
+    """Create the STANDARD_TRANSITIONS between the statuses in `by_code` that are missing."""
+    for source, targets in STANDARD_TRANSITIONS.items():
+        for target in targets:
+            if source in by_code and target in by_code:
+                ParcelStatusTransition.objects.get_or_create(from_status=by_code[source], to_status=by_code[target])
+
+
+class _Tables:
+    """One load of the statuses and transitions, compiled into lookup tables."""
+
+    def __init__(self, loaded, transitions):
+        self.by_id = {s.pk: s for s in loaded}
+        self.by_code = {s.code: s for s in loaded}
+        self.terminal_ids = frozenset(s.pk for s in loaded if s.is_terminal)
+        self.open_ids = frozenset(self.by_id) - self.terminal_ids
+
+        next_ids = {}
+        for source, target in transitions:
+            if source not in self.terminal_ids:
+                next_ids.setdefault(source, set()).add(target)
+        # status id -> ids it may change to
+        self.next_ids = {source: frozenset(targets) for source, targets in next_ids.items()}
+
+        initial = self.by_code.get(INITIAL_STATUS)
+        self.deletable_ids = frozenset()
+        if initial is not None:
+            self.deletable_ids = frozenset(
+                {initial.pk} | (self.next_ids.get(initial.pk, frozenset()) & self.terminal_ids)
+            )
+
+
+class StatusRegistry:
+    MAX_AGE = 5 * 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._loaded_at = 0.0
+
+    def _tables(self):
+        tables = self._loaded
+        if tables is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+            with self._lock:
+                if self._loaded is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+                    self._loaded = _Tables(
+                        list(ParcelStatus.objects.order_by("code")),
+                        ParcelStatusTransition.objects.values_list("from_status_id", "to_status_id"),
+                    )
+                    self._loaded_at = time.monotonic()
+                tables = self._loaded
+        return tables
+
+    def get(self, code):
+        """Return the status with this code, or None."""
+        return self._tables().by_code.get(code)
+
+    def by_id(self, pk):
+        """Return the status with this primary key, or None."""
+        return self._tables().by_id.get(pk)
+
+    def all(self):
+        """All statuses, ordered by code."""
+        return list(self._tables().by_code.values())
+
+    def initial(self):
+        """The status new parcels get, or None before seeding."""
+        return self._tables().by_code.get(INITIAL_STATUS)
+
+    def can_transition(self, from_id, to_id):
+        """Whether a parcel in status `from_id` may change to `to_id`."""
+        return to_id in self._tables().next_ids.get(from_id, ())
+
+    def next_statuses(self, status_id):
+        """The statuses a parcel in `status_id` may change to, ordered by code."""
+        tables = self._tables()
+        return [s for s in tables.by_code.values() if s.pk in tables.next_ids.get(status_id, ())]
+
+    def terminal_ids(self):
+        return self._tables().terminal_ids
+
+    def open_ids(self):
+        return self._tables().open_ids
+
+    def deletable_ids(self):
+        return self._tables().deletable_ids
+
+    def clear(self):
+        with self._lock:
+            self._loaded = None
+
+
+statuses = StatusRegistry()
@@ -0,0 +1,153 @@
+"""
+Daily income rollups.
+
+income_report answers its totals from DailyIncomeRollup instead of summing
+every delivered parcel. The rollup is updated incrementally in the same
+transaction as each delivery (record_deliveries), and can be rebuilt from
+the parcels at any time (rebuild_income_rollups).
+
+A parcel's income is booked on the local date of its delivered_at, under
+its company and sender office, at its delivered_price: the price at its
+tariff's rate when it was delivered, stored on the parcel so that a later
+tariff change does not alter the income already booked.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyIncomeRollup, Parcel
+from .registry import statuses
+from apps.common.models import Tariff
+
+
+# The Parcel values record_deliveries() needs
+DELIVERY_VALUES = ("company_id", "sender_office_id", "delivery_type", "delivered_price", "delivered_at")
+
+
+def delivered_price():
+    """
+    Expression for QuerySet.update(delivered_price=...): the parcel's weight
+    at its tariff's rate as stored in the database, not in the tariff cache.
+    """
+    rate = Tariff.objects.filter(pk=OuterRef("tariff_id")).values("price_per_kg")
+    return ExpressionWrapper(
+        F("weight_kg") * Subquery(rate), output_field=Parcel._meta.get_field("delivered_price")
+    )
+
+
+def price_delivery(parcel):
+    """Set parcel.delivered_price from its weight and its tariff's rate, read from the database."""
+    rate = None
+    if parcel.tariff_id:
+        rate = Tariff.objects.filter(pk=parcel.tariff_id).values_list("price_per_kg", flat=True).first()
+    parcel.delivered_price = parcel.weight_kg * rate if rate is not None else None
+
+
+def _add(key, parcels_count, income):
+    day, company_id, office_id, delivery_type = key
+    rollups = DailyIncomeRollup.objects.filter(
+        day=day, company_id=company_id, office_id=office_id, delivery_type=delivery_type
+    )
+    changes = {"parcels_count": F("parcels_count") + parcels_count, "income": F("income") + income}
+    # Always update the first row: with a NULL company or office the unique
+    # constraint does not apply and a concurrent insert can add a second row
+    # for the key. The report sums the rows, so the total stays right as
+    # long as each delivery is added to one of them only.
+    pk = rollups.order_by("pk").values_list("pk", flat=True).first()
+    if pk is not None:
+        DailyIncomeRollup.objects.filter(pk=pk).update(**changes)
+        return
+    try:
+        with transaction.atomic():
+            DailyIncomeRollup.objects.create(
+                day=day,
+                company_id=company_id,
+                office_id=office_id,
+                delivery_type=delivery_type,
+                parcels_count=parcels_count,
+                income=income,
+            )
+    except IntegrityError:
+        # Created concurrently since the lookup above
+        rollups.update(**changes)
+
+
+def record_deliveries(parcels, sign=1):
+    """
+    Add newly delivered parcels to the rollup, or with sign=-1 take them
+    out again (a delivery undone, edited or deleted). Call inside the
+    transaction that changes them.
+
+    `parcels` are Parcel instances or dicts with the DELIVERY_VALUES.
+    """
+    totals = defaultdict(lambda: [0, Decimal("0")])
+    for parcel in parcels:
+        if not isinstance(parcel, dict):
+            parcel = {name: getattr(parcel, name) for name in DELIVERY_VALUES}
+        if parcel["delivered_at"] is None:
+            continue
+        key = (
+            timezone.localdate(parcel["delivered_at"]),
+            parcel["company_id"],
+            parcel["sender_office_id"],
+            parcel["delivery_type"],
+        )
+        totals[key][0] += sign
+        if parcel["delivered_price"] is not None:
+            totals[key][1] += sign * parcel["delivered_price"]
+
+    for key, (parcels_count, income) in totals.items():
+        _add(key, parcels_count, income)
+
+
+def delivered_parcels(parcels):
+    """The Parcel instances of `parcels` the rollup counts: delivered, with a delivery time."""
+    delivered = statuses.get("DELIVERED")
+    if delivered is None:
+        return []
+    return [p for p in parcels if p.current_status_id == delivered.pk and p.delivered_at is not None]
+
+
+def rebuild_income_rollups():
+    """
+    Recompute the whole rollup table from the delivered parcels. Returns the
+    number of rollup rows.
+
+    Delivered parcels with no stored price (rows inserted directly, such as
+    seed data) are priced at their tariff's current rate first.
+    """
+    delivered = statuses.get("DELIVERED")
+    rows = Parcel.objects.none()
+    if delivered:
+        rows = (
+            Parcel.objects.filter(current_status=delivered, delivered_at__isnull=False)
+            .values("company_id", "sender_office_id", "delivery_type", day=TruncDate("delivered_at"))
+            .annotate(parcels_count=Count("id"), income=Sum("delivered_price"))
+            .order_by()
+        )
+
+    with transaction.atomic():
+        if delivered:
+            Parcel.objects.filter(
+                current_status=delivered, delivered_at__isnull=False, delivered_price__isnull=True, tariff__isnull=False
+            ).update(delivered_price=delivered_price())
+        DailyIncomeRollup.objects.all().delete()
+        created = DailyIncomeRollup.objects.bulk_create(
+            [
+                DailyIncomeRollup(
+                    day=row["day"],
+                    company_id=row["company_id"],
+                    office_id=row["sender_office_id"],
+                    delivery_type=row["delivery_type"],
+                    parcels_count=row["parcels_count"],
+                    income=row["income"] or Decimal("0"),
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+    return len(created)
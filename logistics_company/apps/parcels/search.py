@@ -0,0 +1,230 @@
+"""
+Full-text parcel search.
+
+Every parcel has a ParcelSearch row whose document holds the text it is
+found by: the tracking number, the sender's and receiver's username, name,
+email and phone, and the sender and receiver office names. The index over
+the documents depends on the database (created by migration 0009):
+
+- SQLite: an FTS5 table with prefix indexes, kept in step with the
+  documents by triggers
+- PostgreSQL: a GIN index on to_tsvector('simple', ...) of the document
+  with every run of other characters than letters and digits replaced by
+  a space
+- anything else: no index; documents are scanned with icontains
+
+Words are runs of letters and digits, in the documents as in queries
+(query_terms). Every word of a query must match the start of a word of
+the document, so "ivan petr" finds Ivan Petrov's parcels, "example.com"
+the parcels of users with such an email (PostgreSQL's parser would keep
+an email address as one word) and "EXP20261018" the tracking numbers
+starting with it.
+
+The documents follow the data through signals (signals.py): saving a
+parcel re-indexes it, and changing a user's name, email or phone or an
+office's name re-indexes their parcels once the change commits. Code
+that creates parcels with
+bulk_create() calls index_parcels() itself; `manage.py
+rebuild_parcel_search` recomputes every document.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import F, Func, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import Parcel, ParcelSearch
+
+
+FTS_TABLE = "parcels_parcelsearch_fts"
+
+# Words of a query used for matching; further words are ignored
+MAX_QUERY_TERMS = 8
+
+DOCUMENT_FIELDS = [
+    "tracking_number",
+    *(
+        f"{user}__{field}"
+        for user in ("sender", "receiver")
+        for field in ("username", "first_name", "last_name", "email", "phone")
+    ),
+    "sender_office__name",
+    "receiver_office__name",
+]
+
+# External content FTS5 table over parcels_parcelsearch. The 2 and 3
+# character prefix indexes make short prefix queries index lookups.
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        document,
+        content='parcels_parcelsearch',
+        content_rowid='parcel_id',
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.parcel_id, new.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.parcel_id, old.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON parcels_parcelsearch BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.parcel_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.parcel_id, new.document);
+    END
+    """,
+]
+
+SQLITE_DROP_TRIGGERS = [f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}" for suffix in ("ai", "ad", "au")]
+
+SQLITE_DROP = SQLITE_DROP_TRIGGERS + [f"DROP TABLE IF EXISTS {FTS_TABLE}"]
+
+# Split into words as query_terms() does. The queries must use the same
+# expression for the index to apply.
+POSTGRESQL_VECTOR = "to_tsvector('simple', regexp_replace(document, '[^[:alnum:]]+', ' ', 'g'))"
+
+POSTGRESQL_CREATE = [
+    f"CREATE INDEX parcels_parcelsearch_document_fts ON parcels_parcelsearch USING gin ({POSTGRESQL_VECTOR})",
+]
+
+POSTGRESQL_DROP = ["DROP INDEX IF EXISTS parcels_parcelsearch_document_fts"]
+
+
+def create_index(schema_editor):
+    """Create the full-text index for the database of `schema_editor`."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        statements = SQLITE_CREATE + SQLITE_TRIGGERS
+    elif vendor == "postgresql":
+        statements = POSTGRESQL_CREATE
+    else:
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRESQL_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class _Document(Func):
+    # The fields joined with spaces. Concat() nests one function call per
+    # pair of arguments, which is too deep for SQLite's parser here.
+    template = "%(expressions)s"
+    arg_joiner = " || ' ' || "
+    output_field = TextField()
+
+
+def document_rows(parcels):
+    """(parcel id, document) rows of `parcels`, a Parcel queryset."""
+    document = _Document(*(Coalesce(F(name), Value("")) for name in DOCUMENT_FIELDS))
+    return parcels.order_by().annotate(search_document=document).values_list("pk", "search_document")
+
+
+def _insert_documents(parcels, cursor):
+    select, params = document_rows(parcels).query.sql_with_params()
+    table = connection.ops.quote_name(ParcelSearch._meta.db_table)
+    cursor.execute(f"INSERT INTO {table} (parcel_id, document) {select}", params)
+
+
+def index_parcels(parcels):
+    """(Re)compute the documents of `parcels`, a Parcel queryset, with two queries."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        ParcelSearch.objects.filter(parcel__in=parcels).delete()
+        _insert_documents(parcels, cursor)
+
+
+def rebuild_parcel_search():
+    """Recompute every document and the full-text index; returns the number of documents."""
+    table = connection.ops.quote_name(ParcelSearch._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            # Row by row trigger updates are far slower than one rebuild of
+            # the FTS table from the reloaded documents.
+            for sql in SQLITE_DROP_TRIGGERS:
+                cursor.execute(sql)
+            cursor.execute(f"DELETE FROM {table}")
+            _insert_documents(Parcel.objects.all(), cursor)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            for sql in SQLITE_TRIGGERS:
+                cursor.execute(sql)
+        else:
+            cursor.execute(f"DELETE FROM {table}")
+            _insert_documents(Parcel.objects.all(), cursor)
+    return ParcelSearch.objects.count()
+
+
+def query_terms(query):
+    """Lower-cased words of `query` that take part in matching."""
+    return re.findall(r"[^\W_]+", query.lower())[:MAX_QUERY_TERMS]
+
+
+def _match_sql(terms):
+    """(sql, params) selecting the ids of the parcels matching every term, or None without an index."""
+    if connection.vendor == "sqlite":
+        # Terms are letters and digits only, so quoting them is safe
+        expression = " ".join(f'"{term}"*' for term in terms)
+        return f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]
+    if connection.vendor == "postgresql":
+        expression = " & ".join(f"{term}:*" for term in terms)
+        return (
+            f"SELECT parcel_id FROM parcels_parcelsearch WHERE {POSTGRESQL_VECTOR} @@ to_tsquery('simple', %s)",
+            [expression],
+        )
+    return None
+
+
+def filter_matching(queryset, query):
+    """`queryset` (of parcels) narrowed to the parcels matching `query`."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+    match = _match_sql(terms)
+    if match is None:
+        condition = Q()
+        for term in terms:
+            condition &= Q(search__document__icontains=term)
+        return queryset.filter(condition)
+    return queryset.filter(pk__in=RawSQL(*match))
+
+
+def matching_ids(query, limit, before=None):
+    """
+    Ids of up to `limit` parcels matching `query`, highest (newest) first
+    and below `before` if given. The limit is applied by the full-text
+    index, so the cost follows the page size rather than the match count.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    match = _match_sql(terms)
+    if match is None:
+        ids = filter_matching(Parcel.objects.all(), query)
+        if before is not None:
+            ids = ids.filter(pk__lt=before)
+        return list(ids.order_by("-pk").values_list("pk", flat=True)[:limit])
+
+    sql, params = match
+    column = "rowid" if connection.vendor == "sqlite" else "parcel_id"
+    if before is not None:
+        sql += f" AND {column} < %s"
+        params.append(before)
+    sql += f" ORDER BY {column} DESC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
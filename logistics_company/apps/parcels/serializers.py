@@ -0,0 +1,211 @@
+"""
+Column-projected serialization of parcel rows for the JSON views.
+
+Instead of hydrating a Parcel plus up to seven related model instances per
+row, the views ask for a set of output columns. Only the database columns
+those need are selected with values(); names, office and address labels and
+the price (weight_kg * tariff price_per_kg) are computed in SQL, and the
+remaining formatting is a cheap pass over plain dicts.
+
+    rows = serialize_parcels(queryset, REPORT_FIELDS)
+
+A field is either a column name or an (output_key, column_name) pair when
+the view exposes a column under a different key.
+"""
+from django.db.models import Case, CharField, DecimalField, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Concat, Trim
+
+from apps.common.models import DeliveryType
+
+from .registry import statuses
+
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+DELIVERY_TYPE_LABELS = dict(DeliveryType.choices)
+
+
+def _full_name(user):
+    return Concat(F(f"{user}__first_name"), Value(" "), F(f"{user}__last_name"), output_field=CharField())
+
+
+def _or_null(fk, expression):
+    """NULL when the foreign key is empty, `expression` otherwise."""
+    return Case(When(**{f"{fk}__isnull": True}, then=Value(None)), default=expression, output_field=CharField())
+
+
+def _office_label(fk):
+    """Same as Office.__str__."""
+    return _or_null(fk, Concat(
+        F(f"{fk}__name"), Value(" ("), F(f"{fk}__code"), Value(")"), output_field=CharField()
+    ))
+
+
+def _address_label(fk):
+    """Same as Address.__str__."""
+    return _or_null(fk, Concat(
+        F(f"{fk}__street"), Value(", "), F(f"{fk}__city"), Value(", "), F(f"{fk}__country"),
+        output_field=CharField(),
+    ))
+
+
+def _employee_label(fk):
+    """Same as Employee.__str__."""
+    return _or_null(fk, Concat(
+        Trim(_full_name(f"{fk}__user")), Value(" ("), F(f"{fk}__employee_code"), Value(")"),
+        output_field=CharField(),
+    ))
+
+
+def _price():
+    # max_digits/decimal_places make backends without a native decimal type
+    # (SQLite) quantize the product back to an exact Decimal.
+    return ExpressionWrapper(
+        F("weight_kg") * F("tariff__price_per_kg"),
+        output_field=DecimalField(max_digits=18, decimal_places=5),
+    )
+
+
+def _format_datetime(value, empty):
+    return value.strftime(DATETIME_FORMAT) if value else empty
+
+
+def _status_attr(status_id, attr):
+    # Statuses come from the in-process registry instead of a join per row
+    status = statuses.by_id(status_id)
+    return getattr(status, attr) if status else None
+
+
+# column name -> (source, formatter(value, empty))
+# The source is either a model field path passed to values() as-is, or an
+# expression that is selected under the alias "row_<column name>".
+COLUMNS = {
+    "id": ("id", lambda v, empty: v),
+    "tracking_number": ("tracking_number", lambda v, empty: v),
+    "company_id": ("company_id", lambda v, empty: v),
+    "sender_id": ("sender_id", lambda v, empty: v),
+    "receiver_id": ("receiver_id", lambda v, empty: v),
+    "sender_office_id": ("sender_office_id", lambda v, empty: v),
+    "receiver_office_id": ("receiver_office_id", lambda v, empty: v),
+    "tariff_id": ("tariff_id", lambda v, empty: v),
+    "sender_name": (_full_name("sender"), lambda v, empty: v),
+    "receiver_name": (_full_name("receiver"), lambda v, empty: v),
+    "sender_office_name": (_office_label("sender_office"), lambda v, empty: v or empty),
+    "receiver_office_name": (_office_label("receiver_office"), lambda v, empty: v or empty),
+    "pickup_address": (_address_label("pickup_address"), lambda v, empty: v or empty),
+    "delivery_address": (_address_label("delivery_address"), lambda v, empty: v or empty),
+    "registered_by_name": (_employee_label("registered_by"), lambda v, empty: v or empty),
+    "status_code": ("current_status_id", lambda v, empty: _status_attr(v, "code") or empty),
+    "status_name": ("current_status_id", lambda v, empty: _status_attr(v, "name") or empty),
+    "is_terminal": ("current_status_id", lambda v, empty: bool(_status_attr(v, "is_terminal"))),
+    "delivery_type": ("delivery_type", lambda v, empty: DELIVERY_TYPE_LABELS.get(v, v)),
+    "delivery_type_code": ("delivery_type", lambda v, empty: v),
+    "weight_kg": ("weight_kg", lambda v, empty: float(v)),
+    "price": (_price(), lambda v, empty: float(v) if v is not None else 0.0),
+    "delivered_price": ("delivered_price", lambda v, empty: float(v) if v is not None else 0.0),
+    "created_at": ("created_at", _format_datetime),
+    "delivered_at": ("delivered_at", _format_datetime),
+}
+
+
+# Fields of the parcel reports under /reports/
+REPORT_FIELDS = (
+    "tracking_number",
+    ("status", "status_name"),
+    "delivery_type",
+    "price",
+    "weight_kg",
+    ("sender", "sender_name"),
+    ("receiver", "receiver_name"),
+    ("sender_office", "sender_office_name"),
+    ("receiver_office", "receiver_office_name"),
+    "pickup_address",
+    "delivery_address",
+    "created_at",
+    "delivered_at",
+)
+
+EMPLOYEE_REPORT_FIELDS = REPORT_FIELDS + (("registered_by", "registered_by_name"),)
+
+PENDING_REPORT_FIELDS = tuple(field for field in REPORT_FIELDS if field != "delivered_at")
+
+INCOME_REPORT_FIELDS = (
+    "tracking_number",
+    # The price the income rollup booked
+    ("price", "delivered_price"),
+    "delivery_type",
+    "delivered_at",
+    ("sender", "sender_name"),
+    ("receiver", "receiver_name"),
+)
+
+# Fields of the parcels page table (parcels_api_list)
+LIST_FIELDS = (
+    "id",
+    "tracking_number",
+    "sender_id",
+    "sender_name",
+    "receiver_id",
+    "receiver_name",
+    "sender_office_id",
+    "sender_office_name",
+    "receiver_office_id",
+    "receiver_office_name",
+    ("delivery_type", "delivery_type_code"),
+    "weight_kg",
+    "price",
+    "status_code",
+    "status_name",
+    "is_terminal",
+    "created_at",
+)
+
+
+def _resolve(fields):
+    """Return [(output_key, values key, formatter)] and the values() arguments."""
+    plan = []
+    names = []
+    expressions = {}
+    for field in fields:
+        key, column = field if isinstance(field, tuple) else (field, field)
+        source, formatter = COLUMNS[column]
+        if isinstance(source, str):
+            names.append(source)
+            plan.append((key, source, formatter))
+        else:
+            alias = f"row_{column}"
+            expressions[alias] = source
+            plan.append((key, alias, formatter))
+    return plan, list(dict.fromkeys(names)), expressions
+
+
+def parcel_values(queryset, fields, extra=()):
+    """
+    Project `queryset` onto the database columns needed for `fields`.
+
+    `extra` lists additional model fields to select, e.g. the ordering
+    fields keyset pagination needs to build its cursor.
+    """
+    _, names, expressions = _resolve(fields)
+    names += [name for name in extra if name not in names]
+    return queryset.values(*names, **expressions)
+
+
+def format_parcel_rows(rows, fields, empty="-"):
+    """Turn rows from parcel_values() into the dicts the views return."""
+    plan, _, _ = _resolve(fields)
+    for row in rows:
+        yield {key: formatter(row[source], empty) for key, source, formatter in plan}
+
+
+def serialize_parcels(queryset, fields, empty="-", chunk_size=None):
+    """
+    Yield one dict per parcel in `queryset` with the given output fields.
+
+    `empty` is the placeholder for missing optional values. With
+    `chunk_size`, the rows are streamed with iterator(chunk_size=...).
+    """
+    rows = parcel_values(queryset, fields)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    return format_parcel_rows(rows, fields, empty=empty)
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import User
+from apps.organizations.models import Office
+
+from .models import Parcel, ParcelStatus, ParcelStatusTransition
+from .registry import statuses
+from .search import index_parcels
+from .tracking import invalidate_all_tracking
+
+
+# Parcels re-indexed per transaction after a user or office change
+REINDEX_BATCH_SIZE = 1000
+
+# Fields that appear in the search documents (see search.py)
+USER_SEARCH_FIELDS = {"username", "first_name", "last_name", "email", "phone"}
+PARCEL_SEARCH_FIELDS = {
+    "tracking_number", "sender", "receiver", "sender_office", "receiver_office",
+}
+
+
+def _indexed_fields_changed(update_fields, fields):
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+def _reindex_on_commit(parcels):
+    """
+    Re-index `parcels`, a Parcel queryset, once the current transaction
+    commits, REINDEX_BATCH_SIZE parcels per transaction. A user or office
+    may have any number of parcels: the save that renames them neither
+    waits for nor holds locks through their re-indexing, which finishes
+    moments after it.
+    """
+    def reindex():
+        last = 0
+        while True:
+            ids = list(parcels.filter(pk__gt=last).order_by("pk").values_list("pk", flat=True)[:REINDEX_BATCH_SIZE])
+            if not ids:
+                return
+            index_parcels(Parcel.objects.filter(pk__in=ids))
+            last = ids[-1]
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_save, sender=ParcelStatus)
+@receiver(post_delete, sender=ParcelStatus)
+@receiver(post_save, sender=ParcelStatusTransition)
+@receiver(post_delete, sender=ParcelStatusTransition)
+def clear_status_registry(sender, **kwargs):
+    statuses.clear()
+
+
+@receiver(post_save, sender=Parcel)
+def index_parcel(sender, instance, update_fields=None, **kwargs):
+    if _indexed_fields_changed(update_fields, PARCEL_SEARCH_FIELDS):
+        index_parcels(Parcel.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=User)
+def index_user_parcels(sender, instance, created, update_fields=None, **kwargs):
+    # A new user has no parcels; last_login updates leave the documents alone
+    if not created and _indexed_fields_changed(update_fields, USER_SEARCH_FIELDS):
+        _reindex_on_commit(Parcel.objects.filter(Q(sender=instance) | Q(receiver=instance)))
+
+
+@receiver(post_save, sender=Office)
+def index_office_parcels(sender, instance, created, update_fields=None, **kwargs):
+    if not created and _indexed_fields_changed(update_fields, {"name"}):
+        _reindex_on_commit(Parcel.objects.filter(Q(sender_office=instance) | Q(receiver_office=instance)))
+
+
+@receiver(post_save, sender=Office)
+@receiver(post_delete, sender=Office)
+def invalidate_office_tracking(sender, **kwargs):
+    # Tracking responses show the offices of the parcel and its history
+    invalidate_all_tracking()
@@ -1,3 +1,1227 @@
-from django.test import TestCase
+import time
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User, UserRole
+from apps.common.idempotency import idempotent
+from apps.common.models import IdempotencyKey, Tariff
+from apps.common.pagination import encode_cursor
+from apps.common.tariffs import tariffs
+from apps.common.testing import STATUSES, DataFactory, QueryBudgetMixin
+from apps.parcels import bulk
+from apps.parcels.bulk import bulk_update_status
+from apps.parcels.checks import check_tracking_cache
+from apps.parcels.forms import ParcelAdminForm
+from apps.parcels.models import (
+    DailyIncomeRollup, Parcel, ParcelSearch, ParcelStatus, ParcelStatusCount, ParcelStatusHistory,
+    ParcelStatusTransition, TrackingNumberSequence,
+)
+from apps.parcels.numbers import (
+    TrackingNumberAllocator, format_tracking_number, has_valid_check_digit, luhn_check_digit
+)
+from apps.parcels.registry import statuses
+from apps.parcels.counters import rebuild_parcel_counters
+from apps.parcels.rollups import rebuild_income_rollups, record_deliveries
+from apps.parcels.serializers import serialize_parcels
+from apps.parcels.tracking import TRACKING_NOT_FOUND_TTL, tracking_cache_key
+from apps.workforce.models import Employee
+
+
+PARCEL_TABLE = Parcel._meta.db_table
+
+
+def admin_change(parcel, **changes):
+    """The URL and POST data of the parcel's admin change form, with `changes`."""
+    parcel = Parcel.objects.get(pk=parcel.pk)
+    data = {
+        name: value.pk if hasattr(value, "pk") else value
+        for name, value in ParcelAdminForm(instance=parcel).initial.items()
+        if value is not None and name not in ("delivered_at", "delivered_price", "id")
+    }
+    data.update(changes)
+    for prefix in ("status_history", "notes"):
+        data.update({f"{prefix}-TOTAL_FORMS": 0, f"{prefix}-INITIAL_FORMS": 0})
+    return reverse("admin:parcels_parcel_change", args=[parcel.pk]), data
+
+
+class ParcelSerializerTests(TestCase):
+    """Rows built in SQL match what the model instances would have rendered."""
+
+    FIELDS = (
+        "tracking_number",
+        ("status", "status_name"),
+        "delivery_type",
+        "price",
+        "weight_kg",
+        ("sender", "sender_name"),
+        ("sender_office", "sender_office_name"),
+        ("receiver_office", "receiver_office_name"),
+        "pickup_address",
+        "delivery_address",
+        ("registered_by", "registered_by_name"),
+        "created_at",
+        "delivered_at",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0], Employee.EmployeeType.MANAGER)
+        picked_up = cls.factory.parcels(2, cls.offices, registered_by=cls.employee)[1]
+        address = cls.factory.addresses(1)[0]
+        Parcel.objects.filter(pk=picked_up.pk).update(
+            sender_office=None, receiver_office=None, pickup_address=address, delivery_address=address,
+            registered_by=None,
+        )
+
+    def expected(self, parcel):
+        def label(value):
+            return str(value) if value else "-"
+
+        return {
+            "tracking_number": parcel.tracking_number,
+            "status": parcel.current_status.name,
+            "delivery_type": parcel.get_delivery_type_display(),
+            "price": float(parcel.weight_kg * parcel.tariff.price_per_kg),
+            "weight_kg": float(parcel.weight_kg),
+            "sender": f"{parcel.sender.first_name} {parcel.sender.last_name}",
+            "sender_office": label(parcel.sender_office),
+            "receiver_office": label(parcel.receiver_office),
+            "pickup_address": label(parcel.pickup_address),
+            "delivery_address": label(parcel.delivery_address),
+            "registered_by": label(parcel.registered_by),
+            "created_at": parcel.created_at.strftime("%Y-%m-%d %H:%M"),
+            "delivered_at": "-",
+        }
+
+    def test_rows_match_the_models(self):
+        parcels = Parcel.objects.order_by("pk")
+        statuses.all()  # load the registry outside the counted queries
+        with self.assertNumQueries(1):
+            rows = list(serialize_parcels(parcels, self.FIELDS))
+        self.assertEqual(rows, [self.expected(parcel) for parcel in parcels])
+        self.assertEqual(rows[1]["sender_office"], "-")
+
+
+class TrackingCacheTests(TestCase):
+    """The public tracking endpoint is served from the cache and follows writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.sender, cls.receiver = cls.factory.clients(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcel = cls.factory.parcels(1, cls.offices)[0]
+
+    def setUp(self):
+        cache.clear()
+        statuses.all()  # load the registry outside the counted queries
+
+    def track(self, tracking_number):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("track_parcel_api"), {"tracking_number": tracking_number})
+        return response, len(queries)
+
+    def test_hit_and_invalidation_after_commit(self):
+        first, queries = self.track(self.parcel.tracking_number)
+        self.assertEqual(first.json()["parcel"]["status_code"], "CREATED")
+        self.assertGreater(queries, 0)
+        cached, queries = self.track(self.parcel.tracking_number.lower())
+        self.assertEqual((cached.content, queries), (first.content, 0))
+
+        self.client.force_login(self.employee.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse("parcels_api_update_status", args=[self.parcel.pk]),
+                {"status_code": "IN_TRANSIT"},
+                content_type="application/json",
+            )
+        # Until the write commits, readers still get the old response
+        self.assertEqual(self.track(self.parcel.tracking_number)[0].content, first.content)
+        for callback in callbacks:
+            callback()
+        response, queries = self.track(self.parcel.tracking_number)
+        self.assertEqual(response.json()["parcel"]["status_code"], "IN_TRANSIT")
+        self.assertGreater(queries, 0)
+
+    def test_office_change_drops_every_response(self):
+        first = self.track(self.parcel.tracking_number)[0].json()["parcel"]
+        office = self.parcel.sender_office
+        office.name = "Renamed"
+        with self.captureOnCommitCallbacks() as callbacks:
+            office.save()
+        self.assertEqual(self.track(self.parcel.tracking_number)[0].json()["parcel"], first)
+        for callback in callbacks:
+            callback()
+        response, queries = self.track(self.parcel.tracking_number)
+        self.assertEqual(response.json()["parcel"]["sender_office"], str(office))
+        self.assertGreater(queries, 0)
+
+    def test_unknown_numbers_are_cached_briefly(self):
+        number = format_tracking_number(999999999)
+        response, queries = self.track(number)
+        self.assertEqual((response.status_code, queries > 0), (404, True))
+        self.assertEqual(self.track(number)[1], 0)
+        with mock.patch("time.time", return_value=time.time() + TRACKING_NOT_FOUND_TTL + 1):
+            self.assertIsNone(cache.get(tracking_cache_key(number)))
+
+    def test_created_parcel_clears_its_negative_entry(self):
+        number = format_tracking_number(999999998)
+        self.assertEqual(self.track(number)[0].status_code, 404)
+
+        self.client.force_login(self.employee.user)
+        with mock.patch("apps.parcels.views.tracking_numbers.allocate", return_value=[number]):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("parcels_api_create"),
+                    {
+                        "sender_id": self.sender.pk,
+                        "receiver_id": self.receiver.pk,
+                        "sender_office_id": self.offices[0].pk,
+                        "weight_kg": "1.000",
+                        "delivery_type": "STANDARD",
+                    },
+                    content_type="application/json",
+                )
+        self.assertEqual(response.json()["parcel"]["tracking_number"], number)
+        self.assertEqual(self.track(number)[0].status_code, 200)
+
+    def test_bad_check_digit_skips_cache_and_database(self):
+        number = self.parcel.tracking_number
+        valid = format_tracking_number(123)
+        mistyped = valid[:-1] + str((int(valid[-1]) + 1) % 10)
+        response, queries = self.track(mistyped)
+        self.assertEqual((response.status_code, queries), (404, 0))
+        self.assertIsNone(cache.get(tracking_cache_key(mistyped)))
+        # Numbers in other formats are looked up as before
+        self.assertEqual(self.track(number)[0].status_code, 200)
+
+    def test_deploy_check_flags_a_local_cache(self):
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        self.assertEqual([w.id for w in check_tracking_cache(None)], ["parcels.W001"])
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_tracking_cache(None), [])
+
+
+class CanonicalTrackingNumberTests(TestCase):
+    """Tracking numbers are stored trimmed and upper case, and looked up the same way."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcels = cls.factory.parcels(3, cls.offices)
+
+    def test_lookups_take_any_case_and_padding(self):
+        number = self.parcels[0].tracking_number
+        response = self.client.get(reverse("track_parcel_api"), {"tracking_number": f"  {number.lower()} "})
+        self.assertEqual(response.json()["parcel"]["tracking_number"], number)
+
+        updated, rejected = bulk_update_status(
+            [f"\t{number.lower()}"], self.factory.statuses()["IN_TRANSIT"], self.offices[0], self.employee,
+            by="tracking_number",
+        )
+        self.assertEqual((updated, rejected), ([number], []))
+
+    def test_admin_save_stores_the_canonical_form(self):
+        parcel = self.parcels[1]
+        number = parcel.tracking_number
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        response = self.client.post(*admin_change(parcel, tracking_number=f" {number.lower()} "))
+        self.assertEqual(response.status_code, 302)
+        parcel.refresh_from_db()
+        self.assertEqual(parcel.tracking_number, number)
+
+    def test_migration_refuses_colliding_numbers(self):
+        migration = import_module("apps.parcels.migrations.0005_normalize_tracking_numbers")
+        padded, colliding, taken = self.parcels
+        numbers = [parcel.tracking_number for parcel in self.parcels]
+        Parcel.objects.filter(pk=padded.pk).update(tracking_number=f" {padded.tracking_number.lower()}")
+        Parcel.objects.filter(pk=colliding.pk).update(tracking_number=taken.tracking_number.lower())
+
+        with self.assertRaisesMessage(ValueError, f"parcels {colliding.pk}:"):
+            migration.normalize_tracking_numbers(django_apps, None)
+        # Nothing was changed
+        self.assertTrue(Parcel.objects.filter(tracking_number=f" {numbers[0].lower()}").exists())
+
+        Parcel.objects.filter(pk=colliding.pk).update(tracking_number=f"x{numbers[1].lower()}")
+        migration.normalize_tracking_numbers(django_apps, None)
+        stored = Parcel.objects.filter(pk__in=[p.pk for p in self.parcels]).order_by("pk")
+        self.assertEqual(list(stored.values_list("tracking_number", flat=True)), [numbers[0], f"X{numbers[1]}", numbers[2]])
+
+
+class BulkCreateTests(TestCase):
+    """parcels_api_bulk_create registers the valid rows of a manifest and reports the rest."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.factory.statuses()
+        cls.offices = cls.factory.offices(2)
+        cls.sender, cls.receiver = cls.factory.clients(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def row(self, **changes):
+        return {
+            "sender_id": self.sender.pk,
+            "receiver_id": self.receiver.pk,
+            "sender_office_id": self.offices[0].pk,
+            "receiver_office_id": self.offices[1].pk,
+            "weight_kg": "2.000",
+            "delivery_type": "STANDARD",
+            **changes,
+        }
+
+    def post(self, body):
+        return self.client.post(reverse("parcels_api_bulk_create"), body, content_type="application/json")
+
+    def test_valid_manifest(self):
+        response = self.post({"parcels": [self.row(), self.row(delivery_type="EXPRESS", receiver_office_id=None)]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created_count"], data["error_count"]), (2, 0))
+        self.assertEqual([r["price"] for r in data["results"]], [10.0, 17.0])
+
+        parcels = Parcel.objects.filter(pk__in=[r["id"] for r in data["results"]])
+        self.assertEqual(len({p.tracking_number for p in parcels}), 2)
+        for parcel in parcels:
+            self.assertTrue(has_valid_check_digit(parcel.tracking_number))
+            self.assertEqual(parcel.current_status.code, "CREATED")
+            self.assertEqual(parcel.registered_by, self.employee)
+            self.assertTrue(ParcelSearch.objects.filter(parcel=parcel).exists())
+        self.assertEqual(parcels.get(delivery_type="EXPRESS").delivery_address_id, self.receiver.default_address_id)
+        self.assertEqual(
+            list(ParcelStatusHistory.objects.filter(parcel__in=parcels).values_list("status__code", flat=True)),
+            ["CREATED", "CREATED"],
+        )
+        count = ParcelStatusCount.objects.get(office=self.offices[0], status__code="CREATED")
+        self.assertEqual(count.parcels_count, 2)
+
+    def test_invalid_rows_are_reported_in_place(self):
+        rows = [
+            self.row(),
+            self.row(sender_id=None),
+            self.row(receiver_id=self.sender.pk),
+            self.row(weight_kg="-1"),
+            self.row(delivery_type="OVERNIGHT"),
+            self.row(sender_office_id=999999),
+            "not an object",
+            self.row(),
+        ]
+        data = self.post(rows).json()
+        self.assertEqual((data["created_count"], data["error_count"]), (2, 6))
+        self.assertEqual([r["index"] for r in data["results"]], list(range(len(rows))))
+        self.assertEqual(
+            [r.get("error") for r in data["results"]],
+            [
+                None,
+                "Missing required fields: sender_id",
+                "Sender and receiver cannot be the same.",
+                "Invalid weight.",
+                "Invalid delivery type.",
+                "Sender office not found.",
+                "Row must be an object.",
+                None,
+            ],
+        )
+        self.assertEqual(Parcel.objects.count(), 2)
+        self.assertEqual(ParcelStatusHistory.objects.count(), 2)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({"parcels": "x"}).status_code, 400)
+        with mock.patch("apps.parcels.views.MAX_BULK_PARCELS", 3):
+            response = self.post([self.row()] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "At most 3 parcels can be registered per request.")
+        self.assertFalse(Parcel.objects.exists())
+
+    def test_clients_cannot_register(self):
+        self.client.force_login(self.sender)
+        self.assertNotEqual(self.post([self.row()]).status_code, 200)
+        self.assertFalse(Parcel.objects.exists())
+
+
+class BulkStatusConcurrencyTests(TestCase):
+    """A bulk scan records history only for the parcels its UPDATEs actually moved."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcels = cls.factory.parcels(3, cls.offices)
+
+    def test_parcel_changed_after_the_read_is_rejected(self):
+        """Bulk scan the parcels, cancelling the first one after the batch has read it."""
+        victim = self.parcels[0]
+        move = bulk._move
+
+        def cancel_first(*args):
+            Parcel.objects.filter(pk=victim.pk).update(
+                current_status=self.factory.statuses()["CANCELLED"], version=F("version") + 1
+            )
+            return move(*args)
+
+        with mock.patch("apps.parcels.bulk._move", side_effect=cancel_first):
+            updated, rejected = bulk_update_status(
+                [p.pk for p in self.parcels], self.factory.statuses()["IN_TRANSIT"], self.offices[0], self.employee
+            )
+
+        self.assertEqual(updated, [p.tracking_number for p in self.parcels[1:]])
+        self.assertEqual(rejected, [{"identifier": victim.pk, "error": "Parcel changed concurrently."}])
+        victim.refresh_from_db()
+        self.assertEqual(victim.current_status.code, "CANCELLED")
+        history = ParcelStatusHistory.objects.filter(status__code="IN_TRANSIT")
+        self.assertEqual(sorted(history.values_list("parcel_id", flat=True)), [p.pk for p in self.parcels[1:]])
+
+    def test_one_update_per_office_and_status(self):
+        factory = self.factory
+        parcels = factory.parcels(4, self.offices[:1])
+        Parcel.objects.filter(pk__in=[p.pk for p in parcels[:2]]).update(version=F("version") + 1)
+        with CaptureQueriesContext(connection) as queries:
+            updated, rejected = bulk_update_status(
+                [p.pk for p in parcels], factory.statuses()["IN_TRANSIT"], self.offices[0], self.employee
+            )
+        self.assertEqual((len(updated), rejected), (4, []))
+        updates = [q["sql"] for q in queries if q["sql"].startswith(f'UPDATE "{PARCEL_TABLE}"')]
+        self.assertEqual(len(updates), 1)
+
+
+class StatusRegistryTests(TestCase):
+    """Status lookups are answered from memory and follow changes to the table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.factory.statuses()
+
+    def setUp(self):
+        statuses.clear()
+
+    def test_lookups_need_no_queries(self):
+        statuses.all()
+        created = ParcelStatus.objects.get(code="CREATED")
+        with self.assertNumQueries(0):
+            self.assertEqual(statuses.get("CREATED"), created)
+            self.assertEqual(statuses.by_id(created.pk), created)
+            self.assertIsNone(statuses.get("UNKNOWN"))
+            self.assertEqual([s.code for s in statuses.all()], sorted(code for code, _, _ in STATUSES))
+
+    def test_saves_and_deletes_clear_the_registry(self):
+        status = ParcelStatus.objects.get(code="CREATED")
+        self.assertEqual(statuses.get("CREATED").name, status.name)
+        status.name = "Registered"
+        status.save()
+        self.assertEqual(statuses.get("CREATED").name, "Registered")
+
+        held = ParcelStatus.objects.create(code="HELD", name="Held")
+        self.assertEqual(statuses.get("HELD"), held)
+        held.delete()
+        self.assertIsNone(statuses.get("HELD"))
+
+
+class ParcelQuoteTests(TestCase):
+    """parcels_api_quote prices manifest rows without registering them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def quote(self, body):
+        return self.client.post(reverse("parcels_api_quote"), body, content_type="application/json")
+
+    def row(self, **changes):
+        return {"sender_office_id": self.offices[0].pk, "weight_kg": "2.000", "delivery_type": "STANDARD", **changes}
+
+    def test_prices_each_row(self):
+        response = self.quote({"parcels": [
+            self.row(),
+            self.row(sender_office_id=None, receiver_office_id=self.offices[1].pk, delivery_type="EXPRESS"),
+            self.row(delivery_type="OVERNIGHT"),
+            self.row(weight_kg="-1"),
+            self.row(weight_kg="two"),
+            "not a parcel",
+        ]})
+        self.assertEqual(response.json(), {"success": True, "prices": [10.0, 17.0, None, None, None, None]})
+        self.assertFalse(Parcel.objects.exists())
+        # A single object is quoted too
+        self.assertEqual(self.quote(self.row(weight_kg=1)).json()["prices"], [5.0])
+
+    def test_tariff_save_refreshes_quotes(self):
+        self.assertEqual(self.quote([self.row()]).json()["prices"], [10.0])
+        Tariff.objects.filter(company=self.offices[0].company, delivery_type="STANDARD").get().delete()
+        self.assertEqual(self.quote([self.row()]).json()["prices"], [None])
+        Tariff.objects.create(company=self.offices[0].company, delivery_type="STANDARD", price_per_kg=Decimal("4.25"))
+        self.assertEqual(self.quote([self.row()]).json()["prices"], [8.5])
+
+    def test_bad_bodies(self):
+        response = self.client.post(reverse("parcels_api_quote"), "{", content_type="application/json")
+        self.assertEqual(response.json(), {"success": False, "error": "Invalid JSON."})
+        with mock.patch("apps.parcels.views.MAX_BULK_PARCELS", 3):
+            for body in ([], {"parcels": "x"}, "x", [self.row()] * 4):
+                with self.subTest(body=body):
+                    response = self.quote(body)
+                    self.assertEqual((response.status_code, response.json()["success"]), (400, False))
+
+
+class ReportIndexTests(TestCase):
+    """
+    Every filtered report must reach the parcel table through its index.
+
+    The report views are requested and each query they run against the
+    parcel table is EXPLAINed. A full scan of the table, or a plan that does
+    not use the index meant for that report, fails the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_data", stdout=StringIO())
+        cls.user = User.objects.get(username="manager1")
+        cls.client_user = User.objects.filter(role=UserRole.CLIENT).first()
+        cls.employee = cls.user.employee_profile
+
+    def setUp(self):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.skipTest(f"No query plan check for {connection.vendor}")
+        self.client.force_login(self.user)
+
+    def query_plan(self, sql):
+        """Return the plan of `sql` and the lines that scan the whole parcel table."""
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # The test tables are tiny; make the planner show whether an
+                # index can be used at all.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql)
+                plan = [row[0] for row in cursor.fetchall()]
+                return plan, [line for line in plan if f"Seq Scan on {PARCEL_TABLE}" in line]
+
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+            # "SEARCH <table> USING INDEX" seeks the index; "SCAN <table>" reads
+            # the whole table or, with "USING INDEX", the whole index.
+            return plan, [line for line in plan if line.startswith(f"SCAN {PARCEL_TABLE}")]
+
+    def assertUsesIndex(self, url, index):
+        """Every parcel query `url` runs must seek `index` and never scan the table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+        parcel_queries = [q["sql"] for q in queries if f'"{PARCEL_TABLE}"' in q["sql"]]
+        self.assertTrue(parcel_queries, f"{url} did not query {PARCEL_TABLE}")
+        for sql in parcel_queries:
+            plan, full_scans = self.query_plan(sql)
+            self.assertEqual(full_scans, [], f"{url} scans {PARCEL_TABLE}:\n{sql}")
+            self.assertTrue(
+                any(index in line for line in plan),
+                f"{url} does not use {index}:\n" + "\n".join(plan),
+            )
+
+    def test_pending_deliveries(self):
+        self.assertUsesIndex(reverse("reports_pending_deliveries"), "parcel_status_created_idx")
+
+    def test_income_parcels(self):
+        self.assertUsesIndex(reverse("reports_income") + "?parcels=1", "parcel_delivered_at_idx")
+
+    def test_income_parcels_for_period(self):
+        self.assertUsesIndex(
+            reverse("reports_income") + "?parcels=1&date_from=2020-01-01&date_to=2030-12-31", "parcel_delivered_at_idx"
+        )
+
+    def test_client_sent_parcels(self):
+        self.assertUsesIndex(
+            reverse("reports_client_parcels", args=[self.client_user.pk, "sent"]), "parcel_sender_created_idx"
+        )
+
+    def test_client_received_parcels(self):
+        self.assertUsesIndex(
+            reverse("reports_client_parcels", args=[self.client_user.pk, "received"]), "parcel_receiver_created_idx"
+        )
+
+    def test_parcels_by_employee(self):
+        self.assertUsesIndex(
+            reverse("reports_parcels_by_employee", args=[self.employee.pk]), "parcel_registered_created_idx"
+        )
+
+
+class IncomeRollupTests(TestCase):
+    """The income rollup stays equal to a rebuild through admin edits and deletes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.admin = User.objects.create_superuser("rollup_admin", "rollup_admin@example.com", "x")
+        cls.parcels = cls.factory.parcels(3, cls.offices)
+
+    def setUp(self):
+        self.model_admin = admin.site._registry[Parcel]
+        self.request = RequestFactory().post("/")
+        self.request.user = self.admin
+
+    def totals(self):
+        return DailyIncomeRollup.objects.aggregate(parcels=Sum("parcels_count"), income=Sum("income"))
+
+    def assertMatchesRebuild(self):
+        totals = self.totals()
+        rebuild_income_rollups()
+        self.assertEqual(totals, self.totals())
+        return totals
+
+    def edit(self, parcel, **changes):
+        parcel = Parcel.objects.get(pk=parcel.pk)
+        for name, value in changes.items():
+            setattr(parcel, name, value)
+        self.model_admin.save_model(self.request, parcel, form=None, change=True)
+
+    def test_admin_edits_and_deletes(self):
+        delivered = self.factory.statuses()["DELIVERED"]
+        first, second, third = self.parcels
+        for parcel in self.parcels:
+            self.edit(parcel, current_status=delivered, delivered_at=timezone.now())
+        self.assertEqual(self.assertMatchesRebuild(), {"parcels": 3, "income": Decimal("22.50")})
+
+        self.edit(first, weight_kg=Decimal("3.000"))
+        self.edit(second, current_status=self.factory.statuses()["IN_TRANSIT"], delivered_at=None)
+        self.assertEqual(self.assertMatchesRebuild(), {"parcels": 2, "income": Decimal("22.50")})
+
+        self.model_admin.delete_model(self.request, Parcel.objects.get(pk=first.pk))
+        self.model_admin.delete_queryset(self.request, Parcel.objects.filter(pk=third.pk))
+        self.assertEqual(self.totals(), {"parcels": 0, "income": Decimal("0")})
+
+    def test_income_is_booked_at_the_rate_when_delivered(self):
+        parcels = self.factory.parcels(3, self.offices, status="IN_TRANSIT")
+        delivered = self.factory.statuses()["DELIVERED"]
+        tariff = parcels[0].tariff
+        # Warm the tariff cache, then change the rate behind its back
+        self.assertEqual(tariffs.by_id(tariff.pk).price_per_kg, Decimal("5.00"))
+        Tariff.objects.filter(pk=tariff.pk).update(price_per_kg=Decimal("6.00"))
+
+        bulk_update_status([p.pk for p in parcels[:2]], delivered, self.offices[0], None)
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse("parcels_api_update_status", args=[parcels[2].pk]),
+            {"status_code": "DELIVERED"}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), {"parcels": 3, "income": Decimal("27.00")})
+
+        # A later rate change leaves the income already booked alone
+        tariff.price_per_kg = Decimal("7.00")
+        tariff.save()
+        self.assertEqual(self.assertMatchesRebuild(), {"parcels": 3, "income": Decimal("27.00")})
+        self.assertEqual(
+            set(Parcel.objects.filter(pk__in=[p.pk for p in parcels]).values_list("delivered_price", flat=True)),
+            {Decimal("9.00")},
+        )
+
+    def test_rebuild_prices_unpriced_deliveries(self):
+        Parcel.objects.filter(pk=self.parcels[0].pk).update(
+            current_status=self.factory.statuses()["DELIVERED"], delivered_at=timezone.now()
+        )
+        rebuild_income_rollups()
+        self.assertEqual(self.totals(), {"parcels": 1, "income": Decimal("7.50")})
+
+    def test_duplicate_rows_for_a_null_key(self):
+        key = {"day": timezone.localdate(), "company": None, "office": None, "delivery_type": "STANDARD"}
+        DailyIncomeRollup.objects.bulk_create([DailyIncomeRollup(**key), DailyIncomeRollup(**key)])
+        record_deliveries([{
+            "company_id": None, "sender_office_id": None, "delivery_type": "STANDARD",
+            "delivered_price": None, "delivered_at": timezone.now(),
+        }])
+        self.assertEqual(sorted(DailyIncomeRollup.objects.values_list("parcels_count", flat=True)), [0, 1])
+
+
+class ParcelCounterTests(TestCase):
+    """Every write path keeps ParcelStatusCount equal to a rebuild from the parcels."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.factory.statuses()
+        cls.offices = cls.factory.offices(2)
+        cls.sender, cls.receiver = cls.factory.clients(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def counts(self):
+        rows = ParcelStatusCount.objects.values_list("office_id", "status_id").annotate(total=Sum("parcels_count"))
+        return {(office_id, status_id): total for office_id, status_id, total in rows.order_by() if total}
+
+    def assertCountsMatchParcels(self):
+        live = self.counts()
+        rebuild_parcel_counters()
+        self.assertEqual(live, self.counts())
+
+    def post(self, name, body, *args, method="post"):
+        response = getattr(self.client, method)(reverse(name, args=args), body, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def create(self, sender_office):
+        return self.post("parcels_api_create", {
+            "sender_id": self.sender.pk,
+            "receiver_id": self.receiver.pk,
+            "sender_office_id": sender_office.pk if sender_office else None,
+            "receiver_office_id": self.offices[1].pk,
+            "weight_kg": "1.000",
+            "delivery_type": "STANDARD",
+        })["parcel"]
+
+    def test_every_write_path(self):
+        at_office = self.create(self.offices[0])
+        self.assertCountsMatchParcels()
+        picked_up = self.create(None)
+        self.assertIn((None, statuses.get("CREATED").pk), self.counts())
+        self.assertCountsMatchParcels()
+
+        self.post("parcels_api_update", {"sender_office_id": self.offices[1].pk}, at_office["id"], method="put")
+        self.assertCountsMatchParcels()
+        self.post("parcels_api_update", {"sender_office_id": None}, at_office["id"], method="put")
+        self.assertCountsMatchParcels()
+        self.post("parcels_api_update_status", {"status_code": "IN_TRANSIT"}, picked_up["id"])
+        self.assertCountsMatchParcels()
+
+        manifest = self.post("parcels_api_bulk_create", [
+            {"sender_id": self.sender.pk, "receiver_id": self.receiver.pk, "sender_office_id": office.pk,
+             "weight_kg": "1.000", "delivery_type": "STANDARD"}
+            for office in self.offices
+        ])
+        self.assertCountsMatchParcels()
+        self.post("parcels_api_bulk_update_status", {
+            "tracking_numbers": [row["tracking_number"] for row in manifest["results"]] + [at_office["tracking_number"]],
+            "status_code": "IN_TRANSIT",
+        })
+        self.assertCountsMatchParcels()
+
+        manifest_ids = [row["id"] for row in manifest["results"]]
+        self.post("parcels_api_bulk_update_status", {"parcel_ids": manifest_ids, "status_code": "DELIVERED"})
+        self.assertCountsMatchParcels()
+
+        deletable = self.create(self.offices[1])
+        response = self.client.delete(reverse("parcels_api_delete", args=[deletable["id"]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertCountsMatchParcels()
+
+    def test_summary_includes_parcels_without_an_office(self):
+        self.create(self.offices[0])
+        self.create(None)
+        self.create(None)
+        # Delivered parcels are not pending
+        self.factory.parcels(1, [self.offices[0]], status="DELIVERED")
+
+        data = self.client.get(reverse("reports_pending_deliveries_summary")).json()
+        self.assertEqual(data["pending_count"], 3)
+        by_office = {office["office_id"]: office for office in data["offices"]}
+        self.assertEqual(by_office[None], {
+            "office_id": None, "office_name": "No office", "pending_count": 2, "statuses": {"CREATED": 2},
+        })
+        self.assertEqual(by_office[self.offices[0].pk]["statuses"], {"CREATED": 1})
+
+
+class ParcelQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    The parcel APIs, reports and admin changelists run a fixed number of
+    queries, however many parcels they return.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.clients = cls.factory.clients(3)
+        cls.employee = cls.factory.employee(cls.offices[0], Employee.EmployeeType.MANAGER)
+        cls.admin = cls.factory.users(1, UserRole.ADMIN, is_staff=True, is_superuser=True)[0]
+        cls.parcels = cls.factory.parcels(10, cls.offices, cls.clients, registered_by=cls.employee, notes=True)
+        cls.factory.parcels(10, cls.offices, cls.clients, status="DELIVERED", registered_by=cls.employee)
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def grow(self, count=990):
+        def add_parcels():
+            self.factory.parcels(count, self.offices, self.clients, registered_by=self.employee, notes=True)
+            self.factory.parcels(count // 10, self.offices, self.clients, status="DELIVERED", registered_by=self.employee)
+        return add_parcels
+
+    def test_parcels_api_list(self):
+        self.assertQueryBudget(reverse("parcels_api_list") + "?limit=200", 4, grow=self.grow())
+
+    def test_parcels_api_list_filtered(self):
+        self.assertQueryBudget(reverse("parcels_api_list") + "?status=CREATED&delivery_type=STANDARD", 4, grow=self.grow())
+
+    def test_parcels_api_get(self):
+        self.assertQueryBudget(reverse("parcels_api_get", args=[self.parcels[0].pk]), 3)
+
+    def test_parcels_api_search(self):
+        self.assertQueryBudget(reverse("parcels_api_search") + "?q=test&limit=200", 5, grow=self.grow())
+        self.assertQueryBudget(reverse("parcels_api_search") + "?q=test&status=CREATED", 4, grow=self.grow())
+
+    def test_track_parcel_api(self):
+        self.client.logout()
+        parcel = self.parcels[0]
+        statuses.all()  # load the registry outside the budget
+
+        def add_history():
+            ParcelStatusHistory.objects.bulk_create([
+                ParcelStatusHistory(parcel=parcel, status_id=parcel.current_status_id, office=self.offices[i % 2])
+                for i in range(50)
+            ])
+            cache.delete(tracking_cache_key(parcel.tracking_number))
+
+        cache.delete(tracking_cache_key(parcel.tracking_number))
+        self.assertQueryBudget(
+            reverse("track_parcel_api") + f"?tracking_number={parcel.tracking_number}", 2, grow=add_history, warm=False
+        )
+
+    def test_client_parcels_reports(self):
+        client_id = self.clients[0].pk
+        self.assertQueryBudget(reverse("reports_client_parcels_all", args=["all"]), 3, grow=self.grow())
+        self.assertQueryBudget(reverse("reports_client_parcels", args=[client_id, "sent"]), 4, grow=self.grow(100))
+        self.assertQueryBudget(reverse("reports_client_parcels", args=[client_id, "received"]), 4, grow=self.grow(100))
+
+    def test_parcels_by_employee_reports(self):
+        self.assertQueryBudget(reverse("reports_parcels_by_employee_all"), 3, grow=self.grow())
+        self.assertQueryBudget(reverse("reports_parcels_by_employee", args=[self.employee.pk]), 5, grow=self.grow(100))
+
+    def test_pending_deliveries_reports(self):
+        self.assertQueryBudget(reverse("reports_pending_deliveries") + "?limit=200", 4, grow=self.grow())
+        self.assertQueryBudget(reverse("reports_pending_deliveries_summary"), 3, grow=self.grow(100))
+
+    def test_income_report(self):
+        self.assertQueryBudget(reverse("reports_income"), 4, grow=self.grow())
+        self.assertQueryBudget(reverse("reports_income") + "?parcels=1&limit=200", 5, grow=self.grow())
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        budgets = {
+            "parcel": 11, "parcelstatushistory": 9, "parcelnote": 7, "parcelstatuscount": 7, "dailyincomerollup": 9,
+            "parcelstatustransition": 9,
+        }
+        for model, budget in budgets.items():
+            with self.subTest(model=model):
+                self.assertQueryBudget(reverse(f"admin:parcels_{model}_changelist"), budget, grow=self.grow(200))
+
+
+class ParcelSearchTests(TestCase):
+    """The search API finds parcels through the full-text index and keeps it in sync."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.ivan, cls.maria, cls.other = cls.factory.clients(3)
+        User.objects.filter(pk=cls.ivan.pk).update(first_name="Ivan", last_name="Petrov", phone="+359888123456")
+        User.objects.filter(pk=cls.maria.pk).update(first_name="Мария", last_name="Георгиева")
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcels = cls.factory.parcels(30, cls.offices, [cls.ivan, cls.maria])
+        cls.factory.parcels(5, cls.offices, [cls.other, cls.maria])
+        call_command("rebuild_parcel_search", stdout=StringIO())
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("parcels_api_search"), {"q": query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def tracking_numbers(self, query, **params):
+        return {p["tracking_number"] for p in self.search(query, **params)["parcels"]}
+
+    def test_matches_word_prefixes_of_every_term(self):
+        self.assertEqual(len(self.tracking_numbers("ivan petr", limit=500)), 30)
+        self.assertEqual(len(self.tracking_numbers("мари", limit=500)), 35)
+        self.assertEqual(len(self.tracking_numbers("+359888", limit=500)), 30)
+        self.assertEqual(self.tracking_numbers("ivan георгиева nobody"), set())
+
+    def test_tracking_number_and_office(self):
+        parcel = self.parcels[0]
+        self.assertEqual(self.tracking_numbers(parcel.tracking_number.lower()), {parcel.tracking_number})
+        self.assertEqual(len(self.tracking_numbers(self.offices[1].name, limit=500)), 35)
+
+    def test_pages_newest_first(self):
+        first = self.search("petrov", limit=20)
+        second = self.search("petrov", limit=20, cursor=first["next"])
+        ids = [p["id"] for p in first["parcels"] + second["parcels"]]
+        self.assertEqual(ids, sorted({p.pk for p in self.parcels}, reverse=True))
+        self.assertIsNone(second["next"])
+
+    def test_filters_and_clients(self):
+        self.assertEqual(len(self.tracking_numbers("мария", status="CREATED", limit=500)), 35)
+        self.assertEqual(self.tracking_numbers("мария", status="DELIVERED"), set())
+
+        self.client.force_login(self.other)
+        self.assertEqual(len(self.tracking_numbers("мария", limit=500)), 5)
+
+    def test_bad_requests(self):
+        url = reverse("parcels_api_search")
+        self.assertEqual(self.client.get(url).status_code, 400)
+        for cursor in ("nope", encode_cursor([True]), encode_cursor([2 ** 70]), encode_cursor(["1"])):
+            self.assertEqual(self.client.get(url, {"q": "ivan", "cursor": cursor}).status_code, 400)
+
+    def test_email_parts(self):
+        self.assertEqual(len(self.tracking_numbers(self.ivan.email.split("@")[1], limit=500)), 35)
+        self.assertEqual(len(self.tracking_numbers(self.ivan.email, limit=500)), 30)
+
+    @mock.patch("apps.parcels.signals.REINDEX_BATCH_SIZE", 7)
+    def test_follows_renames(self):
+        self.ivan.refresh_from_db()
+        self.ivan.last_name = "Dimitrov"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ivan.save()
+        self.assertEqual(self.tracking_numbers("petrov"), set())
+        self.assertEqual(len(self.tracking_numbers("dimitrov", limit=500)), 30)
+
+        office = self.offices[0]
+        office.name = "Plovdiv Central"
+        with self.captureOnCommitCallbacks() as callbacks:
+            office.save()
+        # Re-indexed only once the rename commits
+        self.assertEqual(self.tracking_numbers("plovdiv"), set())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.tracking_numbers("plovdiv", limit=500)), 35)
+
+        parcel = self.parcels[0]
+        parcel.receiver = self.other
+        parcel.save()
+        self.assertEqual(len(self.tracking_numbers("ivan", limit=500)), 30)
+        self.assertIn(parcel.tracking_number, self.tracking_numbers(self.other.last_name, limit=500))
+
+        parcel.delete()
+        self.assertNotIn(parcel.tracking_number, self.tracking_numbers(self.other.last_name, limit=500))
+
+    def test_admin_search(self):
+        admin = self.factory.users(1, UserRole.ADMIN, is_staff=True, is_superuser=True)[0]
+        self.client.force_login(admin)
+        response = self.client.get(reverse("admin:parcels_parcel_changelist"), {"q": "ivan petrov"})
+        self.assertEqual(response.context["cl"].result_count, 30)
+
+
+class TrackingNumberTests(TransactionTestCase):
+    """Tracking numbers come from blocks reserved once per process."""
+
+    def test_blocks(self):
+        allocator = TrackingNumberAllocator()
+        allocator.BLOCK_SIZE = 100
+        first = allocator.allocate(60)
+        with self.assertNumQueries(0):
+            second = allocator.allocate(40)
+        third = allocator.allocate(10)
+
+        numbers = first + second + third
+        self.assertEqual(len(set(numbers)), 110)
+        self.assertTrue(all(len(n) == 16 and has_valid_check_digit(n) for n in numbers))
+        self.assertEqual(TrackingNumberSequence.objects.get(prefix="EXP").next_value, 201)
+
+        # Another process continues after the reserved blocks
+        other = TrackingNumberAllocator().allocate()[0]
+        self.assertEqual(other[:-1], "EXP000000000201")
+
+    def test_reserves_only_what_it_needs_in_a_transaction(self):
+        allocator = TrackingNumberAllocator()
+        with transaction.atomic():
+            allocator.allocate(5)
+            self.assertEqual(TrackingNumberSequence.objects.get(prefix="EXP").next_value, 6)
+        # Nothing was kept for later: the transaction could have rolled back
+        with self.assertNumQueries(4):
+            allocator.allocate()
+
+    def test_check_digit(self):
+        self.assertEqual(luhn_check_digit("7992739871"), "3")
+        self.assertFalse(has_valid_check_digit("EXP0000000012341"))
+        self.assertTrue(has_valid_check_digit("EXP0000000012344"))
+        # Other formats are not checked
+        self.assertTrue(has_valid_check_digit("EXP202600000001"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("track_parcel_api"), {"tracking_number": "exp0000000012341"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ParcelVersionTests(TestCase):
+    """Writes are conditional on the parcel version the client read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.parcel = cls.factory.parcels(1, cls.offices)[0]
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def scan(self, status_code, **data):
+        return self.client.post(
+            reverse("parcels_api_update_status", args=[self.parcel.pk]),
+            {"status_code": status_code, **data},
+            content_type="application/json",
+        )
+
+    def test_status_update_bumps_version(self):
+        response = self.scan("IN_TRANSIT", version=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        self.parcel.refresh_from_db()
+        self.assertEqual((self.parcel.current_status.code, self.parcel.version), ("IN_TRANSIT", 2))
+
+    def test_stale_version_conflicts(self):
+        self.assertEqual(self.scan("IN_TRANSIT", version=1).status_code, 200)
+        # A second scanner that read the parcel before the first one wrote
+        response = self.scan("DELIVERED", version=1)
+        self.assertEqual(response.status_code, 409)
+        self.parcel.refresh_from_db()
+        self.assertEqual(self.parcel.current_status.code, "IN_TRANSIT")
+        self.assertIsNone(self.parcel.delivered_at)
+        self.assertEqual(ParcelStatusHistory.objects.filter(parcel=self.parcel).count(), 2)
+
+        response = self.client.patch(
+            reverse("parcels_api_update", args=[self.parcel.pk]),
+            {"weight_kg": "3.000", "version": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_invalid_version(self):
+        self.assertEqual(self.scan("IN_TRANSIT", version="1").status_code, 400)
+
+    def admin_edit(self, version, weight_kg="2.000"):
+        """POST the admin change form of the parcel as loaded at `version`."""
+        admin_user = User.objects.create_superuser(f"admin{version}", f"admin{version}@example.com", "x")
+        self.client.force_login(admin_user)
+        return self.client.post(*admin_change(self.parcel, weight_kg=weight_kg, version=version))
+
+    def test_admin_save_is_guarded_by_the_version(self):
+        self.assertEqual(self.scan("IN_TRANSIT", version=1).status_code, 200)
+        response = self.admin_edit(version=1)
+        self.assertContains(response, "Parcel was changed by another request.")
+        self.parcel.refresh_from_db()
+        self.assertEqual((self.parcel.weight_kg, self.parcel.version), (Decimal("1.500"), 2))
+
+        self.assertEqual(self.admin_edit(version=2).status_code, 302)
+        self.parcel.refresh_from_db()
+        self.assertEqual((self.parcel.weight_kg, self.parcel.version), (Decimal("2.000"), 3))
+        # A scanner holding the version the admin replaced
+        self.assertEqual(self.scan("OUT_FOR_DELIVERY", version=2).status_code, 409)
+
+    def test_bulk_status_update_bumps_version(self):
+        response = self.client.post(
+            reverse("parcels_api_bulk_update_status"),
+            {"parcel_ids": [self.parcel.pk], "status_code": "IN_TRANSIT"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.scan("OUT_FOR_DELIVERY", version=1).status_code, 409)
+        self.assertEqual(self.scan("OUT_FOR_DELIVERY", version=2).status_code, 200)
+
+
+class StatusTransitionTests(TestCase):
+    """Status changes follow the ParcelStatusTransition table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.created, cls.in_transit = cls.factory.parcels(2, cls.offices)
+
+    def setUp(self):
+        statuses.clear()
+        self.client.force_login(self.employee.user)
+
+    def scan(self, parcel, status_code):
+        return self.client.post(
+            reverse("parcels_api_update_status", args=[parcel.pk]),
+            {"status_code": status_code},
+            content_type="application/json",
+        )
+
+    def test_only_allowed_transitions(self):
+        response = self.scan(self.created, "DELIVERED")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Cannot change status from CREATED to DELIVERED.")
+        self.assertEqual(self.scan(self.created, "IN_TRANSIT").status_code, 200)
+        self.assertEqual(self.scan(self.created, "DELIVERED").status_code, 200)
+
+    def test_bulk_rejects_disallowed_parcels(self):
+        self.assertEqual(self.scan(self.in_transit, "IN_TRANSIT").status_code, 200)
+        response = self.client.post(
+            reverse("parcels_api_bulk_update_status"),
+            {"parcel_ids": [self.created.pk, self.in_transit.pk], "status_code": "OUT_FOR_DELIVERY"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["updated_count"], 1)
+        self.assertEqual([r["identifier"] for r in data["rejected"]], [self.created.pk])
+
+    def test_registry_follows_table_changes(self):
+        status = self.factory.statuses()
+        self.assertTrue(statuses.can_transition(status["CREATED"].pk, status["CANCELLED"].pk))
+        ParcelStatusTransition.objects.get(from_status=status["CREATED"], to_status=status["CANCELLED"]).delete()
+        self.assertFalse(statuses.can_transition(status["CREATED"].pk, status["CANCELLED"].pk))
+        # CANCELLED is no longer reachable from CREATED, so no longer deletable
+        self.assertEqual(statuses.deletable_ids(), {status["CREATED"].pk})
+
+    def test_delete_only_before_dispatch(self):
+        self.assertEqual(self.scan(self.in_transit, "IN_TRANSIT").status_code, 200)
+        response = self.client.delete(reverse("parcels_api_delete", args=[self.in_transit.pk]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Can only delete parcels with CANCELLED or CREATED status.")
+        response = self.client.delete(reverse("parcels_api_delete", args=[self.created.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_metadata_lists_next_statuses(self):
+        response = self.client.get(reverse("metadata_api"))
+        by_code = {s["code"]: s for s in response.json()["statuses"]}
+        self.assertEqual(by_code["CREATED"]["next"], ["CANCELLED", "IN_TRANSIT"])
+        self.assertEqual(by_code["DELIVERED"]["next"], [])
+        self.assertTrue(by_code["CANCELLED"]["deletable"])
+        self.assertFalse(by_code["IN_TRANSIT"]["deletable"])
+
+
+class IdempotencyKeyTests(TestCase):
+    """A retried request with the same Idempotency-Key gets the first response and does no work."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.sender, cls.receiver = cls.factory.clients(2)
+        cls.employee = cls.factory.employee(cls.offices[0])
+        cls.other_employee = cls.factory.employee(cls.offices[0])
+        cls.parcel = cls.factory.parcels(1, cls.offices)[0]
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def create(self, key, weight="1.250"):
+        return self.client.post(
+            reverse("parcels_api_create"),
+            {
+                "sender_id": self.sender.pk,
+                "receiver_id": self.receiver.pk,
+                "sender_office_id": self.offices[0].pk,
+                "receiver_office_id": self.offices[1].pk,
+                "weight_kg": weight,
+                "delivery_type": "STANDARD",
+            },
+            content_type="application/json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def scan(self, key, status_code="IN_TRANSIT"):
+        return self.client.post(
+            reverse("parcels_api_update_status", args=[self.parcel.pk]),
+            {"status_code": status_code},
+            content_type="application/json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retried_create_returns_the_same_parcel(self):
+        first = self.create("create-1")
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.create("create-1")
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        # The failed claim and a read of the stored response; no parcel queries
+        self.assertFalse([q["sql"] for q in queries if PARCEL_TABLE in q["sql"]])
+        self.assertEqual(Parcel.objects.filter(sender=self.sender).count(), 1)
+        self.assertTrue(str(IdempotencyKey.objects.get()).endswith(" (parcels_api_create)"))
+
+        self.assertEqual(self.create("create-2").status_code, 200)
+        self.assertEqual(Parcel.objects.filter(sender=self.sender).count(), 2)
+
+    def test_retried_scan_adds_one_history_entry(self):
+        self.assertEqual(self.scan("scan-1").status_code, 200)
+        self.assertEqual(self.scan("scan-1").status_code, 200)
+        self.assertEqual(ParcelStatusHistory.objects.filter(parcel=self.parcel).count(), 2)
+        self.parcel.refresh_from_db()
+        self.assertEqual(self.parcel.version, 2)
+
+    def test_errors_are_replayed_but_not_server_errors(self):
+        first = self.scan("scan-bad", "DELIVERED")
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(self.scan("scan-bad", "DELIVERED").content, first.content)
+
+        def bulk_scan():
+            return self.client.post(
+                reverse("parcels_api_bulk_update_status"),
+                {"parcel_ids": [self.parcel.pk], "status_code": "IN_TRANSIT"},
+                content_type="application/json",
+                headers={"Idempotency-Key": "bulk-1"},
+            )
+
+        with mock.patch("apps.parcels.views.bulk_update_status", side_effect=RuntimeError("Database unavailable")):
+            self.assertEqual(bulk_scan().status_code, 500)
+        response = bulk_scan()
+        self.assertEqual(response.json()["updated_count"], 1)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_key_reused_for_another_request(self):
+        self.assertEqual(self.create("create-1").status_code, 200)
+        response = self.create("create-1", weight="2.000")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.scan("create-1").status_code, 422)
+
+    def test_keys_are_per_user(self):
+        self.assertEqual(self.create("create-1").status_code, 200)
+        self.client.force_login(self.other_employee.user)
+        self.assertNotIn("Idempotent-Replayed", self.create("create-1"))
+        self.assertEqual(Parcel.objects.filter(sender=self.sender).count(), 2)
+
+    def test_failed_view_rolls_back_with_its_key(self):
+        @idempotent
+        def view(request):
+            IdempotencyKey.objects.create(digest="written-by-the-view", fingerprint="", expires_at=timezone.now())
+            raise RuntimeError("Crashed after writing")
+
+        request = RequestFactory().post("/", headers={"Idempotency-Key": "crash-1"})
+        request.user = self.employee.user
+        with self.assertRaises(RuntimeError):
+            view(request)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key(self):
+        self.assertEqual(self.scan("scan-1").status_code, 200)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        response = self.scan("scan-1", "OUT_FOR_DELIVERY")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_invalid_key(self):
+        self.assertEqual(self.scan("").status_code, 400)
+        self.assertEqual(self.scan("x" * 256).status_code, 400)
@@ -0,0 +1,151 @@
+"""
+Read-through cache for the public tracking endpoint.
+
+Responses are cached per normalized tracking number in Django's cache
+framework (see CACHES in settings). Anything that changes a parcel must call
+invalidate_tracking() for its tracking number; the views and the admin do.
+Unknown tracking numbers are cached too, with a short TTL, so enumeration
+scans are answered from the cache instead of the database.
+
+A response also shows office names, which any number of parcels share, so
+a change to an office calls invalidate_all_tracking() (see signals.py).
+That moves every key to a new generation, with one cache write. Other
+changes to what a response shows, such as an edited address, show after
+TRACKING_CACHE_TTL.
+
+Invalidation only reaches the workers that share the cache. With more
+than one worker process, CACHES must point at a shared backend such as
+Redis or Memcached. The local-memory default would keep serving old
+responses from the other workers' caches; "manage.py check --deploy"
+warns about it (see checks.py).
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Parcel, ParcelStatusHistory, normalize_tracking_number
+from .numbers import has_valid_check_digit
+from .registry import statuses
+from .serializers import DATETIME_FORMAT
+
+
+TRACKING_CACHE_TTL = 5 * 60
+TRACKING_NOT_FOUND_TTL = 30
+
+NOT_FOUND = (404, {"success": False, "error": "Parcel not found."})
+
+GENERATION_KEY = "parcels:track:generation"
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Started from the clock, like the version stamps, so that a lost
+        # generation never comes back to one that old entries were keyed with
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def tracking_cache_key(tracking_number):
+    # Tracking numbers come straight from the query string; hash them so any
+    # input makes a valid key for every cache backend (e.g. memcached).
+    digest = hashlib.sha1(normalize_tracking_number(tracking_number).encode()).hexdigest()
+    return f"parcels:track:{_generation()}:{digest}"
+
+
+def build_tracking_response(tracking_number):
+    """
+    Return (status_code, payload) for the tracking endpoint, bypassing the cache.
+    `tracking_number` must already be normalized.
+    """
+    try:
+        parcel = Parcel.objects.select_related(
+            "sender_office",
+            "receiver_office",
+            "pickup_address",
+            "delivery_address",
+        ).get(tracking_number=tracking_number)
+    except Parcel.DoesNotExist:
+        return NOT_FOUND
+
+    history = ParcelStatusHistory.objects.filter(parcel=parcel).select_related(
+        "office"
+    ).order_by("-created_at")
+
+    history_data = []
+    for h in history:
+        status = statuses.by_id(h.status_id)
+        history_data.append({
+            "status": status.name if status else "-",
+            "status_code": status.code if status else "-",
+            "office": str(h.office) if h.office else "-",
+            "note": h.note or "",
+            "timestamp": h.created_at.strftime(DATETIME_FORMAT),
+        })
+
+    current_status = statuses.by_id(parcel.current_status_id)
+
+    return 200, {
+        "success": True,
+        "parcel": {
+            "tracking_number": parcel.tracking_number,
+            "status": current_status.name if current_status else "-",
+            "status_code": current_status.code if current_status else "-",
+            "is_delivered": current_status.is_terminal if current_status else False,
+            "delivery_type": parcel.get_delivery_type_display(),
+            "weight_kg": float(parcel.weight_kg),
+            "sender_office": str(parcel.sender_office) if parcel.sender_office else None,
+            "receiver_office": str(parcel.receiver_office) if parcel.receiver_office else None,
+            "pickup_address": str(parcel.pickup_address) if parcel.pickup_address else None,
+            "delivery_address": str(parcel.delivery_address) if parcel.delivery_address else None,
+            "created_at": parcel.created_at.strftime(DATETIME_FORMAT),
+            "delivered_at": parcel.delivered_at.strftime(DATETIME_FORMAT) if parcel.delivered_at else None,
+        },
+        "history": history_data,
+    }
+
+
+def get_tracking_response(tracking_number):
+    """Return (status_code, payload), serving it from the cache when possible."""
+    if not has_valid_check_digit(normalize_tracking_number(tracking_number)):
+        # A mistyped number: answered without the cache or the database
+        return NOT_FOUND
+
+    key = tracking_cache_key(tracking_number)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = build_tracking_response(normalize_tracking_number(tracking_number))
+    timeout = TRACKING_CACHE_TTL if response[0] == 200 else TRACKING_NOT_FOUND_TTL
+    cache.set(key, response, timeout)
+    return response
+
+
+def invalidate_tracking(*tracking_numbers):
+    """
+    Drop the cached responses for the given tracking numbers.
+
+    The delete runs after the surrounding transaction commits, so a
+    concurrent request cannot re-cache the old state in between.
+    """
+    keys = [tracking_cache_key(number) for number in tracking_numbers if number]
+    if keys:
+        transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted: any new value from the clock is past the old one
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_all_tracking():
+    """Drop every cached response, after the surrounding transaction commits."""
+    transaction.on_commit(_next_generation)
@@ -1,22 +1,47 @@
 import json
-import uuid
 from decimal import Decimal, InvalidOperation
 from functools import wraps
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Q, F, Sum
+from django.db.models import F, Q, Sum
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
 from django.views.decorators.http import require_GET, require_http_methods
 
-from .models import Parcel, ParcelStatus, ParcelStatusHistory
+from .models import DailyIncomeRollup, Parcel, ParcelStatusCount, ParcelStatusHistory
+from .numbers import tracking_numbers
+from .registry import statuses
+from .rollups import price_delivery, record_deliveries
+from .counters import adjust_counts, count_parcels
+from .bulk import MAX_BULK_PARCELS, MAX_BULK_SCANS, bulk_register_parcels, bulk_update_status, quote_manifest
+from .tracking import get_tracking_response, invalidate_tracking
+from .search import filter_matching, matching_ids
+from .serializers import (
+    EMPLOYEE_REPORT_FIELDS,
+    INCOME_REPORT_FIELDS,
+    LIST_FIELDS,
+    PENDING_REPORT_FIELDS,
+    REPORT_FIELDS,
+    format_parcel_rows,
+    parcel_values,
+    serialize_parcels,
+)
 from apps.workforce.models import Employee
 from apps.accounts.models import User, UserRole
 from apps.organizations.models import Company, Office
-from apps.common.models import Tariff, DeliveryType
+from apps.common.idempotency import idempotent
+from apps.common.models import DeliveryType
+from apps.common.tariffs import tariffs
+from apps.common.pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_keyset, parse_limit
+from apps.common.responses import StreamingJsonResponse
+from apps.common.versions import touch, versioned
+
+
+# Rows fetched per round-trip when streaming reports
+REPORT_CHUNK_SIZE = 2000
 
 
 def employee_or_admin_required(view_func):
@@ -39,59 +64,35 @@ def client_parcels_report(request, client_id=None, role="all"):
           'received' -> receiver
           'all' -> all parcels
     """
-    parcels = Parcel.objects.select_related(
-        "company",
-        "sender",
-        "receiver",
-        "current_status",
-        "sender_office",
-        "receiver_office",
-        "pickup_address",
-        "delivery_address",
-        "tariff",
-    ).order_by("-created_at")
+    parcels_qs = Parcel.objects.order_by("-created_at")
 
     client = None
     if role == "sent":
         if client_id is None:
             return JsonResponse({"error": "client_id is required for sent parcels"}, status=400)
         client = get_object_or_404(User, pk=client_id, role=UserRole.CLIENT)
-        parcels = parcels.filter(sender=client)
+        parcels_qs = parcels_qs.filter(sender=client)
     elif role == "received":
         if client_id is None:
             return JsonResponse({"error": "client_id is required for received parcels"}, status=400)
         client = get_object_or_404(User, pk=client_id, role=UserRole.CLIENT)
-        parcels = parcels.filter(receiver=client)
+        parcels_qs = parcels_qs.filter(receiver=client)
     elif role == "all":
         pass
     else:
         return JsonResponse({"error": "Invalid role"}, status=400)
 
-    data = [
-        {
-            "tracking_number": p.tracking_number,
-            "status": p.current_status.name if p.current_status else "-",
-            "delivery_type": p.get_delivery_type_display(),
-            "price": float(p.price),
-            "weight_kg": float(p.weight_kg),
-            "sender": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
-            "receiver": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
-            "sender_office": str(p.sender_office) if p.sender_office else "-",
-            "receiver_office": str(p.receiver_office) if p.receiver_office else "-",
-            "pickup_address": str(p.pickup_address) if p.pickup_address else "-",
-            "delivery_address": str(p.delivery_address) if p.delivery_address else "-",
-            "created_at": p.created_at.strftime("%Y-%m-%d %H:%M"),
-            "delivered_at": p.delivered_at.strftime("%Y-%m-%d %H:%M") if p.delivered_at else "-",
-        }
-        for p in parcels
-    ]
+    data = serialize_parcels(parcels_qs, REPORT_FIELDS, chunk_size=REPORT_CHUNK_SIZE)
 
-    return JsonResponse({
-        "client_id": client.id if client else None,
-        "client_name": f"{client.first_name} {client.last_name}" if client else "All Clients",
-        "parcels_count": parcels.count(),
-        "parcels": data,
-    })
+    return StreamingJsonResponse(
+        {
+            "client_id": client.id if client else None,
+            "client_name": f"{client.first_name} {client.last_name}" if client else "All Clients",
+        },
+        "parcels",
+        data,
+        count_key="parcels_count",
+    )
 
 
 
@@ -115,7 +116,6 @@ def parcels(request):
         "receiver",
         "pickup_address",
         "delivery_address",
-        "current_status",
         "registered_by",
         "tariff",
         "sender_office",
@@ -137,143 +137,159 @@ def parcels(request):
 def parcels_by_employee_report(request, employee_id=None):
     """Return all parcels registered by a specific employee."""
 
-    parcels_qs = Parcel.objects.select_related(
-        "sender",
-        "receiver",
-        "current_status",
-        "sender_office",
-        "receiver_office",
-        "pickup_address",
-        "delivery_address",
-        "registered_by",
-        "registered_by__user",
-    ).order_by("-created_at")
+    parcels_qs = Parcel.objects.order_by("-created_at")
 
     employee = None
     if employee_id:
         employee = get_object_or_404(Employee, pk=employee_id)
         parcels_qs = parcels_qs.filter(registered_by=employee)
 
-    data = [
-        {
-            "tracking_number": p.tracking_number,
-            "status": p.current_status.name if p.current_status else "-",
-            "delivery_type": p.get_delivery_type_display(),
-            "price": float(p.price),
-            "weight_kg": float(p.weight_kg),
-            "sender": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
-            "receiver": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
-            "sender_office": str(p.sender_office) if p.sender_office else "-",
-            "receiver_office": str(p.receiver_office) if p.receiver_office else "-",
-            "pickup_address": str(p.pickup_address) if p.pickup_address else "-",
-            "delivery_address": str(p.delivery_address) if p.delivery_address else "-",
-            "created_at": p.created_at.strftime("%Y-%m-%d %H:%M"),
-            "delivered_at": p.delivered_at.strftime("%Y-%m-%d %H:%M") if p.delivered_at else "-",
-            "registered_by": str(p.registered_by) if p.registered_by else "-",
-        }
-        for p in parcels_qs
-    ]
+    data = serialize_parcels(parcels_qs, EMPLOYEE_REPORT_FIELDS, chunk_size=REPORT_CHUNK_SIZE)
 
-    return JsonResponse({
-        "employee_id": employee.pk if employee else None,
-        "employee_name": str(employee) if employee else "All Employees",
-        "parcels_count": len(data),
-        "parcels": data,
-    })
+    return StreamingJsonResponse(
+        {
+            "employee_id": employee.pk if employee else None,
+            "employee_name": str(employee) if employee else "All Employees",
+        },
+        "parcels",
+        data,
+        count_key="parcels_count",
+    )
 
 
 @login_required
 @employee_or_admin_required
 def pending_deliveries_report(request):
-    """Return all parcels that have been sent but not yet delivered."""
-    terminal_codes = ["DELIVERED", "CANCELLED", "RETURNED"]
+    """
+    Return the parcels that have been sent but not yet delivered, newest
+    first, one page at a time (?cursor=, ?limit=).
+    """
+    open_ids = statuses.open_ids()
 
-    parcels_qs = Parcel.objects.select_related(
-        "sender",
-        "receiver",
-        "current_status",
-        "sender_office",
-        "receiver_office",
-        "pickup_address",
-        "delivery_address",
-    ).exclude(
-        current_status__code__in=terminal_codes
-    ).order_by("-created_at")
+    parcels_qs = Parcel.objects.filter(current_status_id__in=open_ids)
 
-    data = [
-        {
-            "tracking_number": p.tracking_number,
-            "status": p.current_status.name if p.current_status else "-",
-            "delivery_type": p.get_delivery_type_display(),
-            "price": float(p.price),
-            "weight_kg": float(p.weight_kg),
-            "sender": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
-            "receiver": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
-            "sender_office": str(p.sender_office) if p.sender_office else "-",
-            "receiver_office": str(p.receiver_office) if p.receiver_office else "-",
-            "pickup_address": str(p.pickup_address) if p.pickup_address else "-",
-            "delivery_address": str(p.delivery_address) if p.delivery_address else "-",
-            "created_at": p.created_at.strftime("%Y-%m-%d %H:%M"),
-        }
-        for p in parcels_qs
-    ]
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+        rows, next_cursor = paginate_keyset(
+            parcel_values(parcels_qs, PENDING_REPORT_FIELDS, extra=("created_at", "id")),
+            ("-created_at", "-id"),
+            cursor=request.GET.get("cursor"),
+            limit=limit,
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    pending_count = ParcelStatusCount.objects.filter(status_id__in=open_ids).aggregate(
+        total=Sum("parcels_count")
+    )["total"]
+
+    return JsonResponse({
+        "pending_count": pending_count or 0,
+        "parcels": list(format_parcel_rows(rows, PENDING_REPORT_FIELDS)),
+        "next": next_cursor,
+    })
+
+
+@login_required
+@employee_or_admin_required
+def pending_deliveries_summary(request):
+    """Return the number of pending parcels per sender office and status, from the live counts."""
+    open_ids = statuses.open_ids()
+
+    offices = {}
+    counts = ParcelStatusCount.objects.filter(status_id__in=open_ids).values(
+        "office_id", "office__name", "status_id"
+    ).annotate(total=Sum("parcels_count")).order_by("office__name", "office_id")
+    for row in counts:
+        if not row["total"]:
+            continue
+        office = offices.setdefault(row["office_id"], {
+            "office_id": row["office_id"],
+            "office_name": row["office__name"] or "No office",
+            "pending_count": 0,
+            "statuses": {},
+        })
+        office["pending_count"] += row["total"]
+        office["statuses"][statuses.by_id(row["status_id"]).code] = row["total"]
 
     return JsonResponse({
-        "pending_count": len(data),
-        "parcels": data,
+        "pending_count": sum(office["pending_count"] for office in offices.values()),
+        "offices": list(offices.values()),
     })
 
 
 @login_required
 @employee_or_admin_required
 def income_report(request):
-    """Return company income for a specified period."""
+    """
+    Return company income for a specified period.
+
+    Totals and the per-day breakdown come from the daily income rollup. The
+    delivered parcels themselves are listed only with ?parcels=1, one page at
+    a time (?cursor=, ?limit=).
+    """
 
     date_from = request.GET.get("date_from")
     date_to = request.GET.get("date_to")
 
-    parcels_qs = Parcel.objects.select_related("current_status").filter(
-        current_status__code="DELIVERED"
-    )
-
-    if date_from:
-        try:
-            date_from_parsed = datetime.strptime(date_from, "%Y-%m-%d")
-            parcels_qs = parcels_qs.filter(delivered_at__gte=date_from_parsed)
-        except ValueError:
-            pass
+    try:
+        start = _parse_date(date_from, "date_from") if date_from else None
+        end = _parse_date(date_to, "date_to") if date_to else None
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    rollups = DailyIncomeRollup.objects.all()
+    if start:
+        rollups = rollups.filter(day__gte=start.date())
+    if end:
+        rollups = rollups.filter(day__lte=end.date())
+
+    totals = rollups.aggregate(total=Sum("income"), count=Sum("parcels_count"))
+    days = rollups.values("day").annotate(
+        day_parcels=Sum("parcels_count"), day_income=Sum("income")
+    ).order_by("day")
+
+    data = {
+        "date_from": date_from or "All time",
+        "date_to": date_to or "All time",
+        "total_income": float(totals["total"] or 0),
+        "parcels_count": totals["count"] or 0,
+        "days": [
+            {
+                "day": row["day"].isoformat(),
+                "parcels_count": row["day_parcels"],
+                "income": float(row["day_income"]),
+            }
+            for row in days
+        ],
+    }
+
+    if request.GET.get("parcels") in ("1", "true"):
+        delivered = statuses.get("DELIVERED")
+        if delivered:
+            parcels_qs = Parcel.objects.filter(current_status=delivered, delivered_at__isnull=False)
+        else:
+            parcels_qs = Parcel.objects.none()
+        if start:
+            parcels_qs = parcels_qs.filter(delivered_at__gte=start)
+        if end:
+            parcels_qs = parcels_qs.filter(delivered_at__lt=end + timedelta(days=1))
 
-    if date_to:
         try:
-            date_to_parsed = datetime.strptime(date_to, "%Y-%m-%d")
-            parcels_qs = parcels_qs.filter(delivered_at__lte=date_to_parsed)
-        except ValueError:
-            pass
-
-    total_income = parcels_qs.aggregate(
-        total=Sum(F("weight_kg") * F("tariff__price_per_kg"))
-    )["total"] or 0
-    parcels_count = parcels_qs.count()
+            limit = parse_limit(request.GET.get("limit"))
+            rows, next_cursor = paginate_keyset(
+                parcel_values(parcels_qs, INCOME_REPORT_FIELDS, extra=("delivered_at", "id")),
+                ("-delivered_at", "-id"),
+                cursor=request.GET.get("cursor"),
+                limit=limit,
+            )
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=400)
 
-    data = [
-        {
-            "tracking_number": p.tracking_number,
-            "price": float(p.price),
-            "delivery_type": p.get_delivery_type_display(),
-            "delivered_at": p.delivered_at.strftime("%Y-%m-%d %H:%M") if p.delivered_at else "-",
-            "sender": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
-            "receiver": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
-        }
-        for p in parcels_qs.select_related("sender", "receiver").order_by("-delivered_at")
-    ]
+        data["parcels"] = list(format_parcel_rows(rows, INCOME_REPORT_FIELDS))
+        data["next"] = next_cursor
 
-    return JsonResponse({
-        "date_from": date_from or "All time",
-        "date_to": date_to or "All time",
-        "total_income": float(total_income),
-        "parcels_count": parcels_count,
-        "parcels": data,
-    })
+    return JsonResponse(data)
 
 
 @require_GET
@@ -284,67 +300,69 @@ def track_parcel_api(request):
     if not tracking_number:
         return JsonResponse({"success": False, "error": "Tracking number is required."}, status=400)
 
-    try:
-        parcel = Parcel.objects.select_related(
-            "current_status",
-            "sender_office",
-            "receiver_office",
-            "pickup_address",
-            "delivery_address",
-        ).get(tracking_number__iexact=tracking_number)
-    except Parcel.DoesNotExist:
-        return JsonResponse({"success": False, "error": "Parcel not found."}, status=404)
-
-    history = ParcelStatusHistory.objects.filter(parcel=parcel).select_related(
-        "status", "office"
-    ).order_by("-created_at")
-
-    history_data = [
-        {
-            "status": h.status.name if h.status else "-",
-            "status_code": h.status.code if h.status else "-",
-            "office": str(h.office) if h.office else "-",
-            "note": h.note or "",
-            "timestamp": h.created_at.strftime("%Y-%m-%d %H:%M"),
-        }
-        for h in history
-    ]
-
-    return JsonResponse({
-        "success": True,
-        "parcel": {
-            "tracking_number": parcel.tracking_number,
-            "status": parcel.current_status.name if parcel.current_status else "-",
-            "status_code": parcel.current_status.code if parcel.current_status else "-",
-            "is_delivered": parcel.current_status.is_terminal if parcel.current_status else False,
-            "delivery_type": parcel.get_delivery_type_display(),
-            "weight_kg": float(parcel.weight_kg),
-            "sender_office": str(parcel.sender_office) if parcel.sender_office else None,
-            "receiver_office": str(parcel.receiver_office) if parcel.receiver_office else None,
-            "pickup_address": str(parcel.pickup_address) if parcel.pickup_address else None,
-            "delivery_address": str(parcel.delivery_address) if parcel.delivery_address else None,
-            "created_at": parcel.created_at.strftime("%Y-%m-%d %H:%M"),
-            "delivered_at": parcel.delivered_at.strftime("%Y-%m-%d %H:%M") if parcel.delivered_at else None,
-        },
-        "history": history_data,
-    })
+    status, payload = get_tracking_response(tracking_number)
+    return JsonResponse(payload, status=status)
 
 
 # =============================================================================
 # PARCELS CRUD API
 # =============================================================================
 
-def generate_tracking_number():
-    """Generate a unique tracking number."""
-    now = timezone.now()
-    unique_part = uuid.uuid4().hex[:6].upper()
-    return f"EXP{now.strftime('%Y%m%d')}{unique_part}"
+def _parse_date(value, field):
+    """Parse a YYYY-MM-DD query parameter into an aware datetime at midnight."""
+    try:
+        return timezone.make_aware(datetime.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        raise ValueError(f"Invalid {field}. Use YYYY-MM-DD.")
+
+
+def filter_parcels(parcels_qs, params):
+    """Apply the list API's server-side filters (status, office, delivery type, dates)."""
+    status = params.get("status")
+    if status:
+        current_status = statuses.get(status)
+        parcels_qs = parcels_qs.filter(current_status=current_status) if current_status else parcels_qs.none()
+
+    office = params.get("office")
+    if office:
+        try:
+            office_id = int(office)
+        except ValueError:
+            raise ValueError("office must be an integer.")
+        parcels_qs = parcels_qs.filter(Q(sender_office_id=office_id) | Q(receiver_office_id=office_id))
+
+    delivery_type = params.get("delivery_type")
+    if delivery_type:
+        if delivery_type not in DeliveryType.values:
+            raise ValueError("Invalid delivery type.")
+        parcels_qs = parcels_qs.filter(delivery_type=delivery_type)
+
+    date_from = params.get("date_from")
+    if date_from:
+        parcels_qs = parcels_qs.filter(created_at__gte=_parse_date(date_from, "date_from"))
+
+    date_to = params.get("date_to")
+    if date_to:
+        # date_to is inclusive: everything before the start of the next day
+        parcels_qs = parcels_qs.filter(created_at__lt=_parse_date(date_to, "date_to") + timedelta(days=1))
+
+    return parcels_qs
 
 
 @login_required
 @require_http_methods(["GET"])
+@versioned("parcels", "users", "offices", "tariffs", "statuses")
 def parcels_api_list(request):
-    """API to list parcels and metadata for forms."""
+    """
+    API to list parcels and metadata for forms.
+
+    Parcels are returned newest first in pages of ?limit= rows, keyed on
+    (created_at, id). Pass the returned "next" cursor as ?cursor= to fetch the
+    following page. Optional filters: status, office, delivery_type,
+    date_from and date_to (YYYY-MM-DD, inclusive).
+    Dropdown data comes from the metadata endpoint (metadata_api) and the
+    client typeahead (clients_api_search).
+    """
     user = request.user
     is_employee = user.is_superuser or user.role in ("ADMIN", "EMPLOYEE")
 
@@ -353,79 +371,90 @@ def parcels_api_list(request):
     else:
         parcels_qs = Parcel.objects.filter(Q(sender=user) | Q(receiver=user))
 
-    parcels_qs = parcels_qs.select_related(
-        "company", "sender", "receiver", "current_status",
-        "sender_office", "receiver_office", "tariff"
-    ).order_by("-created_at")
-
-    parcels_data = [
-        {
-            "id": p.pk,
-            "tracking_number": p.tracking_number,
-            "sender_id": p.sender_id,
-            "sender_name": f"{p.sender.first_name} {p.sender.last_name}" if p.sender else "-",
-            "receiver_id": p.receiver_id,
-            "receiver_name": f"{p.receiver.first_name} {p.receiver.last_name}" if p.receiver else "-",
-            "sender_office_id": p.sender_office_id,
-            "sender_office_name": str(p.sender_office) if p.sender_office else "",
-            "receiver_office_id": p.receiver_office_id,
-            "receiver_office_name": str(p.receiver_office) if p.receiver_office else "",
-            "delivery_type": p.delivery_type,
-            "weight_kg": float(p.weight_kg),
-            "price": float(p.price),
-            "status_code": p.current_status.code if p.current_status else "",
-            "status_name": p.current_status.name if p.current_status else "",
-            "is_terminal": p.current_status.is_terminal if p.current_status else False,
-            "created_at": p.created_at.strftime("%Y-%m-%d %H:%M"),
-        }
-        for p in parcels_qs
-    ]
+    cursor = request.GET.get("cursor")
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+        parcels_qs = filter_parcels(parcels_qs, request.GET)
+        page, next_cursor = paginate_keyset(
+            parcel_values(parcels_qs, LIST_FIELDS, extra=("id", "created_at")),
+            ("-created_at", "-id"),
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
-    # Get metadata for dropdowns (only for employees)
-    metadata = {}
-    if is_employee:
-        # Clients (users with CLIENT role)
-        clients = User.objects.filter(role=UserRole.CLIENT).order_by("first_name", "last_name")
-        metadata["clients"] = [
-            {"id": c.pk, "name": f"{c.first_name} {c.last_name}", "email": c.email}
-            for c in clients
-        ]
-
-        # Offices
-        offices = Office.objects.select_related("company").order_by("name")
-        metadata["offices"] = [
-            {"id": o.pk, "name": o.name, "code": o.code, "company": o.company.name}
-            for o in offices
-        ]
-
-        # Statuses
-        statuses = ParcelStatus.objects.all().order_by("code")
-        metadata["statuses"] = [
-            {"code": s.code, "name": s.name, "is_terminal": s.is_terminal}
-            for s in statuses
-        ]
-
-        # Delivery types
-        metadata["delivery_types"] = [
-            {"value": dt.value, "label": dt.label}
-            for dt in DeliveryType
-        ]
-
-        # Companies (for tariff selection)
-        companies = Company.objects.all().order_by("name")
-        metadata["companies"] = [{"id": c.pk, "name": c.name} for c in companies]
+    parcels_data = list(format_parcel_rows(page, LIST_FIELDS, empty=""))
 
     return JsonResponse({
         "success": True,
         "parcels": parcels_data,
+        "next": next_cursor,
+        "is_employee": is_employee,
+    })
+
+
+SEARCH_FILTERS = ("status", "office", "delivery_type", "date_from", "date_to")
+
+
+@login_required
+@require_http_methods(["GET"])
+@versioned("parcels", "users", "offices", "tariffs", "statuses")
+def parcels_api_search(request):
+    """
+    API to search parcels by tracking number, sender and receiver name,
+    username, email and phone, and office name (?q=, see search.py).
+
+    Matches are returned newest first in pages of ?limit= rows; pass the
+    returned "next" cursor as ?cursor= to fetch the following page. The list
+    API's filters apply as well.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"success": False, "error": "q is required."}, status=400)
+
+    user = request.user
+    is_employee = user.is_superuser or user.role in ("ADMIN", "EMPLOYEE")
+    filtered = any(request.GET.get(name) for name in SEARCH_FILTERS)
+
+    cursor = request.GET.get("cursor")
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+        if is_employee and not filtered:
+            # Fast path: the index returns the page of ids directly
+            before = None
+            if cursor:
+                values = decode_cursor(cursor)
+                if len(values) != 1 or type(values[0]) is not int or not 0 < values[0] < 2 ** 63:
+                    raise InvalidCursor("Invalid cursor.")
+                before = values[0]
+            ids = matching_ids(query, limit + 1, before)
+            next_cursor = encode_cursor([ids[limit - 1]]) if len(ids) > limit else None
+            page = parcel_values(Parcel.objects.filter(pk__in=ids[:limit]), LIST_FIELDS, extra=("id",)).order_by("-id")
+        else:
+            if is_employee:
+                parcels_qs = Parcel.objects.all()
+            else:
+                parcels_qs = Parcel.objects.filter(Q(sender=user) | Q(receiver=user))
+            parcels_qs = filter_matching(filter_parcels(parcels_qs, request.GET), query)
+            page, next_cursor = paginate_keyset(
+                parcel_values(parcels_qs, LIST_FIELDS, extra=("id",)), ("-id",), cursor=cursor, limit=limit,
+            )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return JsonResponse({
+        "success": True,
+        "parcels": list(format_parcel_rows(page, LIST_FIELDS, empty="")),
+        "next": next_cursor,
         "is_employee": is_employee,
-        **metadata
     })
 
 
 @login_required
 @employee_or_admin_required
 @require_http_methods(["POST"])
+@idempotent
 def parcels_api_create(request):
     """API to create a new parcel."""
     try:
@@ -499,10 +528,10 @@ def parcels_api_create(request):
     # Get tariff
     tariff = None
     if company:
-        tariff = Tariff.objects.filter(company=company, delivery_type=data["delivery_type"]).first()
+        tariff = tariffs.get(company.pk, data["delivery_type"])
 
     # Get CREATED status
-    created_status = ParcelStatus.objects.filter(code="CREATED").first()
+    created_status = statuses.initial()
     if not created_status:
         return JsonResponse({"success": False, "error": "CREATED status not found. Run seed_data."}, status=500)
 
@@ -512,9 +541,11 @@ def parcels_api_create(request):
         employee = request.user.employee_profile
 
     try:
+        # Allocated outside the transaction so whole blocks can be reserved (see numbers.py)
+        tracking_number = tracking_numbers.allocate()[0]
         with transaction.atomic():
             parcel = Parcel(
-                tracking_number=generate_tracking_number(),
+                tracking_number=tracking_number,
                 company=company,
                 sender=sender,
                 receiver=receiver,
@@ -529,6 +560,7 @@ def parcels_api_create(request):
                 registered_by=employee,
             )
             parcel.save()
+            adjust_counts(count_parcels([parcel]))
 
             # Create initial status history
             ParcelStatusHistory.objects.create(
@@ -538,6 +570,8 @@ def parcels_api_create(request):
                 changed_by=employee,
                 note="Parcel registered",
             )
+            # Drop a cached "not found" for this tracking number
+            invalidate_tracking(parcel.tracking_number)
 
         return JsonResponse({
             "success": True,
@@ -551,6 +585,108 @@ def parcels_api_create(request):
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
 
+@login_required
+@employee_or_admin_required
+@require_http_methods(["POST"])
+@idempotent
+def parcels_api_bulk_create(request):
+    """
+    API to register a manifest of parcels in one request.
+
+    The body is a JSON array of objects with the same fields as
+    parcels_api_create (or an object with a "parcels" array). Valid rows are
+    created; the response has one result per row, in order, with either the
+    new parcel or the validation error for that row.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid JSON."}, status=400)
+
+    rows = data.get("parcels") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return JsonResponse({"success": False, "error": "Expected a non-empty array of parcels."}, status=400)
+    if len(rows) > MAX_BULK_PARCELS:
+        return JsonResponse({
+            "success": False,
+            "error": f"At most {MAX_BULK_PARCELS} parcels can be registered per request."
+        }, status=400)
+
+    # Get employee profile if exists
+    employee = None
+    if hasattr(request.user, "employee_profile"):
+        employee = request.user.employee_profile
+
+    try:
+        results = bulk_register_parcels(rows, employee)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+    created_count = sum(1 for r in results if r["success"])
+    return JsonResponse({
+        "success": True,
+        "created_count": created_count,
+        "error_count": len(results) - created_count,
+        "results": results,
+    })
+
+
+@login_required
+@employee_or_admin_required
+@require_http_methods(["POST"])
+def parcels_api_quote(request):
+    """
+    API to preview parcel prices before registering them.
+
+    Takes one parcel object, or an array / {"parcels": [...]} of them, with the
+    sender_office_id, receiver_office_id, delivery_type and weight_kg fields
+    of parcels_api_create. Returns one price per parcel, null when it cannot
+    be priced yet.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid JSON."}, status=400)
+
+    if isinstance(data, dict) and "parcels" not in data:
+        rows = [data]
+    else:
+        rows = data.get("parcels") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return JsonResponse({"success": False, "error": "Expected a non-empty array of parcels."}, status=400)
+    if len(rows) > MAX_BULK_PARCELS:
+        return JsonResponse({
+            "success": False,
+            "error": f"At most {MAX_BULK_PARCELS} parcels can be quoted per request."
+        }, status=400)
+
+    prices = quote_manifest(rows)
+    return JsonResponse({
+        "success": True,
+        "prices": [float(price) if price is not None else None for price in prices],
+    })
+
+
+def _claim_version(parcel, data, **changes):
+    """
+    Bump the parcel's version, and apply `changes`, with one UPDATE that only
+    matches while the parcel still has the version the client read:
+    data["version"] when given, else the one just loaded. Returns None on
+    success or the error response (400, or 409 when another request changed
+    the parcel first). Call inside the write's transaction.
+    """
+    version = data.get("version", parcel.version)
+    if not isinstance(version, int) or isinstance(version, bool):
+        return JsonResponse({"success": False, "error": "version must be an integer."}, status=400)
+    if not Parcel.objects.filter(pk=parcel.pk, version=version).update(version=F("version") + 1, **changes):
+        return JsonResponse({
+            "success": False,
+            "error": "Parcel was changed by another request. Reload it and try again.",
+        }, status=409)
+    parcel.version = version + 1
+    return None
+
+
 @login_required
 @require_http_methods(["GET"])
 def parcels_api_get(request, parcel_id):
@@ -563,6 +699,8 @@ def parcels_api_get(request, parcel_id):
     if not is_employee and parcel.sender_id != user.pk and parcel.receiver_id != user.pk:
         return JsonResponse({"success": False, "error": "Permission denied."}, status=403)
 
+    current_status = statuses.by_id(parcel.current_status_id)
+
     return JsonResponse({
         "success": True,
         "parcel": {
@@ -577,11 +715,12 @@ def parcels_api_get(request, parcel_id):
             "weight_kg": float(parcel.weight_kg),
             "tariff_id": parcel.tariff_id,
             "price": float(parcel.price),
-            "current_status_code": parcel.current_status.code if parcel.current_status else "",
-            "current_status_name": parcel.current_status.name if parcel.current_status else "",
-            "is_terminal": parcel.current_status.is_terminal if parcel.current_status else False,
+            "current_status_code": current_status.code if current_status else "",
+            "current_status_name": current_status.name if current_status else "",
+            "is_terminal": current_status.is_terminal if current_status else False,
             "created_at": parcel.created_at.strftime("%Y-%m-%d %H:%M"),
             "delivered_at": parcel.delivered_at.strftime("%Y-%m-%d %H:%M") if parcel.delivered_at else None,
+            "version": parcel.version,
         }
     })
 
@@ -589,12 +728,13 @@ def parcels_api_get(request, parcel_id):
 @login_required
 @employee_or_admin_required
 @require_http_methods(["PUT", "PATCH"])
+@idempotent
 def parcels_api_update(request, parcel_id):
     """API to update a parcel."""
     parcel = get_object_or_404(Parcel, pk=parcel_id)
 
     # Can't update terminal parcels
-    if parcel.current_status and parcel.current_status.is_terminal:
+    if parcel.current_status_id in statuses.terminal_ids():
         return JsonResponse({"success": False, "error": "Cannot update a parcel with terminal status."}, status=400)
 
     try:
@@ -602,6 +742,8 @@ def parcels_api_update(request, parcel_id):
     except json.JSONDecodeError:
         return JsonResponse({"success": False, "error": "Invalid JSON."}, status=400)
 
+    old_office_id = parcel.sender_office_id
+
     try:
         with transaction.atomic():
             if "sender_id" in data:
@@ -649,14 +791,23 @@ def parcels_api_update(request, parcel_id):
                     return JsonResponse({"success": False, "error": "Invalid delivery type."}, status=400)
                 parcel.delivery_type = data["delivery_type"]
                 # Update tariff to match new delivery type
-                if parcel.company:
-                    parcel.tariff = Tariff.objects.filter(
-                        company=parcel.company, delivery_type=data["delivery_type"]
-                    ).first()
-
+                if parcel.company_id:
+                    parcel.tariff = tariffs.get(parcel.company_id, data["delivery_type"])
+
+            # Guards the checks above (terminal status, old office) against
+            # a concurrent change; save() then writes the bumped version.
+            error = _claim_version(parcel, data)
+            if error:
+                return error
             parcel.save()
-
-        return JsonResponse({"success": True})
+            if parcel.sender_office_id != old_office_id:
+                adjust_counts({
+                    (old_office_id, parcel.current_status_id): -1,
+                    (parcel.sender_office_id, parcel.current_status_id): 1,
+                })
+            invalidate_tracking(parcel.tracking_number)
+
+        return JsonResponse({"success": True, "version": parcel.version})
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
@@ -664,19 +815,24 @@ def parcels_api_update(request, parcel_id):
 @login_required
 @employee_or_admin_required
 @require_http_methods(["DELETE"])
+@idempotent
 def parcels_api_delete(request, parcel_id):
     """API to delete a parcel."""
     parcel = get_object_or_404(Parcel, pk=parcel_id)
 
-    # Only allow deleting CREATED or CANCELLED parcels
-    if parcel.current_status and parcel.current_status.code not in ("CREATED", "CANCELLED"):
+    # Only parcels that have not left the sender office (CREATED or CANCELLED)
+    if parcel.current_status_id not in statuses.deletable_ids():
+        codes = sorted(statuses.by_id(pk).code for pk in statuses.deletable_ids())
         return JsonResponse({
             "success": False,
-            "error": "Can only delete parcels with CREATED or CANCELLED status."
+            "error": f"Can only delete parcels with {' or '.join(codes)} status."
         }, status=400)
 
     try:
-        parcel.delete()
+        with transaction.atomic():
+            parcel.delete()
+            adjust_counts(count_parcels([parcel], sign=-1))
+            invalidate_tracking(parcel.tracking_number)
         return JsonResponse({"success": True})
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
@@ -685,11 +841,12 @@ def parcels_api_delete(request, parcel_id):
 @login_required
 @employee_or_admin_required
 @require_http_methods(["POST"])
+@idempotent
 def parcels_api_update_status(request, parcel_id):
     """API to update a parcel's status."""
     parcel = get_object_or_404(Parcel, pk=parcel_id)
 
-    if parcel.current_status and parcel.current_status.is_terminal:
+    if parcel.current_status_id in statuses.terminal_ids():
         return JsonResponse({"success": False, "error": "Parcel already has terminal status."}, status=400)
 
     try:
@@ -701,10 +858,15 @@ def parcels_api_update_status(request, parcel_id):
     if not status_code:
         return JsonResponse({"success": False, "error": "status_code is required."}, status=400)
 
-    try:
-        new_status = ParcelStatus.objects.get(code=status_code)
-    except ParcelStatus.DoesNotExist:
+    new_status = statuses.get(status_code)
+    if not new_status:
         return JsonResponse({"success": False, "error": "Invalid status code."}, status=400)
+    if not statuses.can_transition(parcel.current_status_id, new_status.pk):
+        current_code = statuses.by_id(parcel.current_status_id).code
+        return JsonResponse({
+            "success": False,
+            "error": f"Cannot change status from {current_code} to {new_status.code}.",
+        }, status=400)
 
     # Get employee profile if exists
     employee = None
@@ -723,13 +885,29 @@ def parcels_api_update_status(request, parcel_id):
 
     try:
         with transaction.atomic():
-            parcel.current_status = new_status
-
-            # Set delivered_at if status is DELIVERED
+            # Set delivered_at and the delivered price if status is DELIVERED
+            delivered_at = timezone.now() if new_status.code == "DELIVERED" else parcel.delivered_at
             if new_status.code == "DELIVERED":
-                parcel.delivered_at = timezone.now()
+                price_delivery(parcel)
+
+            # One conditional UPDATE on the version read with the terminal
+            # check above: of two concurrent scans, the second gets a 409.
+            # No field is searchable, so there is nothing to re-index.
+            error = _claim_version(
+                parcel, data,
+                current_status=new_status, delivered_at=delivered_at, delivered_price=parcel.delivered_price,
+            )
+            if error:
+                return error
+            # update() sends no post_save signals
+            touch("parcels")
 
-            parcel.save()
+            adjust_counts(count_parcels([parcel], sign=-1))
+            parcel.current_status = new_status
+            parcel.delivered_at = delivered_at
+            adjust_counts(count_parcels([parcel]))
+            if new_status.code == "DELIVERED":
+                record_deliveries([parcel])
 
             # Create status history entry
             ParcelStatusHistory.objects.create(
@@ -739,6 +917,7 @@ def parcels_api_update_status(request, parcel_id):
                 changed_by=employee,
                 note=data.get("note", ""),
             )
+            invalidate_tracking(parcel.tracking_number)
 
         return JsonResponse({
             "success": True,
@@ -746,7 +925,86 @@ def parcels_api_update_status(request, parcel_id):
                 "code": new_status.code,
                 "name": new_status.name,
                 "is_terminal": new_status.is_terminal,
-            }
+            },
+            "version": parcel.version,
         })
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+@login_required
+@employee_or_admin_required
+@require_http_methods(["POST"])
+@idempotent
+def parcels_api_bulk_update_status(request):
+    """
+    API to apply one status change to a batch of scanned parcels.
+
+    Body: {"tracking_numbers": [...]} or {"parcel_ids": [...]}, plus
+    "status_code" and optional "office_id" and "note". Parcels that are
+    unknown, already terminal or cannot change to the status are reported
+    in "rejected".
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid JSON."}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"success": False, "error": "Expected a JSON object."}, status=400)
+
+    if data.get("tracking_numbers") is not None:
+        identifiers, by = data["tracking_numbers"], "tracking_number"
+    elif data.get("parcel_ids") is not None:
+        identifiers, by = data["parcel_ids"], "id"
+    else:
+        return JsonResponse({"success": False, "error": "tracking_numbers or parcel_ids is required."}, status=400)
+
+    if not isinstance(identifiers, list) or not identifiers:
+        return JsonResponse({"success": False, "error": "Expected a non-empty array of parcels."}, status=400)
+    if len(identifiers) > MAX_BULK_SCANS:
+        return JsonResponse({
+            "success": False,
+            "error": f"At most {MAX_BULK_SCANS} parcels can be updated per request."
+        }, status=400)
+
+    status_code = data.get("status_code")
+    if not status_code:
+        return JsonResponse({"success": False, "error": "status_code is required."}, status=400)
+
+    new_status = statuses.get(status_code)
+    if not new_status:
+        return JsonResponse({"success": False, "error": "Invalid status code."}, status=400)
+
+    # Get employee profile if exists
+    employee = None
+    if hasattr(request.user, "employee_profile"):
+        employee = request.user.employee_profile
+
+    # Get office from data or employee's office
+    office = None
+    if data.get("office_id"):
+        try:
+            office = Office.objects.get(pk=data["office_id"])
+        except (Office.DoesNotExist, ValueError, TypeError):
+            return JsonResponse({"success": False, "error": "Office not found."}, status=400)
+    elif employee and employee.office_id:
+        office = employee.office
+
+    try:
+        updated, rejected = bulk_update_status(
+            identifiers, new_status, office, employee, note=data.get("note", ""), by=by
+        )
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+    return JsonResponse({
+        "success": True,
+        "status": {
+            "code": new_status.code,
+            "name": new_status.name,
+            "is_terminal": new_status.is_terminal,
+        },
+        "updated_count": len(updated),
+        "rejected_count": len(rejected),
+        "rejected": rejected,
+    })
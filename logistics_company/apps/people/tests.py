@@ -1,3 +1,36 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.common.testing import DataFactory, QueryBudgetMixin
+from apps.workforce.models import Employee
+
+
+class ClientQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The clients APIs and report run a fixed number of queries, however many clients they return."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.clients = cls.factory.clients(10)
+        cls.employee = cls.factory.employee(employee_type=Employee.EmployeeType.MANAGER)
+
+    def setUp(self):
+        self.client.force_login(self.employee.user)
+
+    def grow(self):
+        self.factory.clients(500)
+
+    def test_clients_api_list(self):
+        self.assertQueryBudget(reverse("clients_api_list") + "?limit=500", 4, grow=self.grow)
+
+    def test_clients_api_list_search(self):
+        self.assertQueryBudget(reverse("clients_api_list") + "?q=test+client&limit=500", 4, grow=self.grow)
+
+    def test_clients_api_search(self):
+        self.assertQueryBudget(reverse("clients_api_search") + "?q=client&limit=50", 3, grow=self.grow)
+
+    def test_clients_api_get(self):
+        self.assertQueryBudget(reverse("clients_api_get", args=[self.clients[0].pk]), 3)
+
+    def test_clients_report(self):
+        self.assertQueryBudget(reverse("reports_client"), 3, grow=self.grow)
@@ -3,12 +3,15 @@ from functools import wraps
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import make_password
+from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 
 from apps.accounts.models import User, UserRole
 from apps.common.models import Address
+from apps.common.pagination import paginate_keyset, parse_limit
+from apps.common.versions import versioned
 
 
 def employee_or_admin_required(view_func):
@@ -32,7 +35,11 @@ def clients(request):
 @employee_or_admin_required
 def clients_report(request):
     """Return all clients (users with CLIENT role) with their details."""
-    clients = User.objects.filter(role=UserRole.CLIENT).order_by("first_name", "last_name")
+    clients = (
+        User.objects.filter(role=UserRole.CLIENT)
+        .select_related("default_address")
+        .order_by("first_name", "last_name")
+    )
 
     data = [
         {
@@ -58,27 +65,111 @@ def clients_report(request):
 # Clients CRUD API
 # ─────────────────────────────────────────────────────────────────────────────
 
+# output key -> (values() source, formatter)
+CLIENT_COLUMNS = {
+    "id": ("id", lambda v: v),
+    "username": ("username", lambda v: v),
+    "first_name": ("first_name", lambda v: v),
+    "last_name": ("last_name", lambda v: v),
+    "email": ("email", lambda v: v),
+    "phone": ("phone", lambda v: v or ""),
+    "address_city": ("default_address__city", lambda v: v or ""),
+    "address_street": ("default_address__street", lambda v: v or ""),
+    "address_postal": ("default_address__postal_code", lambda v: v or ""),
+    "created_at": ("created_at", lambda v: v.strftime("%Y-%m-%d") if v else ""),
+}
+
+# Keyset ordering of the clients list; id makes it total
+CLIENT_ORDERING = ("first_name", "last_name", "id")
+
+
+def parse_client_fields(value):
+    """Parse ?fields=id,email,phone into a list of CLIENT_COLUMNS keys (all of them when empty)."""
+    if not value:
+        return list(CLIENT_COLUMNS)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in CLIENT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def search_clients(queryset, query):
+    """Keep clients matching every word of `query` in their name, email or phone."""
+    for term in query.split():
+        queryset = queryset.filter(
+            Q(first_name__icontains=term)
+            | Q(last_name__icontains=term)
+            | Q(email__icontains=term)
+            | Q(phone__icontains=term)
+        )
+    return queryset
+
+
 @login_required
 @employee_or_admin_required
 @require_http_methods(["GET"])
+@versioned("users", "addresses")
 def clients_api_list(request):
-    """List all clients."""
-    clients = User.objects.filter(role=UserRole.CLIENT).order_by("first_name", "last_name")
+    """
+    List clients ordered by name, in pages of ?limit= rows.
+
+    Pass the returned "next" cursor as ?cursor= to fetch the following page.
+    ?q= searches first name, last name, email and phone (every word must
+    match); ?fields=id,email,phone returns only those keys.
+    """
+    clients = User.objects.filter(role=UserRole.CLIENT)
+    query = request.GET.get("q", "").strip()
+    if query:
+        clients = search_clients(clients, query)
 
-    data = []
-    for client in clients:
-        data.append({
-            "id": client.id,
-            "username": client.username,
-            "first_name": client.first_name,
-            "last_name": client.last_name,
-            "email": client.email,
-            "phone": client.phone or "",
-            "address_city": client.default_address.city if client.default_address else "",
-            "address_street": client.default_address.street if client.default_address else "",
-            "address_postal": client.default_address.postal_code if client.default_address else "",
-            "created_at": client.created_at.strftime("%Y-%m-%d") if client.created_at else "",
-        })
+    try:
+        fields = parse_client_fields(request.GET.get("fields"))
+        sources = [CLIENT_COLUMNS[name][0] for name in fields]
+        extra = [name for name in CLIENT_ORDERING if name not in sources]
+        rows, next_cursor = paginate_keyset(
+            clients.values(*dict.fromkeys(sources + extra)),
+            CLIENT_ORDERING,
+            cursor=request.GET.get("cursor"),
+            limit=parse_limit(request.GET.get("limit")),
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    data = [
+        {name: CLIENT_COLUMNS[name][1](row[CLIENT_COLUMNS[name][0]]) for name in fields}
+        for row in rows
+    ]
+
+    return JsonResponse({"success": True, "clients": data, "next": next_cursor})
+
+
+@login_required
+@employee_or_admin_required
+@require_http_methods(["GET"])
+def clients_api_search(request):
+    """
+    Typeahead lookup for the sender/receiver fields: the first ?limit= (default
+    10) clients matching ?q= by name, email or phone.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = parse_limit(request.GET.get("limit"), default=10, maximum=50)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    if not query:
+        return JsonResponse({"success": True, "clients": []})
+
+    clients = (
+        search_clients(User.objects.filter(role=UserRole.CLIENT), query)
+        .order_by(*CLIENT_ORDERING)
+        .values("id", "first_name", "last_name", "email")[:limit]
+    )
+    data = [
+        {"id": c["id"], "name": f"{c['first_name']} {c['last_name']}", "email": c["email"]}
+        for c in clients
+    ]
 
     return JsonResponse({"success": True, "clients": data})
 
@@ -151,7 +242,7 @@ def clients_api_create(request):
 def clients_api_get(request, client_id):
     """Get a single client."""
     try:
-        client = User.objects.get(id=client_id, role=UserRole.CLIENT)
+        client = User.objects.select_related("default_address").get(id=client_id, role=UserRole.CLIENT)
     except User.DoesNotExist:
         return JsonResponse({"success": False, "error": "Client not found."}, status=404)
 
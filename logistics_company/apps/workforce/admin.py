@@ -7,5 +7,6 @@ from .forms import EmployeeAdminForm
 class EmployeeAdmin(admin.ModelAdmin):
     form = EmployeeAdminForm
     list_display = ("user", "employee_type", "office", "hire_date", "salary")
+    list_select_related = ("user", "office")
     list_filter = ("employee_type", "office")
     search_fields = ("user__username", "user__email", "user__first_name", "user__last_name")
@@ -1,3 +1,35 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.accounts.models import UserRole
+from apps.common.testing import DataFactory, QueryBudgetMixin
+from apps.workforce.models import Employee
+
+
+class EmployeeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The employee APIs, report and changelist run a fixed number of queries, however many employees they return."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = DataFactory()
+        cls.offices = cls.factory.offices(2)
+        cls.manager = cls.factory.employee(cls.offices[0], Employee.EmployeeType.MANAGER)
+        cls.factory.employees(10, cls.offices[1])
+        cls.admin = cls.factory.users(1, UserRole.ADMIN, is_staff=True, is_superuser=True)[0]
+
+    def setUp(self):
+        self.client.force_login(self.manager.user)
+
+    def grow(self):
+        for office in self.offices:
+            self.factory.employees(100, office, Employee.EmployeeType.COURIER)
+
+    def test_employees_report(self):
+        self.assertQueryBudget(reverse("reports_employees"), 3, grow=self.grow)
+
+    def test_employees_api_list(self):
+        self.assertQueryBudget(reverse("employees_api_list"), 4, grow=self.grow)
+
+    def test_employee_admin_changelist(self):
+        self.client.force_login(self.admin)
+        self.assertQueryBudget(reverse("admin:workforce_employee_changelist"), 6, grow=self.grow)
@@ -12,6 +12,7 @@ from django.views.decorators.http import require_http_methods
 from .models import Employee
 from apps.accounts.models import User, UserRole
 from apps.organizations.models import Office
+from apps.common.versions import versioned
 
 
 def employee_or_admin_required(view_func):
@@ -76,6 +77,7 @@ def employees_report(request):
 
 @login_required
 @require_http_methods(["GET"])
+@versioned("employees", "users", "offices")
 def employees_api_list(request):
     """API to list all employees."""
     employees_qs = Employee.objects.select_related("user", "office").order_by("user__first_name")
@@ -98,18 +100,9 @@ def employees_api_list(request):
         for emp in employees_qs
     ]
 
-    offices = Office.objects.all().order_by("name")
-    offices_data = [{"id": o.pk, "name": o.name, "code": o.code} for o in offices]
-
     return JsonResponse({
         "success": True,
         "employees": data,
-        "offices": offices_data,
-        "employee_types": [
-            {"value": "COURIER", "label": "Courier"},
-            {"value": "OFFICE", "label": "Office"},
-            {"value": "MANAGER", "label": "Manager"},
-        ]
     })
 
 
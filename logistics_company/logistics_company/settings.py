@@ -10,11 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Settings below read from the environment; a .env file next to manage.py is
+# loaded first (see .env.example). Variables already set take precedence.
+load_dotenv(BASE_DIR / ".env")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -48,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.common.middleware.PerfMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,14 +89,94 @@ WSGI_APPLICATION = "logistics_company.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DB_PROFILE selects one of:
+#   sqlite        - plain SQLite file, the development default
+#   sqlite-tuned  - SQLite for concurrent writers: WAL journal, synchronous=NORMAL,
+#                   memory-mapped reads, a larger page cache, a busy timeout instead
+#                   of immediate "database is locked" errors, and write transactions
+#                   that take the write lock up front (BEGIN IMMEDIATE)
+#   postgres      - PostgreSQL with persistent connections; QuerySet.iterator()
+#                   streams through server-side cursors
+# DB_CONN_MAX_AGE overrides how long a connection is kept open (seconds, 0 closes
+# it after each request).
+
+DB_PROFILE = os.environ.get("DB_PROFILE", "sqlite")
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3")
+
+if DB_PROFILE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SQLITE_PATH,
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 0)),
+        }
+    }
+elif DB_PROFILE == "sqlite-tuned":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SQLITE_PATH,
+            # The pragmas run once per connection; keep connections open.
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "OPTIONS": {
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA mmap_size=268435456;"  # 256 MiB
+                    "PRAGMA cache_size=-65536;"  # 64 MiB
+                    "PRAGMA busy_timeout=5000;"
+                    "PRAGMA temp_store=MEMORY;"
+                ),
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+        }
+    }
+elif DB_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "logistics_company"),
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "CONN_HEALTH_CHECKS": True,
+            # Server-side cursors do not survive a transaction-pooling
+            # PgBouncer; set DB_DISABLE_SERVER_SIDE_CURSORS=1 behind one.
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_DISABLE_SERVER_SIDE_CURSORS", "") == "1",
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_PROFILE {DB_PROFILE!r}; use sqlite, sqlite-tuned or postgres.")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory cache for development; point BACKEND/LOCATION at Redis or
+# Memcached in production so all workers share tracking responses and see
+# their invalidations ("manage.py check --deploy" warns otherwise).
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "logistics-company",
     }
 }
 
 
+# Request instrumentation
+# PerfMiddleware times the SQL queries and wall time of a sampled fraction of
+# requests (PERF_SAMPLE_RATE, 0.0-1.0; 0 disables it). Staff can read the
+# per-view figures at /_perf/. A low rate such as 0.01 is cheap enough for
+# production.
+
+PERF_SAMPLE_RATE = float(os.environ.get("PERF_SAMPLE_RATE", 0))
+PERF_WINDOW = 500  # samples kept per view
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 